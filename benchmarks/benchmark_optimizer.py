@@ -0,0 +1,239 @@
+"""
+Throughput benchmarks for the optimization loop, run against a latency-simulating mock LLM.
+
+Usage (from the project root):
+    python -m benchmarks.benchmark_optimizer --cases 10 100 --candidates 1 3 --output results.json
+
+Every scenario reports wall time, provider calls per second, peak RSS and per-stage latencies,
+and the whole run is written as JSON so results can be compared between commits.
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from config import ORIGINAL_PROMPT
+from optimizer.budget import BudgetController
+from optimizer.model_interface import Model
+from optimizer.prompt_evaluator import Evaluator
+from optimizer.prompt_generator import PromptGenerator
+from optimizer.rate_limiter import RateLimiter
+from providers.mock_provider import MockProvider, LATENCY_DISTRIBUTIONS
+from utils.performance_logger import PerformanceLogger
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+
+def peak_rss_mb() -> Optional[float]:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def make_dataset(cases: int) -> List[Dict[str, Any]]:
+    return [
+        {
+            "variables": {variable: f"Synthetic {variable} number {index}. " * 20
+                          for variable in ORIGINAL_PROMPT['variables']},
+            "expected_output": f"Synthetic summary number {index}."
+        }
+        for index in range(cases)
+    ]
+
+
+def make_model(name: str, provider: MockProvider, args: argparse.Namespace, temperature: float = 0.7) -> Model:
+    limiter = RateLimiter(args.rpm, args.tpm, initial_concurrency=args.concurrency,
+                          max_concurrency=max(args.concurrency, 1) * 4)
+    return Model(name, temperature=temperature, rate_limiter=limiter, provider=provider)
+
+
+def make_provider(args: argparse.Namespace) -> MockProvider:
+    return MockProvider(
+        latency_mean=args.latency,
+        latency_distribution=args.latency_distribution,
+        error_rate=args.error_rate,
+        rate_limit_rate=args.rate_limit_rate,
+        retry_after=args.retry_after,
+        seed=args.seed
+    )
+
+
+def make_evaluator(provider: MockProvider, dataset: List[Dict[str, Any]], log_dir: str,
+                   args: argparse.Namespace) -> Evaluator:
+    logger = PerformanceLogger(log_dir, ORIGINAL_PROMPT['text'], log_format="jsonl", plot_mode="off")
+    return Evaluator(logger, evaluation_model=make_model("mock-judge", provider, args, temperature=0.0),
+                     dataset=dataset)
+
+
+def scenario_result(name: str, parameters: Dict[str, Any], wall_time: float, provider: Optional[MockProvider],
+                    **extra: Any) -> Dict[str, Any]:
+    calls = provider.calls if provider is not None else 0
+    result = {
+        "scenario": name,
+        "parameters": parameters,
+        "wall_time": wall_time,
+        "calls": calls,
+        "calls_per_second": calls / wall_time if wall_time > 0 else 0.0,
+        "peak_rss_mb": peak_rss_mb()
+    }
+    if provider is not None:
+        result["errors"] = provider.errors
+        result["rate_limited"] = provider.rate_limited
+        result["provider_latency"] = provider.get_latency_stats()
+    result.update(extra)
+    return result
+
+
+async def benchmark_evaluation(cases: int, candidates: int, args: argparse.Namespace) -> Dict[str, Any]:
+    provider = make_provider(args)
+    prompts = [f"Candidate {index}: {ORIGINAL_PROMPT['text']}" for index in range(candidates)]
+    with tempfile.TemporaryDirectory() as log_dir:
+        evaluator = make_evaluator(provider, make_dataset(cases), log_dir, args)
+        target_model = make_model("mock-target", provider, args)
+
+        started = time.perf_counter()
+        await evaluator.evaluate_prompts(prompts, target_model, iteration=0)
+        wall_time = time.perf_counter() - started
+        evaluator.logger.close()
+
+    return scenario_result("evaluate_prompts", {"cases": cases, "candidates": candidates}, wall_time, provider,
+                           pipeline=evaluator.get_pipeline_stats())
+
+
+async def benchmark_optimization(cases: int, candidates: int, args: argparse.Namespace) -> Dict[str, Any]:
+    # Imported here so main's module-level setup only runs for this scenario
+    import main
+    from unittest import mock
+
+    provider = make_provider(args)
+    with tempfile.TemporaryDirectory() as log_dir:
+        evaluator = make_evaluator(provider, make_dataset(cases), log_dir, args)
+        generator = PromptGenerator(make_model("mock-generator", provider, args))
+        target_model = make_model("mock-target", provider, args)
+
+        started = time.perf_counter()
+        with mock.patch.object(main, "MAX_ITERATIONS", args.iterations), \
+                mock.patch.object(main, "PARALLEL_VARIATIONS", candidates), \
+                mock.patch.object(main, "ACCURACY_THRESHOLD", 1.1), \
+                contextlib.redirect_stdout(io.StringIO()):
+            # Benchmarks run unbounded whatever budgets are configured
+            await main.optimize_prompt(generator=generator, evaluator=evaluator, target_model=target_model,
+                                       budget=BudgetController(max_seconds=None, max_tokens=None, max_cost=None))
+        wall_time = time.perf_counter() - started
+
+    return scenario_result("optimize_prompt",
+                           {"cases": cases, "candidates": candidates, "iterations": args.iterations},
+                           wall_time, provider)
+
+
+def benchmark_logger(cases: int, candidates: int, log_format: str, args: argparse.Namespace) -> Dict[str, Any]:
+    evaluations = [
+        {
+            "prompt": f"Candidate {index}: {ORIGINAL_PROMPT['text']}",
+            "score": 0.5,
+            "summary": "Synthetic summary",
+            "results": [
+                {"prompt": case["variables"], "model_output": "Output", "expected_output": case["expected_output"],
+                 "is_correct": True, "explanation_success": "Match", "explanation_failure": ""}
+                for case in make_dataset(cases)
+            ]
+        }
+        for index in range(candidates)
+    ]
+    prompts = [evaluation["prompt"] for evaluation in evaluations]
+
+    with tempfile.TemporaryDirectory() as log_dir:
+        logger = PerformanceLogger(log_dir, ORIGINAL_PROMPT['text'], log_format=log_format, plot_mode="off")
+        latencies = []
+        started = time.perf_counter()
+        for iteration in range(args.iterations):
+            iteration_started = time.perf_counter()
+            logger.log_iteration(iteration, prompts, evaluations)
+            logger.get_historical_prompts()
+            latencies.append(time.perf_counter() - iteration_started)
+        logger.close()
+        wall_time = time.perf_counter() - started
+        log_size = os.path.getsize(logger.get_log_file_path())
+
+    return scenario_result("performance_logger",
+                           {"cases": cases, "candidates": candidates, "iterations": args.iterations,
+                            "log_format": log_format},
+                           wall_time, None,
+                           log_iteration_latency={"mean": sum(latencies) / len(latencies), "max": max(latencies)},
+                           log_size_bytes=log_size)
+
+
+async def run_benchmarks(args: argparse.Namespace) -> Dict[str, Any]:
+    scenarios = []
+    for cases in args.cases:
+        for candidates in args.candidates:
+            scenarios.append(await benchmark_evaluation(cases, candidates, args))
+            scenarios.append(await benchmark_optimization(cases, candidates, args))
+            for log_format in ("json", "jsonl"):
+                scenarios.append(benchmark_logger(cases, candidates, log_format, args))
+
+    return {
+        "timestamp": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "mock_provider": {
+            "latency": args.latency,
+            "latency_distribution": args.latency_distribution,
+            "error_rate": args.error_rate,
+            "rate_limit_rate": args.rate_limit_rate
+        },
+        "scenarios": scenarios
+    }
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cases", type=int, nargs="+", default=[10, 50], help="dataset sizes to benchmark")
+    parser.add_argument("--candidates", type=int, nargs="+", default=[1, 3], help="candidate prompt counts")
+    parser.add_argument("--iterations", type=int, default=3, help="iterations of the optimization and log runs")
+    parser.add_argument("--latency", type=float, default=0.05, help="mean mock call latency in seconds")
+    parser.add_argument("--latency-distribution", choices=LATENCY_DISTRIBUTIONS, default="lognormal")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of calls returning an error")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="fraction of calls rejected with a 429")
+    parser.add_argument("--retry-after", type=float, default=0.05, help="Retry-After of injected 429s, in seconds")
+    parser.add_argument("--rpm", type=float, default=100000, help="requests per minute allowed by the limiter")
+    parser.add_argument("--tpm", type=float, default=100000000, help="tokens per minute allowed by the limiter")
+    parser.add_argument("--concurrency", type=int, default=20, help="initial limiter concurrency")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="path of the JSON report (defaults to benchmarks/results/)")
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    report = asyncio.run(run_benchmarks(args))
+
+    output = args.output or os.path.join(
+        "benchmarks", "results", f"benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    for scenario in report["scenarios"]:
+        parameters = ", ".join(f"{name}={value}" for name, value in scenario["parameters"].items())
+        print(f"{scenario['scenario']:<20} {parameters:<60} {scenario['wall_time']:8.3f}s "
+              f"{scenario['calls_per_second']:8.1f} calls/s")
+    print(f"\nReport written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -15,25 +15,153 @@ MAX_ITERATIONS = 10
 PARALLEL_VARIATIONS = 3
 HISTORICAL_PROMPTS_COUNT = 10 # the number of prompts to keep in memory for historical analysis
 
+# Evaluation concurrency
+MAX_CONCURRENT_REQUESTS = 20  # global cap on in-flight LLM calls during evaluation
+GENERATION_WORKERS = 10  # workers calling the target model
+JUDGE_WORKERS = 10  # workers calling the evaluation model
+PIPELINE_QUEUE_SIZE = 20  # bound of the queue in front of each pipeline stage
+JUDGE_BATCH_SIZE = 1  # output/expected pairs scored per judge request, 1 disables batching
+JUDGE_BATCH_WAIT = 0.2  # seconds a judge worker waits for a batch to fill
+
+# Local pre-scoring: resolve obvious matches and mismatches without calling the judge
+LOCAL_SCORING_ENABLED = False
+LOCAL_ACCEPT_THRESHOLD = 0.9  # token F1 at or above which an output is accepted as correct
+LOCAL_REJECT_THRESHOLD = 0.1  # token F1 at or below which an output is rejected as incorrect
+
+# Racing: evaluate candidates on growing random subsets and drop clear losers early
+RACING_ENABLED = False
+RACING_INITIAL_CASES = 5  # cases in the first round
+RACING_GROWTH_FACTOR = 2  # each round evaluates this many times more cases than the previous one
+RACING_CONFIDENCE = 0.95  # confidence level of the accuracy bounds used to drop candidates
+RACING_SEED = 0
+
+# Budgets of an optimization run, None for no limit. Once any budget is used beyond BUDGET_DEGRADE_THRESHOLD
+# iterations are degraded (fewer variations, a subset of the dataset, no summaries); at the limit the run stops
+MAX_RUN_SECONDS = None
+MAX_RUN_TOKENS = None  # prompt and completion tokens of every model call
+MAX_RUN_COST = None  # dollars, estimated from MODEL_PRICES
+BUDGET_DEGRADE_THRESHOLD = 0.8
+DEGRADED_MAX_CASES = 20  # dataset cases evaluated per prompt in degraded iterations
+
+# Early stopping: stop evaluating a prompt once its remaining cases can't change the outcome, i.e. it surely
+# reaches ACCURACY_THRESHOLD, can't beat a prompt that surely does, or can neither reach it nor beat the best score
+EARLY_STOPPING_ENABLED = False
+
+# Speculative generation: request the next suggestions from partial results while the evaluation still runs,
+# keeping them only if the final ranking of the historical prompts matches the one they were generated from
+SPECULATIVE_GENERATION = False
+SPECULATION_START_FRACTION = 0.5  # share of the iteration's cases judged before speculating
+SPECULATION_SCORE_TOLERANCE = 0.05  # largest score change of a ranked prompt that keeps the speculation valid
+
+# Deduplication: reuse the evaluation of a suggestion already evaluated on every case (up to whitespace and the
+# case of its text), and drop suggestions that are near duplicates of an evaluated prompt, requesting replacements
+# from the generator
+DEDUPLICATION_ENABLED = True
+NEAR_DUPLICATE_THRESHOLD = 0.8  # estimated shingle Jaccard similarity from which prompts are near duplicates
+SHINGLE_SIZE = 5  # characters per shingle
+MINHASH_PERMUTATIONS = 64  # length of the MinHash signatures
+MINHASH_BANDS = 16  # locality-sensitive hashing bands the signatures are split into to find candidates
+DEDUPLICATION_RETRIES = 1  # generator requests made to replace dropped (near-duplicate or invalid) suggestions
+
+# Prompt templates: suggestions are compiled before any spend and must use every variable of ORIGINAL_PROMPT and
+# no other placeholder; with repair, braces that aren't such a placeholder are escaped instead of rejecting them
+TEMPLATE_REPAIR_ENABLED = True
+
+# Minibatch evaluation: each iteration scores the candidates on a fresh stratified sample of the dataset, and a
+# prompt only becomes the best prompt once its score on a held-out split, never used for iterations, confirms it
+MINIBATCH_ENABLED = False
+MINIBATCH_SIZE = 20  # cases per iteration
+HOLDOUT_FRACTION = 0.2  # share of the dataset held out to confirm finalists
+MINIBATCH_STRATA = "length"  # "length" for input length quantiles, a case metadata field name, or None
+MINIBATCH_LENGTH_BINS = 4  # input length quantiles used as strata
+MINIBATCH_SEED = 0
+CONFIRMATION_FINALISTS = 1  # best candidates of an iteration, above the best confirmed score, checked on the holdout
+
+# Multi-sample evaluation: completions sampled per case in a single generation request (the provider's n),
+# all judged together; a case scores the share of correct samples and evaluations report the score variance
+EVALUATION_SAMPLES = 1
+
 # Model settings
 EVALUATION_MODEL = "gpt-4o-mini"  # Model used for evaluating outputs
+EVALUATION_TEMPERATURE = 0.0  # deterministic judging, which also makes judge calls cacheable
 PROMPT_GENERATOR_MODEL = "gpt-4o-mini"  # Model used for generating prompt variations
 GENERATOR_MODEL = "gpt-4o-mini"  # Model used for generating responses, the prompt will be optimized for this model
 
 # Provider settings
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 
+# Connection pool shared by all OpenAI-backed models
+MAX_CONNECTIONS = 100
+MAX_KEEPALIVE_CONNECTIONS = 20
+REQUEST_TIMEOUT = 60  # seconds
+
 # Data paths
 DATA_DIR = "data"
 DATASET_DIR = os.path.join(DATA_DIR, "dataset")
 DATASET_FILE = "dataset.json"
 LOG_DIR = "logs"
 
+# Dataset access: "memory" loads every case up front; "lazy" reads cases from the file when they are used,
+# through an index of their positions built while validating the file once; "mmap" does the same through a
+# memory map. Files ending in .jsonl hold one case per line, any other file a JSON array of cases
+DATASET_ACCESS = "memory"
+DATASET_CACHE_DIR = os.path.join(DATA_DIR, "cache", "datasets")  # validated case indexes, by file and version
+DATASET_CASE_CACHE_SIZE = 1024  # parsed cases kept in memory by lazy access
+
+# Log settings
+LOG_FORMAT = "jsonl"  # "jsonl" appends one event per line, "json" rewrites the whole log on every update
+LOG_FLUSH_EVERY = 1  # JSONL records buffered before flushing
+LOG_FSYNC = "close"  # when flushed JSONL records are forced to disk: "never", "flush" or "close"
+PLOT_MODE = "background"  # "background" redraws after each iteration off the main thread, "end" draws once
+                          # at the end of the run, "off" never plots (and never imports matplotlib)
+
+# Tracing: record per-stage timing spans and export them as a Chrome/Perfetto trace at the end of a run
+TRACING_ENABLED = False
+TRACE_DIR = LOG_DIR
+
+# Provider mode: "live" calls the API, "record" calls it and records every response to RECORDING_FILE,
+# "replay" serves recorded responses without any network access
+PROVIDER_MODE = "live"
+RECORDING_FILE = os.path.join(DATA_DIR, "recordings", "responses.jsonl")
+REPLAY_LATENCY = None  # None, seconds per call, or "recorded" to reproduce the recorded latencies
+REPLAY_LATENCY_SCALE = 1.0  # multiplier applied to recorded latencies
+
+# Checkpoints: the loop state is saved after every iteration and each evaluated case as soon as it completes,
+# so `python main.py --resume` continues an interrupted run without repeating completed model calls. The history
+# isn't saved again: it is read back from the run's log. Opt-in, or per run with `python main.py --checkpoint`
+CHECKPOINT_ENABLED = False
+CHECKPOINT_FILE = os.path.join(DATA_DIR, "checkpoints", "checkpoint.json")
+
+# Response cache settings
+CACHE_ENABLED = False  # serve repeated model calls from a persistent on-disk cache
+CACHE_FILE = os.path.join(DATA_DIR, "cache", "responses.sqlite")
+CACHE_MAX_ENTRIES = 100000
+CACHE_MAX_AGE = 7 * 24 * 60 * 60  # seconds, None to keep entries until evicted by size
+
 # Prompt generation settings
 MAX_PROMPT_LENGTH = 2000
 
 # Error handling
 MAX_RETRIES = 3
-RETRY_DELAY = 5  # seconds
+RETRY_DELAY = 5  # seconds, base of the exponential backoff between retries
+MAX_RETRY_DELAY = 60  # seconds
+
+# Client-side rate limiting, shared by every Model instance of the same model
+RATE_LIMITING_ENABLED = True
+RATE_LIMITS = {
+    "gpt-4o-mini": {"requests_per_minute": 500, "tokens_per_minute": 200000}
+}
+DEFAULT_RATE_LIMIT = {"requests_per_minute": 500, "tokens_per_minute": 200000}
+RATE_LIMIT_INITIAL_CONCURRENCY = 10
+RATE_LIMIT_MIN_CONCURRENCY = 1
+RATE_LIMIT_MAX_CONCURRENCY = 50
+ESTIMATED_COMPLETION_TOKENS = 256  # added to the prompt size when estimating a request's tokens
+
+# Dollars per million tokens, used to report the cost of each prompt, iteration and run.
+# Cached prompt tokens are billed at "cached_prompt"; models without an entry are reported without a cost.
+MODEL_PRICES = {
+    "gpt-4o-mini": {"prompt": 0.15, "cached_prompt": 0.075, "completion": 0.60},
+    "gpt-4o": {"prompt": 2.50, "cached_prompt": 1.25, "completion": 10.00}
+}
 
 ACCURACY_THRESHOLD = 0.95
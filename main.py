@@ -1,8 +1,22 @@
+import argparse
 import asyncio
+import os
+from typing import List, Optional, Tuple
 from optimizer.prompt_generator import PromptGenerator
 from optimizer.prompt_evaluator import Evaluator
 from optimizer.model_interface import Model
-from utils.performance_logger import create_logger
+from providers.openai_provider import OpenAIProvider
+from providers.record_replay_provider import close_recordings
+from utils.performance_logger import create_logger, read_log
+from utils.checkpoint import Checkpoint
+from utils.response_cache import get_response_cache
+from optimizer.rate_limiter import get_rate_limiter_states
+from optimizer.usage_tracker import UsageTracker, track_usage, format_usage
+from optimizer.budget import BudgetController, BUDGET_DEGRADED, BUDGET_EXHAUSTED
+from optimizer.speculation import EvaluationProgress, SpeculativeGeneration, history_context
+from optimizer.minibatch import MinibatchSampler
+from optimizer.prompt_template import TemplateError
+from utils.tracer import tracer
 from config import (
     MAX_ITERATIONS,
     PARALLEL_VARIATIONS,
@@ -10,57 +24,233 @@ from config import (
     GENERATOR_MODEL,
     ORIGINAL_PROMPT,
     ACCURACY_THRESHOLD,
-    LOG_DIR
+    LOG_DIR,
+    CACHE_ENABLED,
+    TRACE_DIR,
+    DEGRADED_MAX_CASES,
+    DEDUPLICATION_RETRIES,
+    CHECKPOINT_ENABLED,
+    CHECKPOINT_FILE,
+    SPECULATIVE_GENERATION,
+    MINIBATCH_ENABLED,
+    CONFIRMATION_FINALISTS
 )
 
 
-async def optimize_prompt() -> str:
-    generator = PromptGenerator(PROMPT_GENERATOR_MODEL)
-    logger = create_logger(LOG_DIR, ORIGINAL_PROMPT['text'])
-    evaluator = Evaluator(logger)
-    target_model = Model(GENERATOR_MODEL)
+async def optimize_prompt(generator: Optional[PromptGenerator] = None,
+                          evaluator: Optional[Evaluator] = None,
+                          target_model: Optional[Model] = None,
+                          budget: Optional[BudgetController] = None,
+                          checkpoint: Optional[Checkpoint] = None,
+                          resume: bool = False,
+                          sampler: Optional[MinibatchSampler] = None) -> str:
+    # Components can be injected, e.g. backed by a mock provider for benchmarking
+    generator = generator or PromptGenerator(PROMPT_GENERATOR_MODEL)
+    evaluator = evaluator or Evaluator(create_logger(LOG_DIR, ORIGINAL_PROMPT['text']))
+    logger = evaluator.logger
+    target_model = target_model or Model(GENERATOR_MODEL)
+    budget = budget or BudgetController()
+    if sampler is None and MINIBATCH_ENABLED:
+        sampler = MinibatchSampler(evaluator.dataset)
 
     current_prompts = [ORIGINAL_PROMPT['text']]
     best_prompt = ORIGINAL_PROMPT['text']
     best_score = 0
+    run_usage = UsageTracker()
+
+    def save_checkpoint(iteration: int, evaluated: bool):
+        # Only the loop state: the history is in the run's log, which is read back on resume
+        if checkpoint is not None:
+            checkpoint.save({
+                "iteration": iteration,
+                "evaluated": evaluated,
+                "current_prompts": current_prompts,
+                "best_prompt": best_prompt,
+                "best_score": best_score,
+                "log_file": logger.get_log_file_path(),
+                "logged_iterations": len(logger.log_data["optimization_logs"]),
+                "usage": run_usage.models,
+                "elapsed": budget.elapsed()
+            }, new_iteration=not evaluated)
 
     print(f"Starting prompt optimization process...")
     print(f"Original prompt: {ORIGINAL_PROMPT['text']}")
     print(f"Target accuracy threshold: {ACCURACY_THRESHOLD}")
+    if sampler is not None:
+        sampler_stats = sampler.get_stats()
+        print(f"Minibatch evaluation: {sampler_stats['minibatch_size']} of {sampler_stats['train_cases']} cases "
+              f"per iteration in {sampler_stats['strata']} strata, {sampler_stats['holdout_cases']} held out")
+
+    start_iteration = 0
+    elapsed = 0.0
+    resumed_evaluations = None
+    state = checkpoint.load() if checkpoint is not None and resume else None
+    optimization_logs = None
+    if state is not None:
+        if os.path.exists(state["log_file"]):
+            # Iterations logged after the checkpoint was saved are evaluated again, from the case journal
+            optimization_logs = read_log(state["log_file"])["optimization_logs"][:state["logged_iterations"]]
+        if optimization_logs is None or len(optimization_logs) < state["logged_iterations"]:
+            print(f"The log of the interrupted run at {state['log_file']} is missing or incomplete, "
+                  f"starting a new run")
+            state = None
+    if state is not None:
+        start_iteration = state["iteration"]
+        elapsed = state["elapsed"]
+        current_prompts = state["current_prompts"]
+        best_prompt = state["best_prompt"]
+        best_score = state["best_score"]
+        logger.restore_history(optimization_logs)
+        for log in optimization_logs:
+            evaluator.index_evaluations(log["evaluations"])
+        run_usage.models.update(state["usage"])
+        if state["evaluated"]:
+            # The interruption came after the evaluation of this iteration, only its suggestions are missing
+            resumed_evaluations = optimization_logs[-1]["evaluations"]
+        print(f"Resuming from iteration {start_iteration + 1}, "
+              f"{len(checkpoint.results)} evaluated cases recovered")
+    elif checkpoint is not None:
+        if resume and not os.path.exists(checkpoint.path):
+            print(f"No checkpoint found at {checkpoint.path}, starting a new run")
+        checkpoint.clear()
+    evaluator.checkpoint = checkpoint
+
+    budget.start(elapsed)
+    # Evaluations check the budget as they go, so they stop as soon as it is exhausted
+    budget.track(run_usage)
+    for iteration in range(start_iteration, MAX_ITERATIONS):
+        budget_status = budget.check(run_usage.get_summary())
+        if budget_status == BUDGET_EXHAUSTED:
+            print(f"\nStopping: {budget.reason}. Returning the best prompt so far.")
+            break
+        # Close to the budget, iterations are cut down to their essentials
+        degraded = budget_status == BUDGET_DEGRADED
 
-    for iteration in range(MAX_ITERATIONS):
         print(f"\nIteration {iteration + 1}/{MAX_ITERATIONS}")
+        if degraded:
+            print(f"Degraded iteration: {budget.reason}")
+
+        variations = max(1, PARALLEL_VARIATIONS // 2) if degraded else PARALLEL_VARIATIONS
 
         # Evaluate current prompts
-        evaluations = await evaluator.evaluate_prompts(current_prompts, target_model, iteration)
+        speculation = None
+        if resumed_evaluations is not None:
+            evaluations, resumed_evaluations = resumed_evaluations, None
+        else:
+            with track_usage(run_usage):
+                progress = None
+                if SPECULATIVE_GENERATION:
+                    # The generator works on the next suggestions while the evaluation runs
+                    progress = EvaluationProgress()
+                    speculation = SpeculativeGeneration(generator, logger, progress, variations)
+                    speculation.start()
+                evaluations = await evaluator.evaluate_prompts(current_prompts, target_model, iteration,
+                                                               max_cases=DEGRADED_MAX_CASES if degraded else None,
+                                                               summarize=not degraded, best_score=best_score,
+                                                               progress=progress,
+                                                               case_indices=sampler.sample(iteration)
+                                                               if sampler is not None else None,
+                                                               budget=budget)
 
         # Print evaluation results
         print("\nPrompt Evaluations:")
         for eval in evaluations:
             print(f"Prompt: {eval['prompt']}")
             print(f"Score: {eval['score']:.4f}")
+            if evaluator.samples > 1:
+                print(f"Score variance across {evaluator.samples} samples: {eval['score_variance']:.4f}")
+            if eval.get('eliminated'):
+                print(f"Eliminated early after {eval['total_cases']} cases")
+            if eval.get('budget_exhausted'):
+                print(f"Stopped by the budget after {eval['total_cases']} cases")
+            if eval.get('stopped_early'):
+                print(f"Stopped early ({eval['stop_reason']}) after {eval['total_cases']} cases, "
+                      f"{eval['skipped_cases']} skipped")
+            if eval.get('usage'):
+                print(f"Usage: {format_usage(eval['usage'])}")
             print("---------------")
 
+        print("\nPipeline stages:")
+        for stage_name, stats in evaluator.get_pipeline_stats().items():
+            print(f"{stage_name}: {stats['workers']} workers, {stats['processed']} processed "
+                  f"in {stats['batches']} batches, "
+                  f"max queue depth {stats['max_queue_depth']}/{stats['queue_size']}, "
+                  f"utilization {stats['utilization']:.0%}")
+
+        usage_stats = evaluator.get_usage_stats()
+        if usage_stats is not None:
+            print(f"\nIteration usage: {format_usage(usage_stats)}")
+
+        for model_name, state in get_rate_limiter_states().items():
+            print(f"Rate limiter {model_name}: concurrency limit {state['concurrency_limit']:.1f}, "
+                  f"{state['rate_limited']} rate limited responses")
+
+        early_stopping_stats = evaluator.get_early_stopping_stats()
+        if early_stopping_stats is not None and early_stopping_stats['stopped_prompts']:
+            print(f"Early stopping: {early_stopping_stats['stopped_prompts']} prompts stopped, "
+                  f"{early_stopping_stats['skipped_cases']} cases skipped, "
+                  f"{early_stopping_stats['cancelled_calls']} in-flight calls cancelled")
+
+        local_scoring_stats = evaluator.get_local_scoring_stats()
+        if local_scoring_stats is not None:
+            print(f"Local scoring: {local_scoring_stats['judge_calls_saved']} judge evaluations saved "
+                  f"({local_scoring_stats['resolved_correct']} correct, "
+                  f"{local_scoring_stats['resolved_incorrect']} incorrect), "
+                  f"{local_scoring_stats['forwarded']} forwarded to the judge")
+
+        template_stats = evaluator.get_template_stats()
+        print(f"Prompt templates: {template_stats['compiled']} compiled in "
+              f"{template_stats['compile_seconds'] * 1000:.2f} ms, {template_stats['renders']} renders in "
+              f"{template_stats['render_seconds'] * 1000:.2f} ms, {template_stats['repaired']} suggestions repaired, "
+              f"{template_stats['rejected']} rejected")
+
         # Find the best performing prompt
-        for eval in evaluations:
-            if eval['score'] > best_score:
-                best_score = eval['score']
-                best_prompt = eval['prompt']
+        confirmation_cases = None
+        if sampler is not None and sampler.holdout:
+            # Minibatch scores only nominate finalists, the held-out score decides
+            confirmation_cases = sampler.holdout
+        elif degraded and DEGRADED_MAX_CASES < len(evaluator.dataset):
+            # Scores on a subset of the cases can't be compared with full dataset scores
+            confirmation_cases = list(range(len(evaluator.dataset)))
+        if confirmation_cases is not None:
+            with track_usage(run_usage):
+                confirmed = await confirm_finalists(evaluator, target_model, confirmation_cases, evaluations,
+                                                    best_score, iteration, budget)
+            if confirmed is not None:
+                best_prompt, best_score = confirmed
+        else:
+            best_prompt, best_score = pick_best(evaluations, best_prompt, best_score)
 
         print(f"\nBest prompt so far: {best_prompt}")
         print(f"Best score: {best_score:.4f}")
+        save_checkpoint(iteration, evaluated=True)
 
         # Check if we've reached our goal
         if best_score >= ACCURACY_THRESHOLD:
             print(f"\nAccuracy threshold reached! Optimization complete.")
+            if speculation is not None:
+                await speculation.cancel()
+            break
+
+        if budget.check(run_usage.get_summary()) == BUDGET_EXHAUSTED:
+            print(f"\nStopping: {budget.reason}. Returning the best prompt so far.")
+            if speculation is not None:
+                await speculation.cancel()
             break
 
         # Get historical prompts
         historical_prompts = logger.get_historical_prompts()
 
-        # Generate new prompt suggestions
-        prompts_and_evals = [(eval['prompt'], eval['summary'], eval['score']) for eval in historical_prompts]
-        suggestions = await generator.generate_suggestions(prompts_and_evals, PARALLEL_VARIATIONS)
+        # Generate new prompt suggestions, unless the speculative ones still hold
+        prompts_and_evals = history_context(historical_prompts)
+        suggestions = await speculation.resolve(prompts_and_evals) if speculation is not None else None
+        if suggestions is not None:
+            print("\nUsing the suggestions generated speculatively during the evaluation")
+        else:
+            if speculation is not None:
+                print("\nSpeculative suggestions discarded, the ranking changed since they were requested")
+            with track_usage(run_usage):
+                suggestions = await generator.generate_suggestions(prompts_and_evals, variations)
 
         print("\nNew prompt suggestions:")
         for suggestion in suggestions['suggestions']:
@@ -70,18 +260,160 @@ async def optimize_prompt() -> str:
 
         # Prepare for next iteration
         current_prompts = [suggestion['prompt'] for suggestion in suggestions['suggestions']]
+        with track_usage(run_usage):
+            current_prompts = await select_new_prompts(generator, evaluator, current_prompts, prompts_and_evals,
+                                                       variations)
+        save_checkpoint(iteration + 1, evaluated=False)
 
     # Log the optimized prompt
-    logger.log_optimized_prompt(best_prompt)
+    usage_summary = run_usage.get_summary()
+    logger.log_optimized_prompt(best_prompt, usage=usage_summary)
+    logger.close()
+    if checkpoint is not None:
+        # The run completed, there is nothing left to resume
+        checkpoint.clear()
+    print(f"\nTotal usage: {format_usage(usage_summary)}")
+
+    if tracer.enabled:
+        trace_file = os.path.join(TRACE_DIR, f"trace_{logger.timestamp}.json")
+        tracer.export_chrome_trace(trace_file)
+        print(f"\nTrace written to {trace_file} (open it in chrome://tracing or ui.perfetto.dev)")
+        print(tracer.format_summary())
+
+    if CACHE_ENABLED:
+        cache_stats = get_response_cache().get_stats()
+        print(f"\nResponse cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses, "
+              f"{cache_stats['entries']} entries")
 
     return best_prompt
 
 
-async def main():
-    optimized_prompt = await optimize_prompt()
+def pick_best(evaluations: List[dict], best_prompt: str, best_score: float) -> Tuple[str, float]:
+    """
+    The best prompt and score once the iteration's evaluations are in.
+
+    Prompts eliminated by racing or stopped by the budget were only scored on the cases they
+    saw, so they don't compete.
+    """
+    for evaluation in evaluations:
+        if evaluation.get('eliminated') or evaluation.get('budget_exhausted'):
+            continue
+        if evaluation['score'] > best_score:
+            best_prompt, best_score = evaluation['prompt'], evaluation['score']
+    return best_prompt, best_score
+
+
+async def confirm_finalists(evaluator: Evaluator, target_model: Model, case_indices: List[int],
+                            evaluations: List[dict], best_score: float, iteration: int,
+                            budget: Optional[BudgetController] = None) -> Optional[Tuple[str, float]]:
+    """
+    Score the iteration's best candidates on case_indices, returning the best one that beats best_score.
+
+    case_indices are the held-out split of minibatch evaluation, or the whole dataset after a
+    degraded iteration. Up to CONFIRMATION_FINALISTS candidates whose iteration score is above
+    best_score are confirmed. Nothing is confirmed once the budget is exhausted, and a
+    confirmation it cuts short doesn't count.
+    """
+    if budget is not None and budget.is_exhausted():
+        return None
+    ranked = sorted(evaluations, key=lambda evaluation: evaluation['score'], reverse=True)
+    finalists = list(dict.fromkeys(evaluation['prompt'] for evaluation in ranked
+                                   if evaluation['score'] > best_score
+                                   and not evaluation.get('budget_exhausted')))[:CONFIRMATION_FINALISTS]
+    if not finalists:
+        return None
+    confirmations = await evaluator.confirm_prompts(finalists, target_model, case_indices, iteration, budget)
+    confirmed = None
+    for confirmation in confirmations:
+        if confirmation['total_cases'] < len(case_indices):
+            print(f"Confirmation of {confirmation['prompt']!r} stopped by the budget")
+            continue
+        print(f"Confirmed score of {confirmation['prompt']!r} on {len(case_indices)} cases: "
+              f"{confirmation['score']:.4f}")
+        if confirmation['score'] > (confirmed[1] if confirmed is not None else best_score):
+            confirmed = (confirmation['prompt'], confirmation['score'])
+    return confirmed
+
+
+async def select_new_prompts(generator: PromptGenerator, evaluator: Evaluator, prompts: List[str],
+                             prompts_and_evals: List[Tuple[str, str, float]], variations: int) -> List[str]:
+    """
+    Drop the suggestions that can't be evaluated or that repeat evaluated prompts, before anything is spent on them.
+
+    Suggestions are compiled first: those that don't compile (even repaired) are rejected.
+    With deduplication, near duplicates of evaluated prompts or of each other are dropped too.
+    Up to DEDUPLICATION_RETRIES further suggestion requests replace the dropped ones. If every
+    suggestion is dropped, the valid ones (near duplicates, repaired where needed) are evaluated
+    anyway rather than stalling the run; if none is valid, the best prompt so far is.
+    """
+    prompt_index = evaluator.prompt_index
+    # Every suggestion that compiles, near duplicates included, for when they are all dropped
+    valid: List[str] = []
+
+    def screen(candidates: List[str], accepted: List[str]) -> Tuple[List[str], List[str]]:
+        prepared, rejected = evaluator.prepare_prompts(candidates)
+        valid.extend(prepared)
+        for prompt, reason in rejected:
+            print(f"\nRejected suggestion {prompt!r}: {reason}")
+        if prompt_index is None:
+            return prepared, []
+        return prompt_index.select(prepared, accepted=accepted)
+
+    kept, near_duplicates = screen(prompts, [])
+    dropped = len(prompts) - len(kept)
+    for _ in range(DEDUPLICATION_RETRIES):
+        if not dropped or len(kept) >= variations:
+            break
+        print(f"\nDropped {dropped} suggestions, requesting replacements")
+        replacements = await generator.generate_suggestions(prompts_and_evals, variations - len(kept))
+        candidates = [suggestion['prompt'] for suggestion in replacements.get('suggestions', [])]
+        new_prompts, near_duplicates = screen(candidates, kept)
+        dropped = len(candidates) - len(new_prompts)
+        kept.extend(new_prompts)
+    if not kept and valid:
+        print("\nEvery suggestion was dropped, evaluating the valid ones anyway")
+        return list(dict.fromkeys(valid))
+    if not kept:
+        for prompt, _, _ in sorted(prompts_and_evals, key=lambda entry: entry[2], reverse=True):
+            try:
+                evaluator.compile_prompt(prompt)
+            except TemplateError:
+                continue
+            print("\nNo suggestion is valid, evaluating the best prompt so far again")
+            return [prompt]
+        raise TemplateError("Neither the suggestions nor the evaluated prompts compile against the dataset")
+    if near_duplicates:
+        print(f"\nDropped {len(near_duplicates)} near-duplicate suggestions")
+    reused = sum(1 for prompt in kept if evaluator.reusable_evaluation(prompt) is not None)
+    if reused:
+        print(f"Reusing the earlier evaluations of {reused} suggestions")
+    return kept
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Iteratively optimize a prompt against the dataset.")
+    parser.add_argument("--checkpoint", action="store_true",
+                        help=f"save a checkpoint to {CHECKPOINT_FILE}, to resume the run if it is interrupted")
+    parser.add_argument("--resume", action="store_true",
+                        help=f"continue the interrupted run saved in {CHECKPOINT_FILE}")
+    return parser.parse_args(argv)
+
+
+async def main(args: argparse.Namespace):
+    checkpoint = Checkpoint(CHECKPOINT_FILE) if CHECKPOINT_ENABLED or args.checkpoint or args.resume else None
+    evaluator = Evaluator(create_logger(LOG_DIR, ORIGINAL_PROMPT['text']))
+    try:
+        optimized_prompt = await optimize_prompt(evaluator=evaluator, checkpoint=checkpoint, resume=args.resume)
+    finally:
+        # A lazily read dataset keeps its file (and memory map) open until then
+        evaluator.close()
+        if checkpoint is not None:
+            checkpoint.close()
+        await OpenAIProvider.close_shared_client()
+        close_recordings()
     print(f"\nOptimization process completed.")
     print(f"Final optimized prompt: {optimized_prompt}")
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,107 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Dict, Optional, Set, Tuple
+from config import MAX_RUN_SECONDS, MAX_RUN_TOKENS, MAX_RUN_COST, BUDGET_DEGRADE_THRESHOLD
+from optimizer.usage_tracker import UsageTracker
+
+BUDGET_OK = "ok"
+BUDGET_DEGRADED = "degraded"
+BUDGET_EXHAUSTED = "exhausted"
+
+
+class BudgetController:
+    """
+    Tracks an optimization run against wall-clock, token and dollar budgets.
+
+    check() reports the run as degraded once any budget is used beyond degrade_threshold, and as
+    exhausted once any budget is used up. Budgets left as None are unlimited. Calls to models
+    without a price in MODEL_PRICES don't count towards the cost budget. Calls cancelled in
+    flight count with their estimated tokens.
+
+    Once it tracks the run's usage, model calls run through run() are refused as soon as a
+    budget is used up, and those in flight are cancelled, so an evaluation can't overshoot it.
+    """
+
+    def __init__(self,
+                 max_seconds: Optional[float] = MAX_RUN_SECONDS,
+                 max_tokens: Optional[int] = MAX_RUN_TOKENS,
+                 max_cost: Optional[float] = MAX_RUN_COST,
+                 degrade_threshold: float = BUDGET_DEGRADE_THRESHOLD):
+        self.max_seconds = max_seconds
+        self.max_tokens = max_tokens
+        self.max_cost = max_cost
+        self.degrade_threshold = degrade_threshold
+        self.started = time.monotonic()
+        self.reason: Optional[str] = None
+        self.usage: Optional[UsageTracker] = None
+        self.cancelled_calls = 0
+        self._in_flight: Set[asyncio.Task] = set()
+
+    def track(self, usage: UsageTracker):
+        """Follow the usage of the run, so the budget can be checked while an iteration runs."""
+        self.usage = usage
+
+    def is_exhausted(self) -> bool:
+        return self.usage is not None and self.check(self.usage.get_summary()) == BUDGET_EXHAUSTED
+
+    async def run(self, awaitable: Awaitable[Any]) -> Tuple[bool, Any]:
+        """
+        Await a model call unless the budget is exhausted, cancelling every call in flight once it is.
+
+        Returns (True, result), or (False, None) if the call was refused or cancelled.
+        Cancellation of the caller itself propagates.
+        """
+        if self.is_exhausted():
+            if asyncio.iscoroutine(awaitable):
+                awaitable.close()
+            return False, None
+        task = asyncio.ensure_future(awaitable)
+        self._in_flight.add(task)
+        try:
+            result = await task
+        except asyncio.CancelledError:
+            if task.cancelled() and not asyncio.current_task().cancelling():
+                self.cancelled_calls += 1
+                return False, None
+            raise
+        finally:
+            self._in_flight.discard(task)
+        if self.is_exhausted():
+            for other in list(self._in_flight):
+                other.cancel()
+        return True, result
+
+    def start(self, elapsed: float = 0.0):
+        """Start the clock, counting elapsed seconds already spent, e.g. before a resumed run was interrupted."""
+        self.started = time.monotonic() - elapsed
+        self.reason = None
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def get_usage(self, usage: Dict[str, Any]) -> Dict[str, float]:
+        """Fraction used of each limited budget, given a UsageTracker summary of the run so far."""
+        fractions = {}
+        if self.max_seconds is not None:
+            fractions["time"] = self.elapsed() / self.max_seconds
+        if self.max_tokens is not None:
+            tokens = usage["prompt_tokens"] + usage["completion_tokens"] + usage.get("cancelled_tokens", 0)
+            fractions["tokens"] = tokens / self.max_tokens
+        if self.max_cost is not None:
+            fractions["cost"] = (usage["cost"] or 0.0) / self.max_cost
+        return fractions
+
+    def check(self, usage: Dict[str, Any]) -> str:
+        """Return BUDGET_OK, BUDGET_DEGRADED or BUDGET_EXHAUSTED, naming the deciding budget in reason."""
+        fractions = self.get_usage(usage)
+        if not fractions:
+            return BUDGET_OK
+        budget, fraction = max(fractions.items(), key=lambda item: item[1])
+        if fraction >= 1:
+            self.reason = f"{budget} budget exhausted"
+            return BUDGET_EXHAUSTED
+        if fraction >= self.degrade_threshold:
+            self.reason = f"{fraction:.0%} of the {budget} budget used"
+            return BUDGET_DEGRADED
+        self.reason = None
+        return BUDGET_OK
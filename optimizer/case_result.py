@@ -0,0 +1,103 @@
+import hashlib
+import json
+from collections.abc import Mapping
+from typing import Any, Dict, Iterator, List, Optional
+
+_KEYS = ('prompt', 'model_output', 'expected_output', 'is_correct', 'explanation_success', 'explanation_failure')
+_SAMPLE_KEYS = ('model_outputs', 'sample_correct', 'sample_score')
+
+
+def case_id(case: Dict[str, Any]) -> str:
+    """Short content hash of a dataset case, to recognize it in logs whatever its position."""
+    payload = json.dumps(case, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:16]
+
+
+class CaseResult(Mapping):
+    """
+    The judged outcome of one (prompt, case) pair.
+
+    Rather than copies of the formatted prompt and the expected output, it keeps references to
+    the prompt template and the dataset case, and formats the prompt only when 'prompt' is read.
+    Only the explanation matching the verdict is stored. It reads like the result dicts it
+    replaces, and is written to logs and checkpoints as a compact record of the case index and
+    hash, outputs and verdict (see to_json).
+    """
+
+    __slots__ = ('template', 'case', 'case_index', 'case_id', 'model_output', 'is_correct', 'explanation',
+                 'model_outputs', 'sample_correct')
+
+    def __init__(self, template: str, case: Dict[str, Any], case_index: int, case_id: str, model_output: str,
+                 is_correct: bool, explanation: str = '', model_outputs: Optional[List[str]] = None,
+                 sample_correct: Optional[List[bool]] = None):
+        self.template = template
+        self.case = case
+        self.case_index = case_index
+        self.case_id = case_id
+        self.model_output = model_output
+        self.is_correct = is_correct
+        self.explanation = explanation
+        # Set only when the case was evaluated on several samples, with one byte per sample verdict
+        self.model_outputs = tuple(model_outputs) if model_outputs is not None else None
+        self.sample_correct = bytes(sample_correct) if sample_correct is not None else None
+
+    @classmethod
+    def from_record(cls, record: Dict[str, Any], template: str, case: Dict[str, Any], case_index: int,
+                    case_id: str) -> 'CaseResult':
+        """Rebuild a result from its record, as written by to_json or as a full result dict."""
+        if isinstance(record, CaseResult):
+            return record
+        explanation = record.get('explanation')
+        if explanation is None:
+            explanation = record.get('explanation_success') or record.get('explanation_failure') or ''
+        model_outputs = record.get('model_outputs')
+        return cls(template, case, case_index, case_id,
+                   model_output=record.get('model_output', model_outputs[0] if model_outputs else ''),
+                   is_correct=record['is_correct'], explanation=explanation, model_outputs=model_outputs,
+                   sample_correct=record.get('sample_correct'))
+
+    @property
+    def sample_score(self) -> Optional[float]:
+        if self.sample_correct is None:
+            return None
+        return sum(self.sample_correct) / len(self.sample_correct) if self.sample_correct else 0.0
+
+    def _keys(self) -> tuple:
+        return _KEYS + _SAMPLE_KEYS if self.sample_correct is not None else _KEYS
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self._keys():
+            raise KeyError(key)
+        if key == 'prompt':
+            return self.template.format(**self.case['variables'])
+        if key == 'expected_output':
+            return self.case['expected_output']
+        if key == 'explanation_success':
+            return self.explanation if self.is_correct else ''
+        if key == 'explanation_failure':
+            return self.explanation if not self.is_correct else ''
+        if key == 'model_outputs':
+            return list(self.model_outputs)
+        if key == 'sample_correct':
+            return [bool(is_correct) for is_correct in self.sample_correct]
+        return getattr(self, key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._keys())
+
+    def __len__(self) -> int:
+        return len(self._keys())
+
+    def __repr__(self) -> str:
+        return f"CaseResult(case={self.case_index}, is_correct={self.is_correct})"
+
+    def to_json(self) -> Dict[str, Any]:
+        record = {'case': self.case_index, 'case_id': self.case_id}
+        if self.sample_correct is not None:
+            record['model_outputs'] = list(self.model_outputs)
+            record['sample_correct'] = self['sample_correct']
+        else:
+            record['model_output'] = self.model_output
+        record['is_correct'] = self.is_correct
+        record['explanation'] = self.explanation
+        return record
@@ -0,0 +1,120 @@
+import asyncio
+from typing import Any, Awaitable, Dict, List, Optional, Set, Tuple
+
+THRESHOLD_REACHED = "threshold_reached"  # the prompt reaches the accuracy threshold whatever its remaining cases
+ITERATION_SETTLED = "iteration_settled"  # another prompt reaches the threshold with a score this one can't beat
+CANNOT_WIN = "cannot_win"  # the prompt can neither reach the threshold nor beat the best score
+
+
+class _PromptProgress:
+    __slots__ = ("judged", "correct", "stop_reason")
+
+    def __init__(self):
+        self.judged = 0
+        self.correct = 0.0
+        self.stop_reason: Optional[str] = None
+
+
+class EarlyStopping:
+    """
+    Stops evaluating prompts whose outcome the remaining cases can no longer change.
+
+    With `correct` of `judged` cases right out of `total_cases`, a prompt's final score lies
+    between correct / total_cases and (correct + total_cases - judged) / total_cases. Once the
+    lower bound of a prompt reaches the threshold, the optimization will stop after this
+    iteration: that prompt is stopped, and so is every prompt whose upper bound doesn't beat
+    the highest such lower bound. The others go on until they reach the threshold too or can
+    no longer beat it. Without such a prompt, a prompt whose upper bound is below the
+    threshold and not above the best score (of previous iterations, or the lower bound of
+    another prompt) can't be chosen and is stopped on its own. The score observed on the
+    judged cases lies between the bounds, so a stopped prompt can't be mistaken for the best one.
+
+    Model calls run through run() are cancelled as soon as every prompt they serve is stopped.
+    """
+
+    def __init__(self, prompts: int, total_cases: int, threshold: float, best_score: Optional[float] = None):
+        self.total_cases = total_cases
+        self.threshold = threshold
+        self.best_score = best_score
+        self.progress = [_PromptProgress() for _ in range(prompts)]
+        self.cancelled_calls = 0
+        self._in_flight: Set[Tuple[frozenset, asyncio.Task]] = set()
+
+    def is_stopped(self, position: int) -> bool:
+        return self.progress[position].stop_reason is not None
+
+    def get_stop_reason(self, position: int) -> Optional[str]:
+        return self.progress[position].stop_reason
+
+    def record(self, position: int, score: float):
+        """Count a judged case, scoring 1 if correct, 0 if not, or the share of its correct samples."""
+        progress = self.progress[position]
+        progress.judged += 1
+        progress.correct += float(score)
+        self._update()
+
+    def _min_score(self, progress: _PromptProgress) -> float:
+        return progress.correct / self.total_cases
+
+    def _max_score(self, progress: _PromptProgress) -> float:
+        return (progress.correct + self.total_cases - progress.judged) / self.total_cases
+
+    def _update(self):
+        if self.total_cases == 0:
+            return
+        active = [progress for progress in self.progress if progress.stop_reason is None]
+        if not active:
+            return
+
+        leader = max(self._min_score(progress) for progress in self.progress)
+        if leader >= self.threshold:
+            for progress in active:
+                if self._min_score(progress) >= self.threshold:
+                    progress.stop_reason = THRESHOLD_REACHED
+                # Its best case ties at most with the leader's worst, so it can't be picked over it
+                elif self._max_score(progress) <= leader:
+                    progress.stop_reason = ITERATION_SETTLED
+        else:
+            for progress in active:
+                best = max([self.best_score or 0.0] + [self._min_score(other) for other in self.progress
+                                                       if other is not progress])
+                max_score = self._max_score(progress)
+                # A prompt with cases left whose best case still doesn't beat the best score
+                if max_score < self.threshold and max_score <= best and progress.judged < self.total_cases:
+                    progress.stop_reason = CANNOT_WIN
+        self._cancel_settled()
+
+    def _cancel_settled(self):
+        for positions, task in list(self._in_flight):
+            if all(self.is_stopped(position) for position in positions) and not task.done():
+                task.cancel()
+
+    async def run(self, positions: List[int], awaitable: Awaitable[Any]) -> Tuple[bool, Any]:
+        """
+        Await a model call serving the prompts at positions.
+
+        Returns (True, result), or (False, None) if the call was cancelled because every one of
+        those prompts got stopped meanwhile. Cancellation of the caller itself propagates.
+        """
+        if all(self.is_stopped(position) for position in positions):
+            if asyncio.iscoroutine(awaitable):
+                awaitable.close()
+            return False, None
+        task = asyncio.ensure_future(awaitable)
+        entry = (frozenset(positions), task)
+        self._in_flight.add(entry)
+        try:
+            return True, await task
+        except asyncio.CancelledError:
+            if task.cancelled() and not asyncio.current_task().cancelling():
+                self.cancelled_calls += 1
+                return False, None
+            raise
+        finally:
+            self._in_flight.discard(entry)
+
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            "stopped_prompts": sum(1 for progress in self.progress if progress.stop_reason is not None),
+            "cancelled_calls": self.cancelled_calls
+        }
@@ -0,0 +1,115 @@
+import re
+import string
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from config import LOCAL_ACCEPT_THRESHOLD, LOCAL_REJECT_THRESHOLD
+
+_PUNCTUATION = str.maketrans('', '', string.punctuation)
+_WHITESPACE = re.compile(r'\s+')
+
+
+class LocalScorer:
+    """
+    Network-free scoring tier run before the LLM judge.
+
+    An output is resolved locally when it matches the expected output after normalization,
+    or when its token F1 against the expected output is at least accept_threshold (correct)
+    or at most reject_threshold (incorrect). Everything in between is left to the judge.
+    """
+
+    def __init__(self, accept_threshold: float = LOCAL_ACCEPT_THRESHOLD,
+                 reject_threshold: float = LOCAL_REJECT_THRESHOLD):
+        if reject_threshold > accept_threshold:
+            raise ValueError("reject_threshold must not exceed accept_threshold")
+        self.accept_threshold = accept_threshold
+        self.reject_threshold = reject_threshold
+        self.reset_stats()
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return _WHITESPACE.sub(' ', (text or '').lower().translate(_PUNCTUATION)).strip()
+
+    @staticmethod
+    def token_f1(outputs: List[str], expected_outputs: List[str]) -> np.ndarray:
+        """Token-level F1 of each normalized output against its expected output, computed for the whole batch."""
+        output_tokens = [LocalScorer.normalize(text).split() for text in outputs]
+        expected_tokens = [LocalScorer.normalize(text).split() for text in expected_outputs]
+
+        vocabulary: Dict[str, int] = {}
+        for tokens in output_tokens + expected_tokens:
+            for token in tokens:
+                vocabulary.setdefault(token, len(vocabulary))
+
+        output_counts = LocalScorer._count_matrix(output_tokens, vocabulary)
+        expected_counts = LocalScorer._count_matrix(expected_tokens, vocabulary)
+
+        overlap = np.minimum(output_counts, expected_counts).sum(axis=1)
+        output_lengths = output_counts.sum(axis=1)
+        expected_lengths = expected_counts.sum(axis=1)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            precision = np.where(output_lengths > 0, overlap / output_lengths, 0.0)
+            recall = np.where(expected_lengths > 0, overlap / expected_lengths, 0.0)
+            f1 = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+        return f1
+
+    @staticmethod
+    def _count_matrix(token_lists: List[List[str]], vocabulary: Dict[str, int]) -> np.ndarray:
+        counts = np.zeros((len(token_lists), max(len(vocabulary), 1)), dtype=np.int32)
+        rows = [row for row, tokens in enumerate(token_lists) for _ in tokens]
+        columns = [vocabulary[token] for tokens in token_lists for token in tokens]
+        np.add.at(counts, (rows, columns), 1)
+        return counts
+
+    def score(self, pairs: List[Tuple[str, str]]) -> List[Optional[Dict[str, Any]]]:
+        """
+        Resolve what can be resolved locally.
+
+        Returns one entry per (model_output, expected_output) pair: an evaluation result
+        shaped like Evaluator.evaluate_output's, or None when the pair needs the judge.
+        """
+        if not pairs:
+            return []
+
+        outputs = [model_output for model_output, _ in pairs]
+        expected_outputs = [expected_output for _, expected_output in pairs]
+        f1_scores = self.token_f1(outputs, expected_outputs)
+
+        results: List[Optional[Dict[str, Any]]] = []
+        for model_output, expected_output, f1 in zip(outputs, expected_outputs, f1_scores):
+            if self.normalize(model_output) == self.normalize(expected_output):
+                results.append(self._resolved(True, 'Output matches the expected output after normalization'))
+            elif f1 >= self.accept_threshold:
+                results.append(self._resolved(True, f'Output shares nearly all words with the expected output '
+                                                    f'(token F1 {f1:.2f})'))
+            elif f1 <= self.reject_threshold:
+                results.append(self._resolved(False, f'Output shares almost no words with the expected output '
+                                                     f'(token F1 {f1:.2f})'))
+            else:
+                self.forwarded += 1
+                results.append(None)
+        return results
+
+    def _resolved(self, is_correct: bool, explanation: str) -> Dict[str, Any]:
+        if is_correct:
+            self.resolved_correct += 1
+        else:
+            self.resolved_incorrect += 1
+        return {
+            'is_correct': is_correct,
+            'explanation_success': explanation if is_correct else '',
+            'explanation_failure': explanation if not is_correct else ''
+        }
+
+    def reset_stats(self) -> None:
+        self.resolved_correct = 0
+        self.resolved_incorrect = 0
+        self.forwarded = 0
+
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            "resolved_correct": self.resolved_correct,
+            "resolved_incorrect": self.resolved_incorrect,
+            "forwarded": self.forwarded,
+            "judge_calls_saved": self.resolved_correct + self.resolved_incorrect
+        }
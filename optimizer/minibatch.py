@@ -0,0 +1,112 @@
+import random
+from bisect import bisect_right
+from typing import Any, Dict, List, Optional, Sequence
+from config import (
+    MINIBATCH_SIZE,
+    HOLDOUT_FRACTION,
+    MINIBATCH_STRATA,
+    MINIBATCH_LENGTH_BINS,
+    MINIBATCH_SEED
+)
+from utils.data_loader import LazyDataset, input_length
+
+
+def case_strata(dataset: Sequence[Dict[str, Any]], strata: Optional[str] = MINIBATCH_STRATA,
+                length_bins: int = MINIBATCH_LENGTH_BINS) -> List[str]:
+    """
+    Stratum label of every case.
+
+    strata is "length" to bin cases by the total length of their input variables into
+    length_bins quantiles, the name of a field read from the case's "metadata" (or the case
+    itself), or None to put every case in the same stratum.
+
+    For a LazyDataset, input lengths come from its index, so no case is read and the strata are
+    the same as with the dataset in memory; a field is read from every case, one at a time.
+    """
+    if strata is None:
+        return [""] * len(dataset)
+    if strata == "length":
+        if isinstance(dataset, LazyDataset):
+            lengths = list(dataset.input_lengths)
+        else:
+            lengths = [input_length(case) for case in dataset]
+        ordered = sorted(lengths)
+        cut_points = [ordered[len(ordered) * step // length_bins] for step in range(1, length_bins)] if ordered else []
+        return [str(bisect_right(cut_points, length)) for length in lengths]
+    return [str(case.get('metadata', {}).get(strata, case.get(strata, ""))) for case in dataset]
+
+
+def allocate(sizes: Dict[str, int], total: int) -> Dict[str, int]:
+    """
+    Split total among strata in proportion to their sizes, by largest remainder.
+
+    No stratum gets more than its size, and ties go to strata in label order, so the split is deterministic.
+    """
+    available = sum(sizes.values())
+    total = min(total, available)
+    if available == 0:
+        return {label: 0 for label in sizes}
+    shares = {label: size * total / available for label, size in sizes.items()}
+    counts = {label: int(share) for label, share in shares.items()}
+    by_remainder = sorted(sizes, key=lambda label: (-(shares[label] - counts[label]), label))
+    for label in by_remainder[:total - sum(counts.values())]:
+        counts[label] += 1
+    return counts
+
+
+class MinibatchSampler:
+    """
+    Seeded stratified sampling of the dataset for minibatch evaluation.
+
+    The dataset is split once into a training part and a held-out part, each stratum in
+    proportion to its size. Every iteration gets a fresh sample of the training part, drawn
+    with the same stratum proportions from a generator seeded with the seed and the
+    iteration, so a run (or a resumed one) sees the same minibatches. The held-out part is
+    never sampled for iterations: it is kept to confirm finalists.
+    """
+
+    def __init__(self, dataset: Sequence[Dict[str, Any]], size: int = MINIBATCH_SIZE,
+                 holdout_fraction: float = HOLDOUT_FRACTION, strata: Optional[str] = MINIBATCH_STRATA,
+                 length_bins: int = MINIBATCH_LENGTH_BINS, seed: int = MINIBATCH_SEED):
+        if not 0 <= holdout_fraction < 1:
+            raise ValueError("holdout_fraction must be at least 0 and below 1")
+        self.size = size
+        self.seed = seed
+        labels = case_strata(dataset, strata, length_bins)
+        self.strata: Dict[str, List[int]] = {}
+        for index, label in enumerate(labels):
+            self.strata.setdefault(label, []).append(index)
+
+        holdout_size = round(len(dataset) * holdout_fraction)
+        if holdout_fraction > 0 and len(dataset) > 1:
+            holdout_size = max(holdout_size, 1)
+        generator = random.Random(f"{seed}:holdout")
+        counts = allocate({label: len(indices) for label, indices in self.strata.items()}, holdout_size)
+        self.train: Dict[str, List[int]] = {}
+        holdout: List[int] = []
+        for label in sorted(self.strata):
+            indices = list(self.strata[label])
+            generator.shuffle(indices)
+            holdout.extend(indices[:counts[label]])
+            self.train[label] = sorted(indices[counts[label]:])
+        self.holdout = sorted(holdout)
+
+    def get_train_size(self) -> int:
+        return sum(len(indices) for indices in self.train.values())
+
+    def sample(self, iteration: int) -> List[int]:
+        """The minibatch of the iteration: sorted training case indices, stratified by proportion."""
+        generator = random.Random(f"{self.seed}:{iteration}")
+        counts = allocate({label: len(indices) for label, indices in self.train.items()}, self.size)
+        minibatch = []
+        for label in sorted(self.train):
+            minibatch.extend(generator.sample(self.train[label], counts[label]))
+        return sorted(minibatch)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "strata": len(self.strata),
+            "train_cases": self.get_train_size(),
+            "holdout_cases": len(self.holdout),
+            "minibatch_size": min(self.size, self.get_train_size())
+        }
@@ -1,45 +1,149 @@
 import asyncio
+import json
+import random
+from contextlib import asynccontextmanager
 from typing import Dict, Any, List, Optional
 from providers.openai_provider import OpenAIProvider
-from providers.base_provider import ProviderResponse
-from config import MAX_RETRIES, RETRY_DELAY
+from providers.base_provider import BaseProvider, ProviderResponse, RateLimitError
+from providers.record_replay_provider import RecordingProvider, get_replay_provider
+from optimizer.rate_limiter import RateLimiter, get_rate_limiter
+from optimizer.usage_tracker import record_cancelled, record_usage
+from utils.response_cache import ResponseCache, get_response_cache
+from utils.tracer import tracer
+from config import (
+    MAX_RETRIES,
+    RETRY_DELAY,
+    MAX_RETRY_DELAY,
+    CACHE_ENABLED,
+    RATE_LIMITING_ENABLED,
+    PROVIDER_MODE,
+    RECORDING_FILE
+)
 
 
 class Model:
-    def __init__(self, model_name: str, temperature: float = 0.7):
+    def __init__(self, model_name: str, temperature: float = 0.7, cache: Optional[ResponseCache] = None,
+                 rate_limiter: Optional[RateLimiter] = None, provider: Optional[BaseProvider] = None):
         self.model_name = model_name
         self.temperature = temperature
-        self._setup_provider()
+        self.cache = cache if cache is not None else (get_response_cache() if CACHE_ENABLED else None)
+        # Replayed responses don't count against any provider quota
+        if rate_limiter is None and RATE_LIMITING_ENABLED and PROVIDER_MODE != "replay":
+            rate_limiter = get_rate_limiter(model_name)
+        self.rate_limiter = rate_limiter
+        if provider is not None:
+            self.provider = provider
+        else:
+            self._setup_provider()
 
     def _setup_provider(self):
+        if PROVIDER_MODE == "replay" and not self.model_name.startswith("test-"):
+            # Replays need neither network access nor an API key
+            self.provider = get_replay_provider(RECORDING_FILE)
+            return
+
         if self.model_name.startswith(("gpt", "text-davinci")):
             self.provider = OpenAIProvider()
         elif self.model_name.startswith("test-"):
             # For test models, use a dummy provider
             self.provider = DummyProvider()
+            return
         else:
             raise ValueError(f"Unsupported model: {self.model_name}")
 
+        if PROVIDER_MODE == "record":
+            self.provider = RecordingProvider(self.provider, RECORDING_FILE)
+
     async def generate(self,
                        prompt: str,
                        functions: Optional[List[Dict[str, Any]]] = None,
-                       function_call: Optional[Dict[str, str]] = None) -> ProviderResponse:
+                       function_call: Optional[Dict[str, str]] = None,
+                       n: int = 1) -> ProviderResponse:
+        cache_key = None
+        if self.cache is not None:
+            cache_key = self.cache.make_key(self.model_name, self.temperature, prompt, functions, function_call, n)
+            cached_response = self.cache.get(cache_key)
+            if cached_response is not None:
+                return cached_response
+
+        estimated_tokens = RateLimiter.estimate_tokens(prompt, functions, n)
         for attempt in range(MAX_RETRIES):
             try:
-                return await self.provider.generate(
-                    model_name=self.model_name,
-                    prompt=prompt,
-                    temperature=self.temperature,
-                    functions=functions,
-                    function_call=function_call
-                )
+                async with self._rate_limit_slot(estimated_tokens):
+                    with tracer.span("model.generate", category="llm", model=self.model_name, attempt=attempt + 1,
+                                     prompt_chars=len(prompt), function=(function_call or {}).get("name"),
+                                     n=n) as span:
+                        try:
+                            response = await self.provider.generate(
+                                model_name=self.model_name,
+                                prompt=prompt,
+                                temperature=self.temperature,
+                                functions=functions,
+                                function_call=function_call,
+                                # Only multi-sample requests pass n, so providers without it keep working
+                                **({"n": n} if n != 1 else {})
+                            )
+                        except asyncio.CancelledError:
+                            # The request was sent, so it may be billed without ever reporting its usage
+                            record_cancelled(self.model_name, estimated_tokens)
+                            raise
+                        if tracer.enabled:
+                            span.set(response_chars=self._response_size(response), error=response.get('error'),
+                                     **(response.get('usage') or {}))
             except Exception as e:
+                retry_after = None
+                if self.rate_limiter is not None and isinstance(e, RateLimitError):
+                    # The limiter holds back every caller of this model until retry_after has passed
+                    self.rate_limiter.on_rate_limited(e.retry_after)
+                    retry_after = e.retry_after
+
                 if attempt < MAX_RETRIES - 1:
-                    print(f"Error generating model output: {str(e)}. Retrying in {RETRY_DELAY} seconds...")
-                    await asyncio.sleep(RETRY_DELAY)
+                    delay = retry_after if retry_after else self._backoff_delay(attempt)
+                    print(f"Error generating model output: {str(e)}. Retrying in {delay:.1f} seconds...")
+                    if not retry_after:
+                        await asyncio.sleep(delay)
                 else:
                     print(f"Failed to generate model output after {MAX_RETRIES} attempts. Error: {str(e)}")
                     return self.provider.create_response(error=str(e))
+            else:
+                # Cache hits are free, so only provider responses count towards usage
+                record_usage(self.model_name, response.get('usage'))
+                # Only successful responses are worth replaying
+                if cache_key is not None and not response.get('error'):
+                    self.cache.set(cache_key, response)
+                return response
+
+    @asynccontextmanager
+    async def _rate_limit_slot(self, estimated_tokens: int):
+        """
+        Hold a slot of the rate limiter for the block.
+
+        The slot is released however the block ends, cancellation included, and before any
+        retry backoff, so a failed or cancelled call never keeps it.
+        """
+        if self.rate_limiter is None:
+            yield
+            return
+        with tracer.span("model.rate_limit_wait", category="llm", model=self.model_name):
+            await self.rate_limiter.acquire(estimated_tokens)
+        succeeded = False
+        try:
+            yield
+            succeeded = True
+        finally:
+            self.rate_limiter.release(success=succeeded)
+
+    @staticmethod
+    def _response_size(response: ProviderResponse) -> int:
+        if response.get('function'):
+            return len(json.dumps(response['function'].get('data'), default=str))
+        return len(response.get('message') or '')
+
+    @staticmethod
+    def _backoff_delay(attempt: int) -> float:
+        """Exponential backoff from RETRY_DELAY, capped at MAX_RETRY_DELAY, jittered over its upper half."""
+        delay = min(MAX_RETRY_DELAY, RETRY_DELAY * 2 ** attempt)
+        return random.uniform(delay / 2, delay)
 
     def get_model_info(self) -> Dict[str, Any]:
         return {
@@ -0,0 +1,154 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+BATCH_POLL_INTERVAL = 0.01  # seconds
+
+
+class Stage:
+    """
+    A pool of workers that applies an async handler to every item passing through it.
+
+    Items reach the stage through a bounded queue, so a slow stage applies back-pressure
+    to the stage feeding it instead of buffering the whole workload in memory.
+
+    With a batch_size, the handler receives a list of up to batch_size items and must return
+    a list of outputs of the same length. Once the first item of a batch arrives, the worker
+    waits at most batch_wait seconds for the batch to fill before handling what it has.
+    """
+
+    def __init__(self, name: str, handler: Callable[[Any], Awaitable[Any]], workers: int, queue_size: int,
+                 batch_size: Optional[int] = None, batch_wait: float = 0.0):
+        if workers < 1:
+            raise ValueError(f"Stage '{name}' needs at least one worker")
+        if batch_size is not None and batch_size < 1:
+            raise ValueError(f"Stage '{name}' needs a batch size of at least one")
+        self.name = name
+        self.handler = handler
+        self.workers = workers
+        self.queue_size = queue_size
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self._reset(None)
+
+    def _reset(self, queue: Optional[asyncio.Queue]):
+        self.queue = queue
+        self.processed = 0
+        self.batches = 0
+        self.busy_workers = 0
+        self.busy_time = 0.0
+        self.max_queue_depth = 0
+        self.started_at = time.perf_counter()
+        self.finished_at: Optional[float] = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        end = self.finished_at if self.finished_at is not None else time.perf_counter()
+        elapsed = end - self.started_at
+        return {
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "queue_depth": self.queue.qsize() if self.queue is not None else 0,
+            "max_queue_depth": self.max_queue_depth,
+            "busy_workers": self.busy_workers,
+            "processed": self.processed,
+            "batches": self.batches,
+            "busy_time": self.busy_time,
+            "utilization": self.busy_time / (self.workers * elapsed) if elapsed > 0 else 0.0
+        }
+
+
+class Pipeline:
+    """
+    Streams items through a chain of stages connected by bounded queues.
+
+    Each stage hands its output to the next one as soon as it is ready, so downstream
+    work starts while upstream work is still in progress. Results are returned in the
+    order the items were supplied.
+    """
+
+    def __init__(self, stages: List[Stage]):
+        if not stages:
+            raise ValueError("A pipeline needs at least one stage")
+        self.stages = stages
+
+    async def run(self, items: Iterable[Any]) -> List[Any]:
+        items = list(items)
+        results: List[Any] = [None] * len(items)
+        queues = [asyncio.Queue(maxsize=stage.queue_size) for stage in self.stages]
+        for stage, queue in zip(self.stages, queues):
+            stage._reset(queue)
+
+        workers = [
+            asyncio.create_task(self._work(position, queues, results))
+            for position, stage in enumerate(self.stages)
+            for _ in range(stage.workers)
+        ]
+        drain = asyncio.create_task(self._feed_and_drain(items, queues))
+
+        try:
+            done, _ = await asyncio.wait([drain, *workers], return_when=asyncio.FIRST_COMPLETED)
+            # Workers loop forever, so one finishing early means its handler raised
+            for task in done:
+                task.result()
+        finally:
+            for task in [drain, *workers]:
+                task.cancel()
+            await asyncio.gather(drain, *workers, return_exceptions=True)
+
+        return results
+
+    async def _feed_and_drain(self, items: List[Any], queues: List[asyncio.Queue]):
+        for index, item in enumerate(items):
+            await self._put(0, queues, (index, item))
+        for stage, queue in zip(self.stages, queues):
+            await queue.join()
+            stage.finished_at = time.perf_counter()
+
+    async def _put(self, position: int, queues: List[asyncio.Queue], entry):
+        queue = queues[position]
+        await queue.put(entry)
+        stage = self.stages[position]
+        stage.max_queue_depth = max(stage.max_queue_depth, queue.qsize())
+
+    async def _work(self, position: int, queues: List[asyncio.Queue], results: List[Any]):
+        stage = self.stages[position]
+        queue = queues[position]
+        while True:
+            entries = [await queue.get()]
+            if stage.batch_size is not None:
+                await self._fill_batch(stage, queue, entries)
+
+            stage.busy_workers += 1
+            started = time.perf_counter()
+            try:
+                if stage.batch_size is None:
+                    outputs = [await stage.handler(entries[0][1])]
+                else:
+                    outputs = await stage.handler([item for _, item in entries])
+            finally:
+                stage.busy_workers -= 1
+                stage.busy_time += time.perf_counter() - started
+            stage.processed += len(entries)
+            stage.batches += 1
+
+            for (index, _), output in zip(entries, outputs):
+                if position + 1 < len(self.stages):
+                    await self._put(position + 1, queues, (index, output))
+                else:
+                    results[index] = output
+                queue.task_done()
+
+    async def _fill_batch(self, stage: Stage, queue: asyncio.Queue, entries: List[Any]):
+        deadline = time.perf_counter() + stage.batch_wait
+        while len(entries) < stage.batch_size:
+            if not queue.empty():
+                entries.append(queue.get_nowait())
+                continue
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            # Polling avoids cancelling a pending queue.get(), which could drop an item
+            await asyncio.sleep(min(remaining, BATCH_POLL_INTERVAL))
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        return {stage.name: stage.get_stats() for stage in self.stages}
@@ -1,64 +1,601 @@
-from typing import List, Dict, Any, Tuple
+import asyncio
+import random
+import statistics
+from collections import Counter
+from contextlib import ExitStack
+from typing import List, Dict, Any, Optional, Sequence, Tuple
 from optimizer.model_interface import Model
-from config import EVALUATION_MODEL
-from utils.data_loader import DataLoader
+from optimizer.budget import BudgetController
+from optimizer.pipeline import Pipeline, Stage
+from optimizer.local_scorer import LocalScorer
+from optimizer.racing import racing_schedule, surviving_candidates
+from optimizer.usage_tracker import UsageTracker, track_usage
+from optimizer.early_stopping import EarlyStopping
+from optimizer.speculation import EvaluationProgress
+from optimizer.prompt_index import PromptIndex
+from optimizer.case_result import CaseResult, case_id
+from optimizer.prompt_template import PromptTemplate, TemplateError, compile_prompt
+from config import (
+    EVALUATION_MODEL,
+    EVALUATION_TEMPERATURE,
+    MAX_CONCURRENT_REQUESTS,
+    GENERATION_WORKERS,
+    JUDGE_WORKERS,
+    PIPELINE_QUEUE_SIZE,
+    JUDGE_BATCH_SIZE,
+    JUDGE_BATCH_WAIT,
+    LOCAL_SCORING_ENABLED,
+    RACING_ENABLED,
+    RACING_INITIAL_CASES,
+    RACING_GROWTH_FACTOR,
+    RACING_CONFIDENCE,
+    RACING_SEED,
+    EARLY_STOPPING_ENABLED,
+    EVALUATION_SAMPLES,
+    DEDUPLICATION_ENABLED,
+    TEMPLATE_REPAIR_ENABLED,
+    ORIGINAL_PROMPT,
+    ACCURACY_THRESHOLD
+)
+from utils.data_loader import DataLoader, LazyDataset
 from utils.performance_logger import PerformanceLogger
+from utils.checkpoint import Checkpoint
+from utils.tracer import tracer
 
 
 class Evaluator:
-    def __init__(self, logger: PerformanceLogger):
-        self.evaluation_model = Model(EVALUATION_MODEL)
+    def __init__(self,
+                 logger: PerformanceLogger,
+                 max_concurrent_requests: int = MAX_CONCURRENT_REQUESTS,
+                 generation_workers: int = GENERATION_WORKERS,
+                 judge_workers: int = JUDGE_WORKERS,
+                 queue_size: int = PIPELINE_QUEUE_SIZE,
+                 judge_batch_size: int = JUDGE_BATCH_SIZE,
+                 judge_batch_wait: float = JUDGE_BATCH_WAIT,
+                 local_scoring: bool = LOCAL_SCORING_ENABLED,
+                 racing: bool = RACING_ENABLED,
+                 early_stopping: bool = EARLY_STOPPING_ENABLED,
+                 accuracy_threshold: float = ACCURACY_THRESHOLD,
+                 samples: int = EVALUATION_SAMPLES,
+                 deduplication: bool = DEDUPLICATION_ENABLED,
+                 template_repair: bool = TEMPLATE_REPAIR_ENABLED,
+                 variables: Optional[Sequence[str]] = None,
+                 evaluation_model: Optional[Model] = None,
+                 dataset: Optional[Sequence[Dict[str, Any]]] = None,
+                 checkpoint: Optional[Checkpoint] = None):
+        self.evaluation_model = evaluation_model or Model(EVALUATION_MODEL, temperature=EVALUATION_TEMPERATURE)
         self.data_loader = DataLoader()
-        self.dataset = self.data_loader.load_data()
+        self.dataset = dataset if dataset is not None else self.data_loader.get_dataset()
         self.logger = logger
-
-    async def evaluate_prompts(self, prompts: List[str], generator_model: Model, iteration: int) -> List[
-        Dict[str, Any]]:
-        evaluations = []
-        for prompt in prompts:
-            evaluation = await self.evaluate_prompt(prompt, generator_model)
-            evaluations.append(evaluation)
+        # Shared by every prompt and case so the cap holds across the whole iteration
+        self.request_semaphore = asyncio.Semaphore(max_concurrent_requests)
+        self.generation_workers = generation_workers
+        self.judge_workers = judge_workers
+        self.queue_size = queue_size
+        self.judge_batch_size = judge_batch_size
+        self.judge_batch_wait = judge_batch_wait
+        self.pipeline_stats: Dict[str, Dict[str, Any]] = {}
+        self.usage_stats: Optional[Dict[str, Any]] = None
+        self.local_scorer = LocalScorer() if local_scoring else None
+        self.racing = racing
+        self.early_stopping = early_stopping
+        self.accuracy_threshold = accuracy_threshold
+        self.early_stopping_stats: Optional[Dict[str, int]] = None
+        if samples < 1:
+            raise ValueError("samples must be at least 1")
+        self.samples = samples
+        self.prompt_index = PromptIndex() if deduplication else None
+        # The placeholders every prompt must use, and may only use
+        self.variables = list(variables if variables is not None else ORIGINAL_PROMPT['variables'])
+        self.template_repair = template_repair
+        self.templates: Dict[str, PromptTemplate] = {}
+        self.repaired_prompts = 0
+        self.rejected_prompts = 0
+        self.checkpoint = checkpoint
+
+    async def evaluate_prompts(self, prompts: List[str], generator_model: Model, iteration: int,
+                               max_cases: Optional[int] = None, summarize: bool = True,
+                               best_score: Optional[float] = None,
+                               progress: Optional[EvaluationProgress] = None,
+                               case_indices: Optional[List[int]] = None,
+                               budget: Optional[BudgetController] = None) -> List[Dict[str, Any]]:
+        """
+        Evaluate every prompt on the dataset and log the iteration.
+
+        With a budget tracking the run's usage, the evaluation stops as soon as the budget is
+        exhausted: the remaining model calls are cancelled or never made, and no summaries are
+        written. Prompts left with cases unevaluated are scored on the evaluated ones and
+        marked with 'budget_exhausted'.
+
+        case_indices restricts the evaluation to those cases, e.g. a minibatch. max_cases
+        restricts it to a random subset of the dataset (or of case_indices), the same for every
+        prompt, and summarize=False skips the explanation summaries; both are used to spend less
+        on iterations run close to the budget. Racing only applies to full dataset evaluations.
+
+        With early stopping, and outside racing, a prompt stops being evaluated once its remaining
+        cases can't change the outcome: once one prompt is sure to reach the accuracy threshold,
+        it stops along with every prompt that can't beat its worst final score, and a prompt that
+        can neither reach the threshold nor beat best_score (the best score of previous
+        iterations) or another prompt stops on its own. Stopped
+        prompts are scored on the cases evaluated so far and marked with 'stopped_early', and the
+        iteration's early stopping stats are logged with it.
+
+        progress, if given, follows the judged cases while the evaluation runs, e.g. to generate
+        suggestions speculatively. Racing evaluations don't report progress.
+
+        With deduplication, a prompt evaluated before on the whole dataset (up to whitespace and
+        the case of its text) isn't evaluated again: its earlier evaluation is reused and marked
+        with 'reused'. A partial evaluation (stopped early, eliminated, or on a subset of the
+        cases) isn't reused, the prompt is evaluated again. Every evaluated prompt is added to
+        the prompt index.
+
+        With several samples per case, each case scores the share of its samples judged correct,
+        and a prompt's score is the mean over its cases (also reported as 'mean_score').
+        'score_variance' is the variance of the score across the sample runs, i.e. of the scores
+        the prompt would have got with a single sample per case. 'correct_answers' still counts
+        cases, each judged correct by the majority of its samples, so with several samples the
+        score isn't correct_answers / total_cases.
+
+        Every prompt is compiled before any model call. A prompt that doesn't compile against the
+        dataset's variables isn't run: it scores 0 and is marked with 'invalid', the reason.
+        """
+        self._reset_stats()
+        reused = {}
+        for position, prompt in enumerate(prompts):
+            try:
+                self.compile_prompt(prompt)
+            except TemplateError as e:
+                reused[position] = {**await self._build_evaluation(prompt, [], summarize=False), 'invalid': str(e)}
+                continue
+            # Only a prompt that compiles may reuse an earlier evaluation
+            evaluation = self.reusable_evaluation(prompt)
+            if evaluation is not None:
+                reused[position] = {**evaluation, 'prompt': prompt, 'reused': True,
+                                    'usage': UsageTracker().get_summary()}
+        all_prompts = prompts
+        # Only the valid prompts without an earlier evaluation are run
+        prompts = [prompt for position, prompt in enumerate(all_prompts) if position not in reused]
+        iteration_usage = UsageTracker()
+        prompt_usage = [UsageTracker() for _ in prompts]
+        eliminated = None
+        early_stopping = None
+        if max_cases is not None and max_cases < len(case_indices if case_indices is not None else self.dataset):
+            population = case_indices if case_indices is not None else range(len(self.dataset))
+            case_indices = sorted(random.Random(iteration).sample(population, max_cases))
+        subset = case_indices is not None
+        total_cases = len(case_indices) if subset else len(self.dataset)
+        if self.early_stopping and (subset or not self.racing):
+            early_stopping = EarlyStopping(len(prompts), total_cases, self.accuracy_threshold, best_score)
+        if progress is not None:
+            progress.reset(prompts, total_cases)
+        with track_usage(iteration_usage):
+            with tracer.span("evaluator.run_cases", prompts=len(prompts), iteration=iteration):
+                if subset:
+                    results_per_prompt = await self._run_cases(prompts, generator_model, case_indices, prompt_usage,
+                                                               iteration, early_stopping, progress, budget)
+                elif self.racing:
+                    results_per_prompt, eliminated = await self._race(prompts, generator_model, iteration,
+                                                                      prompt_usage, budget)
+                else:
+                    results_per_prompt = await self._run_cases(prompts, generator_model, usage=prompt_usage,
+                                                               iteration=iteration, early_stopping=early_stopping,
+                                                               progress=progress, budget=budget)
+            exhausted = budget is not None and budget.is_exhausted()
+            # gather preserves input order, so evaluations line up with prompts
+            evaluations = list(await asyncio.gather(
+                *(self._build_evaluation(prompt, results, usage, summarize and not exhausted)
+                  for prompt, results, usage in zip(prompts, results_per_prompt, prompt_usage))
+            ))
+        if eliminated is not None:
+            for evaluation, was_eliminated in zip(evaluations, eliminated):
+                evaluation['eliminated'] = was_eliminated
+        if early_stopping is not None:
+            for position, evaluation in enumerate(evaluations):
+                evaluation['stopped_early'] = early_stopping.is_stopped(position)
+                evaluation['stop_reason'] = early_stopping.get_stop_reason(position)
+                evaluation['skipped_cases'] = early_stopping.total_cases - evaluation['total_cases']
+            self.early_stopping_stats = {
+                **early_stopping.get_stats(),
+                "skipped_cases": sum(evaluation['skipped_cases'] for evaluation in evaluations)
+            }
+        if exhausted:
+            for evaluation in evaluations:
+                # Prompts stopped early or eliminated were already done with
+                evaluation['budget_exhausted'] = (evaluation['total_cases'] < total_cases
+                                                  and not evaluation.get('stopped_early')
+                                                  and not evaluation.get('eliminated'))
+        self.usage_stats = iteration_usage.get_summary()
+        self.index_evaluations(evaluations)
+
+        fresh_evaluations = iter(evaluations)
+        evaluations = [reused[position] if position in reused else next(fresh_evaluations)
+                       for position in range(len(all_prompts))]
 
         # Log the iteration using the PerformanceLogger
-        self.logger.log_iteration(iteration, prompts, evaluations)
+        self.logger.log_iteration(iteration, all_prompts, evaluations, usage=self.usage_stats,
+                                  early_stopping=self.early_stopping_stats)
 
         return evaluations
 
-    async def evaluate_prompt(self, prompt: str, generator_model: Model) -> Dict[str, Any]:
-        total_cases = len(self.dataset)
-        correct_answers = 0
-        results = []
-
-        for test_case in self.dataset:
-            variables = test_case['variables']
-            expected_output = test_case['expected_output']
-
-            formatted_prompt = prompt.format(**variables)
-            model_output = await self.generate_model_output(formatted_prompt, generator_model)
-
-            evaluation_result = await self.evaluate_output(model_output, expected_output)
-
-            if evaluation_result['is_correct']:
-                correct_answers += 1
+    def reusable_evaluation(self, prompt: str) -> Optional[Dict[str, Any]]:
+        """The prompt index's evaluation of the prompt if it covers every case of the dataset, or None."""
+        if self.prompt_index is None:
+            return None
+        evaluation = self.prompt_index.get(prompt)
+        if evaluation is None or not self._is_complete(evaluation):
+            return None
+        return evaluation
+
+    def index_evaluations(self, evaluations: List[Dict[str, Any]]):
+        """
+        Add evaluations to the prompt index, if any.
+
+        A complete evaluation replaces a partial one of the same prompt, so the prompt's next
+        duplicate can reuse it.
+        """
+        if self.prompt_index is None:
+            return
+        for evaluation in evaluations:
+            self.prompt_index.add(evaluation['prompt'], evaluation, replace=self._is_complete(evaluation))
+
+    def _is_complete(self, evaluation: Dict[str, Any]) -> bool:
+        # A prompt stopped early or eliminated has fewer results than cases, unless it was stopped after its last case
+        return 'invalid' not in evaluation and evaluation['total_cases'] == len(self.dataset)
+
+    def compile_prompt(self, prompt: str) -> PromptTemplate:
+        """
+        The prompt's template, compiled on first use.
+
+        Raises:
+            TemplateError: If the prompt doesn't compile against the dataset's variables.
+        """
+        template = self.templates.get(prompt)
+        if template is None:
+            template = PromptTemplate(prompt, self.variables)
+            self.templates[prompt] = template
+        return template
+
+    def prepare_prompts(self, prompts: List[str]) -> Tuple[List[str], List[Tuple[str, str]]]:
+        """
+        Compile candidate prompts before anything is spent on them.
+
+        With template repair, a prompt that only fails to compile because of stray braces is
+        kept with them escaped. Returns the prompts to evaluate (repaired where needed) and the
+        rejected ones with the reason.
+        """
+        prepared, rejected = [], []
+        for prompt in prompts:
+            if prompt in self.templates:
+                prepared.append(prompt)
+                continue
+            try:
+                template = compile_prompt(prompt, self.variables, repair=self.template_repair)
+            except TemplateError as e:
+                self.rejected_prompts += 1
+                rejected.append((prompt, str(e)))
+                continue
+            if template.text != prompt:
+                self.repaired_prompts += 1
+            self.templates.setdefault(template.text, template)
+            prepared.append(template.text)
+        return prepared, rejected
+
+    def close(self):
+        """Close the dataset file when the dataset is read from it lazily."""
+        if isinstance(self.dataset, LazyDataset):
+            self.dataset.close()
+
+    def get_template_stats(self) -> Dict[str, Any]:
+        """Templates compiled and rendered so far, with the time spent, and candidates repaired or rejected."""
+        templates = list(self.templates.values())
+        return {
+            "compiled": len(templates),
+            "compile_seconds": sum(template.compile_seconds for template in templates),
+            "renders": sum(template.renders for template in templates),
+            "render_seconds": sum(template.render_seconds for template in templates),
+            "repaired": self.repaired_prompts,
+            "rejected": self.rejected_prompts
+        }
 
-            results.append({
-                'prompt': formatted_prompt,
-                'model_output': model_output,
-                'expected_output': expected_output,
-                'is_correct': evaluation_result['is_correct'],
-                'explanation_success': evaluation_result['explanation_success'],
-                'explanation_failure': evaluation_result['explanation_failure']
-            })
+    async def confirm_prompts(self, prompts: List[str], generator_model: Model, case_indices: List[int],
+                              iteration: Optional[int] = None,
+                              budget: Optional[BudgetController] = None) -> List[Dict[str, Any]]:
+        """
+        Score prompts on the given cases, e.g. a held-out split, without summaries or logging.
+
+        Confirmation scores are kept out of the logged history, so the generator never sees them.
+        With a budget, a confirmation cut short by it covers fewer cases than case_indices.
+        """
+        usage = [UsageTracker() for _ in prompts]
+        with tracer.span("evaluator.confirm", prompts=len(prompts), cases=len(case_indices)):
+            results_per_prompt = await self._run_cases(prompts, generator_model, case_indices, usage, iteration,
+                                                       budget=budget)
+        return list(await asyncio.gather(
+            *(self._build_evaluation(prompt, results, prompt_usage, summarize=False)
+              for prompt, results, prompt_usage in zip(prompts, results_per_prompt, usage))
+        ))
 
-        summary = await self.summarize_explanations(results)
+    async def evaluate_prompt(self, prompt: str, generator_model: Model) -> Dict[str, Any]:
+        self._reset_stats()
+        usage = UsageTracker()
+        results_per_prompt = await self._run_cases([prompt], generator_model, usage=[usage])
+        evaluation = await self._build_evaluation(prompt, results_per_prompt[0], usage)
+        self.usage_stats = evaluation['usage']
+        return evaluation
+
+    def _reset_stats(self):
+        self.pipeline_stats = {}
+        self.usage_stats = None
+        self.early_stopping_stats = None
+        if self.local_scorer is not None:
+            self.local_scorer.reset_stats()
+
+    def get_pipeline_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-stage worker, queue depth and utilization figures from the last pipeline run."""
+        return self.pipeline_stats
+
+    def get_early_stopping_stats(self) -> Optional[Dict[str, int]]:
+        """Prompts stopped early, model calls cancelled and cases skipped during the last evaluation."""
+        return self.early_stopping_stats
+
+    def get_usage_stats(self) -> Optional[Dict[str, Any]]:
+        """Tokens and cost of every model call made by the last evaluation."""
+        return self.usage_stats
+
+    @staticmethod
+    def _track_prompt_usage(usage: Optional[List[UsageTracker]], positions: List[int]) -> ExitStack:
+        """Attribute the model calls made in the block to the prompts at positions, split by their share."""
+        stack = ExitStack()
+        if usage is not None:
+            for position, count in Counter(positions).items():
+                stack.enter_context(track_usage(usage[position], count / len(positions)))
+        return stack
+
+    async def _race(self, prompts: List[str], generator_model: Model, iteration: int,
+                    usage: Optional[List[UsageTracker]] = None,
+                    budget: Optional[BudgetController] = None) -> Tuple[List[List[CaseResult]], List[bool]]:
+        """
+        Evaluate candidates on growing random subsets of the dataset, dropping clear losers early.
+
+        After each round, a candidate whose accuracy upper bound falls below the best lower
+        bound stops being evaluated; its results cover only the cases it saw. Survivors end up
+        evaluated on the full dataset. Returns per-prompt results in dataset order and whether
+        each prompt was eliminated.
+        """
+        case_order = list(range(len(self.dataset)))
+        random.Random(f"{RACING_SEED}:{iteration}").shuffle(case_order)
+
+        indexed_results: List[List[Tuple[int, CaseResult]]] = [[] for _ in prompts]
+        alive = [True] * len(prompts)
+        evaluated = 0
+
+        for size in racing_schedule(len(case_order), RACING_INITIAL_CASES, RACING_GROWTH_FACTOR):
+            round_indices = case_order[evaluated:size]
+            contenders = [position for position in range(len(prompts)) if alive[position]]
+            round_results = await self._run_cases(
+                [prompts[position] for position in contenders], generator_model, round_indices,
+                [usage[position] for position in contenders] if usage is not None else None, iteration,
+                budget=budget
+            )
+            for position, results in zip(contenders, round_results):
+                indexed_results[position].extend(zip(round_indices, results))
+            evaluated = size
+
+            if size < len(case_order):
+                scores = [
+                    (sum(self._case_score(result) for _, result in indexed_results[position]), evaluated)
+                    for position in contenders
+                ]
+                for position, survives in zip(contenders, surviving_candidates(scores, RACING_CONFIDENCE)):
+                    alive[position] = survives
+
+        results_per_prompt = [[result for _, result in sorted(results, key=lambda entry: entry[0])]
+                              for results in indexed_results]
+        return results_per_prompt, [not survived for survived in alive]
+
+    async def _run_cases(self, prompts: List[str], generator_model: Model,
+                         case_indices: Optional[List[int]] = None,
+                         usage: Optional[List[UsageTracker]] = None,
+                         iteration: Optional[int] = None,
+                         early_stopping: Optional[EarlyStopping] = None,
+                         progress: Optional[EvaluationProgress] = None,
+                         budget: Optional[BudgetController] = None) -> List[List[CaseResult]]:
+        """
+        Stream every (prompt, case) pair through the generate -> judge pipeline.
+
+        Only the cases at case_indices are evaluated when given, otherwise the whole dataset.
+        When usage holds a tracker per prompt, each prompt's model calls are attributed to it.
+        When an iteration is given and the evaluator has a checkpoint, generated outputs and
+        judged cases are journaled to it, and those already journaled are not evaluated again.
+        With early_stopping, the cases of prompts it stops are skipped or have their model calls
+        cancelled, and are left out of the returned results. progress is kept up to date with
+        every judged case. With a budget, every remaining model call is cancelled or skipped
+        once it is exhausted, and the cases they served are left out too.
+
+        Each case's samples come from a single generation request and are judged together.
+
+        Every prompt is compiled before the first model call, so an invalid one raises a
+        TemplateError without anything spent.
+
+        A case is handed to the judge stage as soon as its generation finishes, and both
+        stages have their own worker pool so their throughput can be tuned independently.
+        """
+        checkpoint = self.checkpoint if iteration is not None else None
+        templates = [self.compile_prompt(prompt) for prompt in prompts]
+
+        async def guarded(positions: List[int], awaitable) -> Tuple[bool, Any]:
+            if early_stopping is None:
+                return True, await awaitable
+            return await early_stopping.run(positions, awaitable)
+
+        async def call(positions: List[int], awaitable) -> Tuple[bool, Any]:
+            if budget is None:
+                return await guarded(positions, awaitable)
+            if budget.is_exhausted():
+                # Closed here, as budget.run could only close the wrapper around it
+                awaitable.close()
+                return False, None
+            completed, result = await budget.run(guarded(positions, awaitable))
+            return result if completed else (False, None)
+
+        async def generate(item: Tuple[int, int]) -> Optional[Tuple[int, int, List[str]]]:
+            position, case_index = item
+            if early_stopping and early_stopping.is_stopped(position):
+                return None
+            prompt = prompts[position]
+            formatted_prompt = templates[position].render(self.dataset[case_index]['variables'])
+            model_outputs = checkpoint.get_output(iteration, prompt, case_index) if checkpoint else None
+            if model_outputs is None:
+                with tracer.span("evaluator.generation", prompt_chars=len(formatted_prompt), samples=self.samples), \
+                        self._track_prompt_usage(usage, [position]):
+                    async with self.request_semaphore:
+                        completed, model_outputs = await call(
+                            [position], self.generate_model_outputs(formatted_prompt, generator_model, self.samples))
+                if not completed:
+                    return None
+                if checkpoint and any(model_outputs):
+                    # Single outputs are journaled as before, so existing journals stay readable
+                    checkpoint.record_output(iteration, prompt, case_index,
+                                             model_outputs if self.samples > 1 else model_outputs[0])
+            elif isinstance(model_outputs, str):
+                model_outputs = [model_outputs]
+            # The formatted prompt isn't kept, results rebuild it from the template when needed
+            return position, case_index, model_outputs
+
+        async def judge(items: List[Optional[Tuple[int, int, List[str]]]]) -> List[Optional[CaseResult]]:
+            # Cases whose prompt got stopped were skipped by the generation stage
+            pending = [index for index, item in enumerate(items)
+                       if item is not None and not (early_stopping and early_stopping.is_stopped(item[0]))]
+            results: List[Optional[CaseResult]] = [None] * len(items)
+            if not pending:
+                return results
+            positions = [items[index][0] for index in pending]
+
+            # Every sample of every case in the batch is judged in the same call
+            pairs = [(model_output, self.dataset[items[index][1]]['expected_output'])
+                     for index in pending for model_output in items[index][2]]
+            # A batch can mix outputs of several prompts, which share its cost by their number of pairs
+            with tracer.span("evaluator.judge", batch_size=len(pairs)), \
+                    self._track_prompt_usage(usage, [items[index][0] for index in pending
+                                                     for _ in items[index][2]]):
+                completed, evaluation_results = await call(positions, self.score_outputs(pairs))
+            if not completed:
+                return results
+
+            evaluation_results = iter(evaluation_results)
+            for index in pending:
+                position, case_index, model_outputs = items[index]
+                sample_results = [next(evaluation_results) for _ in model_outputs]
+                result = self._case_result(prompts[position], case_index, case_ids[case_index], model_outputs,
+                                           sample_results)
+                if checkpoint:
+                    checkpoint.record_result(iteration, prompts[position], case_index, result)
+                if early_stopping:
+                    early_stopping.record(position, self._case_score(result))
+                if progress:
+                    progress.record(position, self._case_score(result))
+                results[index] = result
+            return results
+
+        if case_indices is None:
+            case_indices = list(range(len(self.dataset)))
+        case_ids = {case_index: case_id(self.dataset[case_index]) for case_index in case_indices}
+        # Case by case rather than prompt by prompt, so every prompt's bounds tighten at the same pace
+        items = [(position, case_index) for case_index in case_indices for position in range(len(prompts))]
+        completed = {}
+        if checkpoint:
+            for position, case_index in items:
+                record = checkpoint.get_result(iteration, prompts[position], case_index)
+                if record is not None:
+                    result = CaseResult.from_record(record, prompts[position], self.dataset[case_index], case_index,
+                                                    case_ids[case_index])
+                    completed[(position, case_index)] = result
+                    if early_stopping:
+                        early_stopping.record(position, self._case_score(result))
+                    if progress:
+                        progress.record(position, self._case_score(result))
+
+        pipeline = Pipeline([
+            Stage("generation", generate, self.generation_workers, self.queue_size),
+            Stage("judge", judge, self.judge_workers, self.queue_size,
+                  batch_size=self.judge_batch_size, batch_wait=self.judge_batch_wait)
+        ])
+        try:
+            pending_results = iter(await pipeline.run(item for item in items if item not in completed))
+        finally:
+            self.pipeline_stats = pipeline.get_stats()
+        results_per_prompt: List[List[CaseResult]] = [[] for _ in prompts]
+        for item in items:
+            result = completed[item] if item in completed else next(pending_results)
+            if result is not None:
+                results_per_prompt[item[0]].append(result)
+        return results_per_prompt
+
+    def _case_result(self, template: str, case_index: int, case_hash: str, model_outputs: List[str],
+                     sample_results: List[Dict[str, Any]]) -> CaseResult:
+        """
+        Combine the judged samples of a case.
+
+        A case with several samples is correct when at least half of them are, and keeps the
+        explanation of its first sample that agrees with that verdict.
+        """
+        case = self.dataset[case_index]
+        if len(sample_results) == 1:
+            evaluation_result = sample_results[0]
+            is_correct = evaluation_result['is_correct']
+            return CaseResult(template, case, case_index, case_hash, model_outputs[0], is_correct,
+                              evaluation_result['explanation_success' if is_correct else 'explanation_failure'])
+
+        sample_correct = [bool(evaluation_result['is_correct']) for evaluation_result in sample_results]
+        is_correct = bool(sample_correct) and sum(sample_correct) / len(sample_correct) >= 0.5
+        representative = next((evaluation_result for evaluation_result in sample_results
+                               if bool(evaluation_result['is_correct']) == is_correct), {})
+        return CaseResult(template, case, case_index, case_hash, model_outputs[0] if model_outputs else '',
+                          is_correct,
+                          representative.get('explanation_success' if is_correct else 'explanation_failure', ''),
+                          model_outputs=model_outputs, sample_correct=sample_correct)
+
+    @staticmethod
+    def _case_score(result: Dict[str, Any]) -> float:
+        """Share of a case's samples judged correct, 0 or 1 for a single sample."""
+        return result.get('sample_score', float(result['is_correct']))
+
+    @staticmethod
+    def _score_variance(results: List[Dict[str, Any]]) -> float:
+        """Variance of the score across sample runs, the j-th run scoring every case on its j-th sample."""
+        runs: List[List[bool]] = []
+        for result in results:
+            for sample, is_correct in enumerate(result.get('sample_correct', [result['is_correct']])):
+                if sample == len(runs):
+                    runs.append([])
+                runs[sample].append(bool(is_correct))
+        run_scores = [sum(run) / len(run) for run in runs]
+        return statistics.variance(run_scores) if len(run_scores) > 1 else 0.0
+
+    async def _build_evaluation(self, prompt: str, results: List[Dict[str, Any]],
+                                usage: Optional[UsageTracker] = None, summarize: bool = True) -> Dict[str, Any]:
+        total_cases = len(results)
+        # Cases correct by majority vote, while the score averages the share of correct samples
+        correct_answers = sum(1 for result in results if result['is_correct'])
+        mean_score = sum(self._case_score(result) for result in results) / total_cases if total_cases else 0.0
+        usage = usage if usage is not None else UsageTracker()
+
+        summary = ''
+        if summarize and results:
+            with tracer.span("evaluator.summarize", cases=len(results)), track_usage(usage):
+                async with self.request_semaphore:
+                    summary = await self.summarize_explanations(results)
 
         return {
             'prompt': prompt,
             'total_cases': total_cases,
             'correct_answers': correct_answers,
-            'score': correct_answers / total_cases,
+            'score': mean_score,
+            'mean_score': mean_score,
+            'score_variance': self._score_variance(results),
             'results': results,
-            'summary': summary
+            'summary': summary,
+            'usage': usage.get_summary()
         }
 
     async def summarize_explanations(self, results: List[Dict[str, Any]]) -> str:
@@ -100,6 +637,142 @@ class Evaluator:
         response = await generator_model.generate(prompt)
         return response.get('message', '')
 
+    async def generate_model_outputs(self, prompt: str, generator_model: Model, n: int = 1) -> List[str]:
+        """Sample n outputs for the prompt in a single request."""
+        if n == 1:
+            return [await self.generate_model_output(prompt, generator_model)]
+        response = await generator_model.generate(prompt, n=n)
+        return response.get('messages') or [response.get('message', '')]
+
+    async def score_outputs(self, pairs: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+        """Resolve confident pairs with the local scorer, if enabled, and send the rest to the judge."""
+        if self.local_scorer is None:
+            return await self.evaluate_outputs(pairs)
+
+        evaluation_results = self.local_scorer.score(pairs)
+        ambiguous = [index for index, result in enumerate(evaluation_results) if result is None]
+        if ambiguous:
+            judged = await self.evaluate_outputs([pairs[index] for index in ambiguous])
+            for index, result in zip(ambiguous, judged):
+                evaluation_results[index] = result
+        return evaluation_results
+
+    def get_local_scoring_stats(self) -> Optional[Dict[str, int]]:
+        """Counts of pairs resolved locally and forwarded to the judge during the last evaluation."""
+        return self.local_scorer.get_stats() if self.local_scorer is not None else None
+
+    async def evaluate_outputs(self, pairs: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+        """
+        Judge several (model_output, expected_output) pairs, in a single request when there is more than one.
+
+        The results of the pairs a batched response covers are kept, and only the pairs it
+        misses are judged again. If the response is malformed or covers none of the pairs, the
+        batch is split in half and each half is retried, down to single-pair evaluate_output calls.
+        """
+        if len(pairs) == 1:
+            async with self.request_semaphore:
+                return [await self.evaluate_output(*pairs[0])]
+
+        async with self.request_semaphore:
+            results_by_index = await self._evaluate_output_batch(pairs)
+        if results_by_index:
+            missing = [index for index in range(len(pairs)) if index not in results_by_index]
+            if missing:
+                print(f"Batch evaluation covered {len(results_by_index)}/{len(pairs)} pairs, "
+                      f"judging the other {len(missing)} again")
+                judged = await self.evaluate_outputs([pairs[index] for index in missing])
+                results_by_index.update(zip(missing, judged))
+            return [results_by_index[index] for index in range(len(pairs))]
+
+        middle = len(pairs) // 2
+        first_half, second_half = await asyncio.gather(
+            self.evaluate_outputs(pairs[:middle]),
+            self.evaluate_outputs(pairs[middle:])
+        )
+        return first_half + second_half
+
+    async def _evaluate_output_batch(self, pairs: List[Tuple[str, str]]) -> Optional[Dict[int, Dict[str, Any]]]:
+        """Return the results of the pairs the response covers, by index, or None if the response is malformed."""
+        pair_list = "\n".join(
+            f"<Pair index=\"{index}\">\n\tModel output: {model_output}\n\tExpected output: {expected_output}\n</Pair>"
+            for index, (model_output, expected_output) in enumerate(pairs)
+        )
+        evaluation_prompt = f"""
+         {pair_list}
+
+         For each numbered pair above, evaluate if the model output is semantically equivalent to the expected output.
+         Return exactly one evaluation per pair, using the pair's index.
+         """
+
+        evaluation_function = {
+            "name": "evaluate_semantic_equivalence_batch",
+            "description": "Evaluate if each pair of outputs is semantically equivalent",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "evaluations": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "index": {
+                                    "type": "integer",
+                                    "description": "Index of the evaluated pair"
+                                },
+                                "is_equivalent": {
+                                    "type": "boolean",
+                                    "description": "True if the outputs are semantically equivalent, False otherwise"
+                                },
+                                "explanation_success": {
+                                    "type": "string",
+                                    "description": "A very brief explanation of why the outputs are equivalent"
+                                },
+                                "explanation_failure": {
+                                    "type": "string",
+                                    "description": "A very brief explanation of why the outputs are not equivalent"
+                                }
+                            },
+                            "required": ["index", "is_equivalent", "explanation_success", "explanation_failure"]
+                        },
+                        "description": f"One evaluation for each of the {len(pairs)} pairs"
+                    }
+                },
+                "required": ["evaluations"]
+            }
+        }
+
+        try:
+            response = await self.evaluation_model.generate(
+                evaluation_prompt,
+                functions=[evaluation_function],
+                function_call={"name": "evaluate_semantic_equivalence_batch"}
+            )
+        except Exception as e:
+            print(f"Error during batch evaluation: {str(e)}")
+            return None
+
+        function = response.get('function') or {}
+        evaluations = (function.get('data') or {}).get('evaluations')
+        if not isinstance(evaluations, list):
+            print(f"Unexpected batch response format from evaluation model, splitting batch of {len(pairs)}")
+            return None
+
+        results_by_index = {}
+        for evaluation in evaluations:
+            if not isinstance(evaluation, dict):
+                continue
+            index = evaluation.get('index')
+            is_correct = evaluation.get('is_equivalent')
+            if not isinstance(index, int) or not 0 <= index < len(pairs) or not isinstance(is_correct, bool):
+                continue
+            results_by_index[index] = {
+                'is_correct': is_correct,
+                'explanation_success': evaluation.get('explanation_success', '') if is_correct else '',
+                'explanation_failure': evaluation.get('explanation_failure', '') if not is_correct else ''
+            }
+
+        return results_by_index
+
     async def evaluate_output(self, model_output: str, expected_output: str) -> Dict[str, Any]:
         evaluation_prompt = f"""
          Model output: {model_output}
@@ -1,11 +1,15 @@
-from typing import List, Tuple, Dict, Any
+from typing import List, Tuple, Dict, Any, Union
 from config import PROMPT_GENERATOR_MODEL
 from optimizer.model_interface import Model
+from utils.tracer import tracer
 
 
 class PromptGenerator:
-    def __init__(self, prompt_generator_model=PROMPT_GENERATOR_MODEL):
-        self.model = Model(prompt_generator_model)
+    def __init__(self, prompt_generator_model: Union[str, Model] = PROMPT_GENERATOR_MODEL):
+        if isinstance(prompt_generator_model, Model):
+            self.model = prompt_generator_model
+        else:
+            self.model = Model(prompt_generator_model)
 
     async def generate_suggestions(self, prompts_and_scores: List[Tuple[str, str, float]], num_suggestions: int = 3) -> \
             Dict[
@@ -56,8 +60,10 @@ class PromptGenerator:
         ]
 
         # Generate analysis and suggestions using the LLM with function calling
-        response = await self.model.generate(prompt, functions=functions,
-                                             function_call={"name": "analyze_and_suggest_prompts"})
+        with tracer.span("generator.generate_suggestions", prompts=len(prompts_and_scores),
+                         num_suggestions=num_suggestions):
+            response = await self.model.generate(prompt, functions=functions,
+                                                 function_call={"name": "analyze_and_suggest_prompts"})
 
         # Extract the function call result
         if response.get('function') and response['function']['name'] == "analyze_and_suggest_prompts":
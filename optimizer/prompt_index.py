@@ -0,0 +1,139 @@
+import hashlib
+import re
+import string
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+import numpy as np
+from config import NEAR_DUPLICATE_THRESHOLD, MINHASH_PERMUTATIONS, MINHASH_BANDS, SHINGLE_SIZE
+
+_PUNCTUATION = str.maketrans('', '', string.punctuation)
+_WHITESPACE = re.compile(r'\s+')
+_PLACEHOLDER = re.compile(r'(\{[^{}]*\})')
+# Modulus of the universal hash family standing in for the permutations, small enough that a * x fits 64 bits
+_PRIME = (1 << 31) - 1
+
+
+def normalize_prompt(prompt: str) -> str:
+    """
+    The form under which two prompts count as the same: whitespace is ignored, and so is case
+    outside of placeholders, as {text} and {TEXT} are different variables.
+    """
+    # split keeps the placeholders at the odd positions
+    parts = _PLACEHOLDER.split(prompt)
+    text = ''.join(part if position % 2 else part.casefold() for position, part in enumerate(parts))
+    return _WHITESPACE.sub(' ', text).strip()
+
+
+def prompt_key(prompt: str) -> str:
+    return hashlib.sha256(normalize_prompt(prompt).encode('utf-8')).hexdigest()
+
+
+class PromptIndex:
+    """
+    Every evaluated prompt, to find exact and near duplicates of new suggestions before evaluating them.
+
+    Exact duplicates are prompts that are the same up to whitespace and the case of their text
+    (placeholders keep theirs), looked up by the hash of their normalized text. Near duplicates
+    are prompts whose sets of character shingles (punctuation removed) have a Jaccard similarity
+    of at least threshold, estimated from MinHash signatures. Candidates are found through
+    locality-sensitive hashing, with the signature cut into bands: prompts sharing any band are
+    compared, so a lookup doesn't scan the whole index.
+    """
+
+    def __init__(self, threshold: float = NEAR_DUPLICATE_THRESHOLD, permutations: int = MINHASH_PERMUTATIONS,
+                 bands: int = MINHASH_BANDS, shingle_size: int = SHINGLE_SIZE, seed: int = 0):
+        if permutations % bands:
+            raise ValueError("permutations must be a multiple of bands")
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = permutations // bands
+        self.shingle_size = shingle_size
+        generator = np.random.default_rng(seed)
+        self._a = generator.integers(1, _PRIME, size=permutations, dtype=np.uint64)
+        self._b = generator.integers(0, _PRIME, size=permutations, dtype=np.uint64)
+        self.evaluations: Dict[str, Dict[str, Any]] = {}
+        self.prompts: Dict[str, str] = {}
+        self.signatures: Dict[str, np.ndarray] = {}
+        self.buckets: List[Dict[bytes, Set[str]]] = [{} for _ in range(bands)]
+
+    def __len__(self) -> int:
+        return len(self.evaluations)
+
+    def __contains__(self, prompt: str) -> bool:
+        return prompt_key(prompt) in self.evaluations
+
+    def get(self, prompt: str) -> Optional[Dict[str, Any]]:
+        """The evaluation of an exact duplicate of the prompt, or None."""
+        return self.evaluations.get(prompt_key(prompt))
+
+    def add(self, prompt: str, evaluation: Dict[str, Any], replace: bool = False):
+        """Index an evaluated prompt. The first evaluation of a prompt is kept, unless replace is set."""
+        key = prompt_key(prompt)
+        if key in self.evaluations:
+            if replace:
+                self.evaluations[key] = evaluation
+            return
+        self.evaluations[key] = evaluation
+        self.prompts[key] = prompt
+        signature = self.signature(prompt)
+        self.signatures[key] = signature
+        for band, bucket in zip(self._bands(signature), self.buckets):
+            bucket.setdefault(band, set()).add(key)
+
+    def add_evaluations(self, evaluations: List[Dict[str, Any]]):
+        for evaluation in evaluations:
+            self.add(evaluation['prompt'], evaluation)
+
+    def find_near_duplicate(self, prompt: str) -> Optional[Tuple[str, float]]:
+        """The most similar indexed prompt at or above the threshold, with its estimated similarity, or None."""
+        return self._most_similar(self.signature(prompt), exclude=prompt_key(prompt))
+
+    def select(self, prompts: Sequence[str], accepted: Sequence[str] = ()) -> Tuple[List[str], List[str]]:
+        """
+        Split new suggestions into those worth evaluating and near duplicates.
+
+        Exact duplicates of indexed prompts are kept, as their evaluation is reused. A prompt
+        that duplicates, exactly or nearly, a prompt kept before it (or one of accepted) is
+        dropped, like a near duplicate of an indexed prompt.
+        """
+        kept, near_duplicates = [], []
+        # Suggestions come a few at a time, so they are compared with each other directly
+        batch = [(prompt_key(prompt), self.signature(prompt)) for prompt in accepted]
+        for prompt in prompts:
+            key, signature = prompt_key(prompt), self.signature(prompt)
+            duplicates_batch = any(key == other_key or self.similarity(signature, other) >= self.threshold
+                                   for other_key, other in batch)
+            if duplicates_batch or (key not in self.evaluations and self._most_similar(signature) is not None):
+                near_duplicates.append(prompt)
+            else:
+                kept.append(prompt)
+                batch.append((key, signature))
+        return kept, near_duplicates
+
+    def signature(self, prompt: str) -> np.ndarray:
+        """MinHash signature of the prompt's character shingles."""
+        text = _WHITESPACE.sub(' ', prompt.casefold().translate(_PUNCTUATION)).strip()
+        shingles = {text[start:start + self.shingle_size]
+                    for start in range(max(1, len(text) - self.shingle_size + 1))}
+        hashes = np.array([int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=8).digest(), 'big')
+                           % _PRIME for shingle in shingles], dtype=np.uint64)
+        return ((self._a[:, None] * hashes[None, :] + self._b[:, None]) % _PRIME).min(axis=1)
+
+    def similarity(self, first: np.ndarray, second: np.ndarray) -> float:
+        """Estimated Jaccard similarity of two signatures."""
+        return float(np.mean(first == second))
+
+    def _bands(self, signature: np.ndarray) -> List[bytes]:
+        return [signature[band * self.rows:(band + 1) * self.rows].tobytes() for band in range(self.bands)]
+
+    def _most_similar(self, signature: np.ndarray, exclude: Optional[str] = None) -> Optional[Tuple[str, float]]:
+        candidates: Set[str] = set()
+        for band, bucket in zip(self._bands(signature), self.buckets):
+            candidates |= bucket.get(band, set())
+        candidates.discard(exclude)
+        best = None
+        # Sorted so ties resolve the same way on every run
+        for key in sorted(candidates):
+            similarity = self.similarity(signature, self.signatures[key])
+            if similarity >= self.threshold and (best is None or similarity > best[1]):
+                best = (self.prompts[key], similarity)
+        return best
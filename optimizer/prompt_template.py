@@ -0,0 +1,117 @@
+import re
+import string
+import time
+from typing import Any, List, Mapping, Optional, Sequence, Tuple
+
+_FORMATTER = string.Formatter()
+
+
+class TemplateError(ValueError):
+    """A prompt that can't be rendered with the dataset's variables."""
+    pass
+
+
+def repair_template(text: str, variables: Sequence[str]) -> str:
+    """
+    Escape the braces of a prompt that aren't part of a placeholder for one of variables.
+
+    Escaped braces ({{ and }}) and placeholders of variables, with an optional conversion and
+    format spec, are kept; any other brace is doubled, so e.g. a JSON example in a suggestion is
+    rendered as written instead of being read as a placeholder.
+    """
+    names = '|'.join(re.escape(variable) for variable in sorted(variables, key=len, reverse=True))
+    placeholder = rf'\{{(?:{names})(?:![rsa])?(?::[^{{}}]*)?\}}|' if names else ''
+    pattern = re.compile(rf'\{{\{{|\}}\}}|{placeholder}[{{}}]')
+    return pattern.sub(lambda match: match.group() * 2 if len(match.group()) == 1 else match.group(), text)
+
+
+class PromptTemplate:
+    """
+    A prompt parsed once into literal text and placeholders, checked against the dataset's variables.
+
+    Compiling fails with a TemplateError when the prompt has unbalanced braces, positional or
+    attribute/index placeholders, placeholders for unknown variables, or doesn't use every
+    variable, so a candidate is rejected before any model call is made for it. Rendering joins
+    the literal parts with the case's values, without parsing the prompt again, and renders the
+    same text as str.format. Compile and render times are kept on the template.
+    """
+
+    __slots__ = ('text', 'fields', '_pieces', '_slots', 'compile_seconds', 'renders', 'render_seconds')
+
+    def __init__(self, text: str, variables: Sequence[str]):
+        start = time.perf_counter()
+        self.text = text
+        # The literal parts, with a None left at every placeholder's place, filled in by render
+        pieces: List[Optional[str]] = []
+        slots: List[Tuple[int, str, Optional[str], str]] = []
+        try:
+            for literal, field_name, format_spec, conversion in _FORMATTER.parse(text):
+                if literal:
+                    pieces.append(literal)
+                if field_name is not None:
+                    self._check_field(field_name, format_spec, variables)
+                    slots.append((len(pieces), field_name, conversion, format_spec or ''))
+                    pieces.append(None)
+        except ValueError as e:
+            if isinstance(e, TemplateError):
+                raise
+            raise TemplateError(f"Invalid prompt template: {e}") from e
+
+        self.fields = frozenset(field_name for _, field_name, _, _ in slots)
+        missing = [variable for variable in variables if variable not in self.fields]
+        if missing:
+            raise TemplateError(f"Prompt doesn't use the variables {missing}")
+        self._pieces = pieces
+        self._slots = tuple(slots)
+        self.compile_seconds = time.perf_counter() - start
+        self.renders = 0
+        self.render_seconds = 0.0
+
+    @staticmethod
+    def _check_field(field_name: str, format_spec: Optional[str], variables: Sequence[str]):
+        if field_name == '' or field_name.isdigit():
+            raise TemplateError("Positional placeholders aren't supported, use the variable names")
+        if field_name not in variables:
+            if '.' in field_name or '[' in field_name:
+                raise TemplateError(f"Attribute and index placeholders aren't supported: {{{field_name}}}")
+            raise TemplateError(f"Unknown placeholder {{{field_name}}}, expected one of {list(variables)}")
+        if format_spec and '{' in format_spec:
+            raise TemplateError(f"Nested placeholders aren't supported: {{{field_name}:{format_spec}}}")
+
+    def __repr__(self) -> str:
+        return f"PromptTemplate(fields={sorted(self.fields)})"
+
+    def render(self, variables: Mapping[str, Any]) -> str:
+        """The prompt with the placeholders replaced by the values in variables."""
+        start = time.perf_counter()
+        pieces = self._pieces.copy()
+        for index, field_name, conversion, format_spec in self._slots:
+            value = variables[field_name]
+            if conversion is None and not format_spec:
+                pieces[index] = str(value)
+            else:
+                pieces[index] = format(_FORMATTER.convert_field(value, conversion), format_spec)
+        rendered = ''.join(pieces)
+        self.renders += 1
+        self.render_seconds += time.perf_counter() - start
+        return rendered
+
+
+def compile_prompt(text: str, variables: Sequence[str], repair: bool = False) -> PromptTemplate:
+    """
+    Compile a prompt, and with repair, retry once with its stray braces escaped if it doesn't compile.
+
+    The returned template's text is the repaired prompt when it had to be repaired.
+
+    Raises:
+        TemplateError: If the prompt (even repaired) doesn't compile.
+    """
+    try:
+        return PromptTemplate(text, variables)
+    except TemplateError:
+        if not repair:
+            raise
+        repaired = repair_template(text, variables)
+        if repaired == text:
+            raise
+        return PromptTemplate(repaired, variables)
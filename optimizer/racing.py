@@ -0,0 +1,41 @@
+import math
+from typing import List, Tuple
+
+
+def racing_schedule(total_cases: int, initial_cases: int, growth_factor: float) -> List[int]:
+    """
+    Cumulative case counts evaluated after each racing round, ending with the full dataset.
+
+    e.g. racing_schedule(50, 5, 2) -> [5, 10, 20, 40, 50]
+    """
+    if growth_factor <= 1:
+        raise ValueError("growth_factor must be greater than 1")
+
+    schedule = []
+    size = max(1, initial_cases)
+    while size < total_cases:
+        schedule.append(size)
+        size = max(size + 1, int(math.ceil(size * growth_factor)))
+    schedule.append(total_cases)
+    return schedule
+
+
+def confidence_bounds(correct: int, evaluated: int, confidence: float) -> Tuple[float, float]:
+    """Hoeffding lower and upper bounds on a prompt's accuracy after `evaluated` cases."""
+    if evaluated == 0:
+        return 0.0, 1.0
+    mean = correct / evaluated
+    margin = math.sqrt(math.log(2 / (1 - confidence)) / (2 * evaluated))
+    return max(0.0, mean - margin), min(1.0, mean + margin)
+
+
+def surviving_candidates(scores: List[Tuple[int, int]], confidence: float) -> List[bool]:
+    """
+    Decide which candidates stay in the race.
+
+    scores holds (correct, evaluated) per candidate. A candidate is dropped once its upper
+    bound falls below the best lower bound among all candidates, so the leader always survives.
+    """
+    bounds = [confidence_bounds(correct, evaluated, confidence) for correct, evaluated in scores]
+    best_lower_bound = max(lower for lower, _ in bounds)
+    return [upper >= best_lower_bound for _, upper in bounds]
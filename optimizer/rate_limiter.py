@@ -0,0 +1,155 @@
+import asyncio
+import json
+import time
+from typing import Any, Dict, List, Optional
+from config import (
+    RATE_LIMITS,
+    DEFAULT_RATE_LIMIT,
+    RATE_LIMIT_INITIAL_CONCURRENCY,
+    RATE_LIMIT_MIN_CONCURRENCY,
+    RATE_LIMIT_MAX_CONCURRENCY,
+    ESTIMATED_COMPLETION_TOKENS
+)
+
+
+class TokenBucket:
+    """Bucket holding up to `capacity` units, refilled continuously at `capacity` units per minute."""
+
+    def __init__(self, capacity: float):
+        if capacity <= 0:
+            raise ValueError("Rate limits must be greater than 0")
+        self.capacity = capacity
+        self.refill_rate = capacity / 60.0
+        self.available = capacity
+        self.updated_at = time.monotonic()
+
+    def _refill(self, now: float):
+        self.available = min(self.capacity, self.available + (now - self.updated_at) * self.refill_rate)
+        self.updated_at = now
+
+    def time_until(self, amount: float, now: float) -> float:
+        """Seconds until `amount` units are available (amounts above capacity are capped to it)."""
+        self._refill(now)
+        missing = min(amount, self.capacity) - self.available
+        return max(0.0, missing / self.refill_rate)
+
+    def consume(self, amount: float, now: float):
+        self._refill(now)
+        self.available -= min(amount, self.capacity)
+
+
+class RateLimiter:
+    """
+    Client-side limiter for a single model.
+
+    Requests wait for a concurrency slot and for room in the requests-per-minute and
+    tokens-per-minute buckets before being sent. The concurrency limit adapts with AIMD:
+    it grows by about one slot per limit's worth of successful requests and halves when the
+    provider answers with a rate limit error, after which every request waits out the
+    provider's Retry-After.
+    """
+
+    def __init__(self,
+                 requests_per_minute: float,
+                 tokens_per_minute: float,
+                 initial_concurrency: float = RATE_LIMIT_INITIAL_CONCURRENCY,
+                 min_concurrency: float = RATE_LIMIT_MIN_CONCURRENCY,
+                 max_concurrency: float = RATE_LIMIT_MAX_CONCURRENCY,
+                 decrease_interval: float = 1.0):
+        self.request_bucket = TokenBucket(requests_per_minute)
+        self.token_bucket = TokenBucket(tokens_per_minute)
+        self.concurrency_limit = float(initial_concurrency)
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        # Requests sent in the same burst tend to be rejected together; count that as one signal
+        self.decrease_interval = decrease_interval
+        self.in_flight = 0
+        self.blocked_until = 0.0
+        self.last_decrease = float('-inf')
+        self.successes = 0
+        self.rate_limited = 0
+        self._waiters: List[asyncio.Future] = []
+
+    @staticmethod
+    def estimate_tokens(prompt: str, functions: Optional[List[Dict[str, Any]]] = None, n: int = 1) -> int:
+        """Rough token count of a request, at about four characters per token, plus the n expected completions."""
+        characters = len(prompt) + (len(json.dumps(functions)) if functions else 0)
+        return characters // 4 + ESTIMATED_COMPLETION_TOKENS * n
+
+    async def acquire(self, estimated_tokens: int):
+        while True:
+            now = time.monotonic()
+            if now < self.blocked_until:
+                await asyncio.sleep(self.blocked_until - now)
+                continue
+
+            if self.in_flight >= max(1, int(self.concurrency_limit)):
+                waiter = asyncio.get_running_loop().create_future()
+                self._waiters.append(waiter)
+                try:
+                    await waiter
+                finally:
+                    if waiter in self._waiters:
+                        self._waiters.remove(waiter)
+                continue
+
+            wait = max(self.request_bucket.time_until(1, now), self.token_bucket.time_until(estimated_tokens, now))
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+
+            self.request_bucket.consume(1, now)
+            self.token_bucket.consume(estimated_tokens, now)
+            self.in_flight += 1
+            return
+
+    def release(self, success: bool = True):
+        self.in_flight -= 1
+        if success:
+            self.successes += 1
+            self.concurrency_limit = min(self.max_concurrency, self.concurrency_limit + 1 / self.concurrency_limit)
+        self._wake_waiters()
+
+    def on_rate_limited(self, retry_after: Optional[float] = None):
+        now = time.monotonic()
+        self.rate_limited += 1
+        if now - self.last_decrease >= self.decrease_interval:
+            self.concurrency_limit = max(self.min_concurrency, self.concurrency_limit / 2)
+            self.last_decrease = now
+        if retry_after:
+            self.blocked_until = max(self.blocked_until, now + retry_after)
+
+    def _wake_waiters(self):
+        # Waiters re-check every condition when they wake, so waking all of them is safe
+        for waiter in self._waiters:
+            if not waiter.done():
+                waiter.set_result(None)
+        self._waiters.clear()
+
+    def get_state(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "concurrency_limit": self.concurrency_limit,
+            "in_flight": self.in_flight,
+            "waiting": len(self._waiters),
+            "available_requests": self.request_bucket.available,
+            "available_tokens": self.token_bucket.available,
+            "blocked_for": max(0.0, self.blocked_until - now),
+            "successes": self.successes,
+            "rate_limited": self.rate_limited
+        }
+
+
+_rate_limiters: Dict[str, RateLimiter] = {}
+
+
+def get_rate_limiter(model_name: str) -> RateLimiter:
+    """Return the limiter shared by every Model instance of model_name."""
+    if model_name not in _rate_limiters:
+        limits = RATE_LIMITS.get(model_name, DEFAULT_RATE_LIMIT)
+        _rate_limiters[model_name] = RateLimiter(limits["requests_per_minute"], limits["tokens_per_minute"])
+    return _rate_limiters[model_name]
+
+
+def get_rate_limiter_states() -> Dict[str, Dict[str, Any]]:
+    return {model_name: limiter.get_state() for model_name, limiter in _rate_limiters.items()}
@@ -0,0 +1,118 @@
+import asyncio
+from typing import Any, Dict, List, Optional, Tuple
+from config import SPECULATION_START_FRACTION, SPECULATION_SCORE_TOLERANCE
+from optimizer.prompt_generator import PromptGenerator
+from utils.performance_logger import PerformanceLogger
+
+HistoryContext = List[Tuple[str, str, float]]
+
+
+class EvaluationProgress:
+    """Running per-prompt results of an evaluation, which the evaluator updates as cases are judged."""
+
+    def __init__(self):
+        self.prompts: List[str] = []
+        self.total_cases = 0
+        self.correct: List[float] = []
+        self.judged: List[int] = []
+        self._changed = asyncio.Event()
+
+    def reset(self, prompts: List[str], cases_per_prompt: int):
+        self.prompts = list(prompts)
+        self.total_cases = len(prompts) * cases_per_prompt
+        self.correct = [0.0] * len(prompts)
+        self.judged = [0] * len(prompts)
+        self._changed.set()
+
+    def record(self, position: int, score: float):
+        self.judged[position] += 1
+        self.correct[position] += float(score)
+        self._changed.set()
+
+    def fraction(self) -> float:
+        return sum(self.judged) / self.total_cases if self.total_cases else 0.0
+
+    async def wait_for(self, fraction: float):
+        """Wait until at least this fraction of the evaluation's cases has been judged."""
+        while not self.total_cases or self.fraction() < fraction:
+            self._changed.clear()
+            await self._changed.wait()
+
+    def get_provisional_evaluations(self) -> List[Dict[str, Any]]:
+        """Evaluations of the prompts on the cases judged so far, without summaries."""
+        return [
+            {
+                'prompt': prompt,
+                'total_cases': judged,
+                'correct_answers': correct,
+                'score': correct / judged if judged else 0.0,
+                'summary': ''
+            }
+            for prompt, correct, judged in zip(self.prompts, self.correct, self.judged)
+        ]
+
+
+def history_context(historical_prompts: List[Dict[str, Any]]) -> HistoryContext:
+    """The (prompt, summary, score) triples the generator is given."""
+    return [(evaluation['prompt'], evaluation['summary'], evaluation['score']) for evaluation in historical_prompts]
+
+
+class SpeculativeGeneration:
+    """
+    Generates the next suggestions from partial results while the current evaluation still runs.
+
+    Once start_fraction of the evaluation's cases are judged, the historical context is built
+    with provisional scores for the prompts being evaluated (and no summaries for them yet) and
+    suggestions are requested from it. When the evaluation completes, the speculative suggestions
+    are kept only if the final context ranks the same prompts in the same order with scores
+    within score_tolerance; otherwise they are discarded and the caller generates them again.
+    """
+
+    def __init__(self, generator: PromptGenerator, logger: PerformanceLogger, progress: EvaluationProgress,
+                 num_suggestions: int, start_fraction: float = SPECULATION_START_FRACTION,
+                 score_tolerance: float = SPECULATION_SCORE_TOLERANCE):
+        self.generator = generator
+        self.logger = logger
+        self.progress = progress
+        self.num_suggestions = num_suggestions
+        self.start_fraction = start_fraction
+        self.score_tolerance = score_tolerance
+        self.context: Optional[HistoryContext] = None
+        self.task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self.task = asyncio.create_task(self._speculate())
+
+    async def _speculate(self) -> Dict[str, Any]:
+        await self.progress.wait_for(self.start_fraction)
+        self.context = history_context(
+            self.logger.get_historical_prompts(pending_evaluations=self.progress.get_provisional_evaluations())
+        )
+        return await self.generator.generate_suggestions(self.context, self.num_suggestions)
+
+    def matches(self, context: HistoryContext) -> bool:
+        """Whether the final context ranks the same prompts as the speculative one, with close scores."""
+        if self.context is None or len(self.context) != len(context):
+            return False
+        return all(
+            speculative_prompt == prompt and abs(speculative_score - score) <= self.score_tolerance
+            for (speculative_prompt, _, speculative_score), (prompt, _, score) in zip(self.context, context)
+        )
+
+    async def resolve(self, context: HistoryContext) -> Optional[Dict[str, Any]]:
+        """Return the speculative suggestions if they still hold for the final context, None otherwise."""
+        if self.task is None:
+            return None
+        if self.context is None or not self.matches(context):
+            await self.cancel()
+            return None
+        try:
+            return await self.task
+        except Exception as e:
+            print(f"Speculative suggestion generation failed: {str(e)}")
+            return None
+
+    async def cancel(self):
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
@@ -0,0 +1,118 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, Optional, Tuple
+from config import MODEL_PRICES
+
+USAGE_FIELDS = ("prompt_tokens", "completion_tokens", "cached_tokens")
+# Calls cancelled in flight report no usage, so their tokens are the rate limiter's estimate
+CANCELLED_FIELDS = ("cancelled_calls", "cancelled_tokens")
+
+
+def estimate_cost(model_name: str, usage: Dict[str, float]) -> Optional[float]:
+    """
+    Cost in dollars of the given token counts, or None if the model has no entry in MODEL_PRICES.
+
+    Cached tokens are a subset of the prompt tokens and are billed at the cached prompt price.
+    """
+    prices = MODEL_PRICES.get(model_name)
+    if prices is None:
+        return None
+    cached_tokens = usage.get("cached_tokens", 0)
+    uncached_tokens = usage.get("prompt_tokens", 0) - cached_tokens
+    return (uncached_tokens * prices["prompt"]
+            + cached_tokens * prices.get("cached_prompt", prices["prompt"])
+            + usage.get("completion_tokens", 0) * prices["completion"]) / 1_000_000
+
+
+class UsageTracker:
+    """
+    Token counts, per model, of the provider calls attributed to one prompt, iteration or run.
+
+    Calls cancelled in flight are counted apart, with their estimated tokens.
+    """
+
+    def __init__(self):
+        self.models: Dict[str, Dict[str, float]] = {}
+
+    def _totals(self, model_name: str) -> Dict[str, float]:
+        totals = self.models.setdefault(model_name, {})
+        for field in ("calls",) + USAGE_FIELDS + CANCELLED_FIELDS:
+            # Totals restored from a checkpoint may predate some fields
+            totals.setdefault(field, 0.0)
+        return totals
+
+    def add(self, model_name: str, usage: Dict[str, int], share: float = 1.0):
+        totals = self._totals(model_name)
+        totals["calls"] += share
+        for field in USAGE_FIELDS:
+            totals[field] += (usage.get(field) or 0) * share
+
+    def add_cancelled(self, model_name: str, estimated_tokens: int, share: float = 1.0):
+        totals = self._totals(model_name)
+        totals["cancelled_calls"] += share
+        totals["cancelled_tokens"] += estimated_tokens * share
+
+    def get_summary(self) -> Dict[str, Any]:
+        """
+        Rounded totals with their cost, overall and per model.
+
+        The cost covers only models with a price; it is None if none of the used models has one.
+        The estimated tokens of cancelled calls are priced as prompt tokens.
+        """
+        fields = ("calls",) + USAGE_FIELDS + CANCELLED_FIELDS
+        summary: Dict[str, Any] = {field: 0 for field in fields}
+        summary["cost"] = None
+        summary["models"] = {}
+        for model_name in sorted(self.models):
+            totals = self._totals(model_name)
+            cost = estimate_cost(model_name, totals)
+            if cost is not None:
+                cost += estimate_cost(model_name, {"prompt_tokens": totals["cancelled_tokens"]})
+            model_summary = {field: round(value) for field, value in totals.items()}
+            model_summary["cost"] = round(cost, 6) if cost is not None else None
+            summary["models"][model_name] = model_summary
+            for field in fields:
+                summary[field] += model_summary[field]
+            if cost is not None:
+                summary["cost"] = round((summary["cost"] or 0.0) + cost, 6)
+        return summary
+
+
+# Trackers that the model calls of the current task are attributed to, with the share of each call
+_usage_sinks: ContextVar[Tuple[Tuple[UsageTracker, float], ...]] = ContextVar("usage_sinks", default=())
+
+
+@contextmanager
+def track_usage(tracker: UsageTracker, share: float = 1.0) -> Iterator[UsageTracker]:
+    """
+    Attribute the usage of model calls made inside the block (and the tasks it spawns) to tracker.
+
+    Blocks nest, so a call can count towards a prompt and its iteration at once. share splits a
+    call between several trackers, e.g. a judge request scoring outputs of different prompts.
+    """
+    token = _usage_sinks.set(_usage_sinks.get() + ((tracker, share),))
+    try:
+        yield tracker
+    finally:
+        _usage_sinks.reset(token)
+
+
+def record_usage(model_name: str, usage: Optional[Dict[str, int]]):
+    if not usage:
+        return
+    for tracker, share in _usage_sinks.get():
+        tracker.add(model_name, usage, share)
+
+
+def record_cancelled(model_name: str, estimated_tokens: int):
+    """Count a call cancelled in flight, which reports no usage, with its estimated tokens."""
+    for tracker, share in _usage_sinks.get():
+        tracker.add_cancelled(model_name, estimated_tokens, share)
+
+
+def format_usage(summary: Dict[str, Any]) -> str:
+    cost = f"${summary['cost']:.4f}" if summary["cost"] is not None else "unknown cost"
+    cancelled = (f", {summary['cancelled_calls']} cancelled calls (about {summary['cancelled_tokens']} tokens)"
+                 if summary.get("cancelled_calls") else "")
+    return (f"{summary['calls']} calls, {summary['prompt_tokens']} prompt tokens "
+            f"({summary['cached_tokens']} cached), {summary['completion_tokens']} completion tokens{cancelled}, {cost}")
@@ -1,3 +1,5 @@
+import hashlib
+import json
 from abc import ABC, abstractmethod
 from typing import Optional, Any, TypedDict, List, Dict
 
@@ -7,12 +9,47 @@ class FunctionCall(TypedDict):
     data: Any
 
 
+class TokenUsage(TypedDict):
+    prompt_tokens: int
+    completion_tokens: int
+    cached_tokens: int  # part of prompt_tokens served from the provider's prompt cache
+
+
 class ProviderResponse(TypedDict):
     function: Optional[FunctionCall]
     message: Optional[str]
+    messages: Optional[List[str]]  # every completion when several were requested, message is the first
     error: Optional[str]
     raw_response: Any
     provider: str
+    usage: Optional[TokenUsage]
+
+
+def make_request_key(model_name: str,
+                     temperature: float,
+                     prompt: str,
+                     functions: Optional[List[Dict[str, Any]]] = None,
+                     function_call: Optional[Dict[str, str]] = None,
+                     n: int = 1) -> str:
+    """Stable hash of everything that determines a provider's response to a request."""
+    request = [model_name, temperature, prompt, functions, function_call]
+    if n != 1:
+        # Single completion requests keep the keys they had before n was supported
+        request.append(n)
+    payload = json.dumps(
+        request,
+        sort_keys=True,
+        separators=(',', ':')
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class RateLimitError(Exception):
+    """Raised by providers when the API rejects a request for exceeding its rate limits."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
 
 
 class BaseProvider(ABC):
@@ -22,7 +59,8 @@ class BaseProvider(ABC):
                        prompt: str,
                        temperature: float = 0.7,
                        functions: Optional[List[Dict[str, Any]]] = None,
-                       function_call: Optional[Dict[str, str]] = None) -> ProviderResponse:
+                       function_call: Optional[Dict[str, str]] = None,
+                       n: int = 1) -> ProviderResponse:
         """
         Generate a response from the AI model.
 
@@ -32,6 +70,7 @@ class BaseProvider(ABC):
             temperature (float, optional): The sampling temperature. Defaults to 0.7.
             functions (Optional[List[Dict[str, Any]]], optional): List of function specifications. Defaults to None.
             function_call (Optional[Dict[str, str]], optional): Function call specifications. Defaults to None.
+            n (int, optional): The number of completions to sample in the same request. Defaults to 1.
 
         Returns:
             ProviderResponse: A dictionary containing the response details.
@@ -52,7 +91,9 @@ class BaseProvider(ABC):
                         function: Optional[FunctionCall] = None,
                         message: Optional[str] = None,
                         error: Optional[str] = None,
-                        raw_response: Any = None) -> ProviderResponse:
+                        raw_response: Any = None,
+                        usage: Optional[TokenUsage] = None,
+                        messages: Optional[List[str]] = None) -> ProviderResponse:
         """
         Create a standardized response dictionary.
 
@@ -61,6 +102,8 @@ class BaseProvider(ABC):
             message (Optional[str], optional): Response message. Defaults to None.
             error (Optional[str], optional): Error message. Defaults to None.
             raw_response (Any, optional): Raw response from the provider. Defaults to None.
+            usage (Optional[TokenUsage], optional): Tokens billed for the request. Defaults to None.
+            messages (Optional[List[str]], optional): Every sampled completion. Defaults to None.
 
         Returns:
             ProviderResponse: A dictionary containing the response details.
@@ -68,7 +111,9 @@ class BaseProvider(ABC):
         return {
             "function": function,
             "message": message,
+            "messages": messages,
             "error": error,
             "raw_response": raw_response,
-            "provider": self.get_provider_name()
+            "provider": self.get_provider_name(),
+            "usage": usage
         }
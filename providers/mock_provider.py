@@ -0,0 +1,158 @@
+import asyncio
+import json
+import math
+import random
+import re
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+from config import ORIGINAL_PROMPT
+from .base_provider import BaseProvider, ProviderResponse, RateLimitError
+
+LATENCY_DISTRIBUTIONS = ("constant", "uniform", "exponential", "lognormal")
+
+
+class MockProvider(BaseProvider):
+    """
+    Local stand-in for an LLM API, used for benchmarking the optimization loop.
+
+    Each call sleeps for a latency drawn from the chosen distribution (with the given mean),
+    may fail with an error response (error_rate) or a rate limit error (rate_limit_rate), and
+    otherwise returns a well-formed payload: a plain message, or valid arguments for the
+    evaluate_semantic_equivalence, evaluate_semantic_equivalence_batch and
+    analyze_and_suggest_prompts functions, with a token usage estimated from its size.
+    Outputs are judged equivalent with probability `accuracy`.
+    """
+
+    def __init__(self,
+                 latency_mean: float = 0.05,
+                 latency_distribution: str = "lognormal",
+                 error_rate: float = 0.0,
+                 rate_limit_rate: float = 0.0,
+                 retry_after: float = 0.05,
+                 accuracy: float = 0.7,
+                 variables: Optional[List[str]] = None,
+                 seed: Optional[int] = None):
+        if latency_distribution not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution: {latency_distribution}. "
+                             f"Expected one of {LATENCY_DISTRIBUTIONS}")
+        self.latency_mean = latency_mean
+        self.latency_distribution = latency_distribution
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self.accuracy = accuracy
+        self.variables = variables if variables is not None else ORIGINAL_PROMPT['variables']
+        self.random = random.Random(seed)
+        self.calls = 0
+        self.errors = 0
+        self.rate_limited = 0
+        # Observed latencies per "model_name:function" (or "model_name:message")
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+
+    def get_provider_name(self) -> str:
+        return self.__class__.__name__
+
+    async def generate(self,
+                       model_name: str,
+                       prompt: str,
+                       temperature: float = 0.7,
+                       functions: Optional[List[Dict[str, Any]]] = None,
+                       function_call: Optional[Dict[str, str]] = None,
+                       n: int = 1) -> ProviderResponse:
+        self.calls += 1
+        started = time.perf_counter()
+        await asyncio.sleep(self._sample_latency())
+
+        function_name = function_call["name"] if function_call else None
+        self.latencies[f"{model_name}:{function_name or 'message'}"].append(time.perf_counter() - started)
+
+        roll = self.random.random()
+        if roll < self.rate_limit_rate:
+            self.rate_limited += 1
+            raise RateLimitError("Mock rate limit exceeded", retry_after=self.retry_after)
+        if roll < self.rate_limit_rate + self.error_rate:
+            self.errors += 1
+            return self.create_response(error="Mock provider error")
+
+        if function_name is None:
+            messages = [f"Mock response {index} to a {len(prompt)} character prompt" for index in range(n)]
+            return self.create_response(message=messages[0], messages=messages if n > 1 else None,
+                                        usage=self._usage(prompt, functions, "".join(messages)))
+        data = self._function_data(function_name, prompt, functions)
+        return self.create_response(function={"name": function_name, "data": data},
+                                    usage=self._usage(prompt, functions, json.dumps(data)))
+
+    @staticmethod
+    def _usage(prompt: str, functions: Optional[List[Dict[str, Any]]], completion: str) -> Dict[str, int]:
+        # About four characters per token, like RateLimiter.estimate_tokens
+        prompt_characters = len(prompt) + (len(json.dumps(functions)) if functions else 0)
+        return {
+            "prompt_tokens": prompt_characters // 4,
+            "completion_tokens": len(completion) // 4,
+            "cached_tokens": 0
+        }
+
+    def _sample_latency(self) -> float:
+        if self.latency_mean <= 0:
+            return 0.0
+        if self.latency_distribution == "constant":
+            return self.latency_mean
+        if self.latency_distribution == "uniform":
+            return self.random.uniform(0, 2 * self.latency_mean)
+        if self.latency_distribution == "exponential":
+            return self.random.expovariate(1 / self.latency_mean)
+        # Lognormal with sigma 0.5 has a long right tail, like real API latencies
+        sigma = 0.5
+        return self.random.lognormvariate(0, sigma) * self.latency_mean / math.exp(sigma ** 2 / 2)
+
+    def _verdict(self) -> Dict[str, Any]:
+        is_equivalent = self.random.random() < self.accuracy
+        return {
+            "is_equivalent": is_equivalent,
+            "explanation_success": "Mock outputs match" if is_equivalent else "",
+            "explanation_failure": "" if is_equivalent else "Mock outputs differ"
+        }
+
+    def _function_data(self, function_name: str, prompt: str,
+                       functions: Optional[List[Dict[str, Any]]]) -> Dict[str, Any]:
+        if function_name == "evaluate_semantic_equivalence":
+            return self._verdict()
+
+        if function_name == "evaluate_semantic_equivalence_batch":
+            pair_count = len(re.findall(r'<Pair index="\d+">', prompt))
+            return {"evaluations": [{"index": index, **self._verdict()} for index in range(pair_count)]}
+
+        if function_name == "analyze_and_suggest_prompts":
+            schema = str(functions)
+            match = re.search(r"List of (\d+) suggested", schema)
+            count = int(match.group(1)) if match else 3
+            placeholders = " ".join(f"{{{variable}}}" for variable in self.variables)
+            return {
+                "analysis": {
+                    "high_performance_factors": ["Mock high performance factor"],
+                    "low_performance_factors": ["Mock low performance factor"]
+                },
+                "suggestions": [
+                    {
+                        "prompt": f"Mock prompt variant {self.random.getrandbits(32):08x}: {placeholders}",
+                        "explanation": "Mock suggestion"
+                    }
+                    for _ in range(count)
+                ]
+            }
+
+        return {}
+
+    def get_latency_stats(self) -> Dict[str, Dict[str, float]]:
+        stats = {}
+        for name, latencies in sorted(self.latencies.items()):
+            ordered = sorted(latencies)
+            stats[name] = {
+                "calls": len(ordered),
+                "mean": sum(ordered) / len(ordered),
+                "p50": ordered[len(ordered) // 2],
+                "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+                "max": ordered[-1]
+            }
+        return stats
@@ -1,16 +1,49 @@
+import asyncio
+import weakref
 from typing import Dict, Any, List, Optional
-from openai import OpenAI
-from config import OPENAI_API_KEY
-from .base_provider import BaseProvider, ProviderResponse, FunctionCall
+import httpx
+import openai
+from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+from config import OPENAI_API_KEY, MAX_CONNECTIONS, MAX_KEEPALIVE_CONNECTIONS, REQUEST_TIMEOUT
+from .base_provider import BaseProvider, ProviderResponse, FunctionCall, RateLimitError, TokenUsage
 import json
 
 
 class OpenAIProvider(BaseProvider):
+    # One pooled async client per event loop, shared by every provider instance.
+    # httpx connections are bound to the loop that opened them, so a client can't
+    # be reused across loops (e.g. between separate asyncio.run calls).
+    _shared_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncOpenAI]" = \
+        weakref.WeakKeyDictionary()
+
     def __init__(self):
         self.api_key = OPENAI_API_KEY
         if not self.api_key:
             raise ValueError("OpenAI API key not found in environment variables")
-        self.client = OpenAI(api_key=self.api_key)
+
+    @property
+    def client(self) -> AsyncOpenAI:
+        loop = asyncio.get_running_loop()
+        client = self._shared_clients.get(loop)
+        if client is None:
+            http_client = DefaultAsyncHttpxClient(
+                limits=httpx.Limits(
+                    max_connections=MAX_CONNECTIONS,
+                    max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS
+                ),
+                timeout=REQUEST_TIMEOUT
+            )
+            # Retries are left to Model.generate so they go through its rate limiter
+            client = AsyncOpenAI(api_key=self.api_key, http_client=http_client, max_retries=0)
+            self._shared_clients[loop] = client
+        return client
+
+    @classmethod
+    async def close_shared_client(cls) -> None:
+        """Close the pooled client of the running event loop, if one was created."""
+        client = cls._shared_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.close()
 
     def get_provider_name(self) -> str:
         return self.__class__.__name__
@@ -20,14 +53,16 @@ class OpenAIProvider(BaseProvider):
                        prompt: str,
                        temperature: float = 0.7,
                        functions: Optional[List[Dict[str, Any]]] = None,
-                       function_call: Optional[Dict[str, str]] = None) -> ProviderResponse:
+                       function_call: Optional[Dict[str, str]] = None,
+                       n: int = 1) -> ProviderResponse:
         try:
-            response = self.client.chat.completions.create(
+            response = await self.client.chat.completions.create(
                 model=model_name,
                 messages=[{"role": "user", "content": prompt}],
                 temperature=temperature,
                 functions=functions,
-                function_call=function_call
+                function_call=function_call,
+                n=n
             )
 
             # Extract the relevant information from the response
@@ -41,18 +76,62 @@ class OpenAIProvider(BaseProvider):
                 }
                 return self.create_response(
                     function=function_data,
-                    raw_response=response.dict()
+                    raw_response=response.dict(),
+                    usage=self._extract_usage(response)
                 )
             else:
                 # If there's no function call, return the message content
                 return self.create_response(
                     message=message.content,
-                    raw_response=response.dict()
+                    messages=[choice.message.content for choice in response.choices] if n > 1 else None,
+                    raw_response=response.dict(),
+                    usage=self._extract_usage(response)
                 )
 
+        except openai.RateLimitError as e:
+            raise RateLimitError(str(e), retry_after=self._parse_retry_after(e.response)) from e
+
+        except (openai.APIConnectionError, openai.InternalServerError):
+            # Transient failures are retried by Model.generate
+            raise
+
         except Exception as e:
             # If there's an error, return it in the standardized format
             return self.create_response(
                 error=str(e),
                 raw_response=str(e)
             )
+
+    @staticmethod
+    def _extract_usage(response) -> Optional[TokenUsage]:
+        usage = response.usage
+        if usage is None:
+            return None
+        # Older SDK versions don't model prompt_tokens_details and keep it as a plain dict
+        details = getattr(usage, "prompt_tokens_details", None)
+        if isinstance(details, dict):
+            cached_tokens = details.get("cached_tokens")
+        else:
+            cached_tokens = getattr(details, "cached_tokens", None)
+        return {
+            "prompt_tokens": usage.prompt_tokens,
+            "completion_tokens": usage.completion_tokens,
+            "cached_tokens": cached_tokens or 0
+        }
+
+    @staticmethod
+    def _parse_retry_after(response: httpx.Response) -> Optional[float]:
+        headers = response.headers
+        retry_after_ms = headers.get("retry-after-ms")
+        if retry_after_ms:
+            try:
+                return float(retry_after_ms) / 1000
+            except ValueError:
+                pass
+        retry_after = headers.get("retry-after")
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                return None
+        return None
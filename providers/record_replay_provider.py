@@ -0,0 +1,166 @@
+import asyncio
+import json
+import os
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Union
+from config import REPLAY_LATENCY, REPLAY_LATENCY_SCALE
+from utils.jsonl_log_writer import JsonlLogWriter
+from .base_provider import BaseProvider, ProviderResponse, RateLimitError, make_request_key
+
+_writers: Dict[str, JsonlLogWriter] = {}
+
+
+def _get_writer(recording_file: str) -> JsonlLogWriter:
+    # Every model records into the same file, so writers are shared per path
+    if recording_file not in _writers:
+        _writers[recording_file] = JsonlLogWriter(recording_file)
+    return _writers[recording_file]
+
+
+def close_recordings():
+    for writer in _writers.values():
+        writer.close()
+    _writers.clear()
+
+
+class RecordingProvider(BaseProvider):
+    """
+    Wraps another provider and appends every request's outcome to a JSONL recording.
+
+    Each record holds the request key, the response (without the bulky raw_response) and the
+    observed latency. Rate limit errors are recorded too, so a replay reproduces them.
+    """
+
+    def __init__(self, provider: BaseProvider, recording_file: str):
+        self.provider = provider
+        self.recording_file = recording_file
+        self.writer = _get_writer(recording_file)
+
+    def get_provider_name(self) -> str:
+        return self.provider.get_provider_name()
+
+    async def generate(self,
+                       model_name: str,
+                       prompt: str,
+                       temperature: float = 0.7,
+                       functions: Optional[List[Dict[str, Any]]] = None,
+                       function_call: Optional[Dict[str, str]] = None,
+                       n: int = 1) -> ProviderResponse:
+        key = make_request_key(model_name, temperature, prompt, functions, function_call, n)
+        started = time.perf_counter()
+        try:
+            response = await self.provider.generate(
+                model_name=model_name,
+                prompt=prompt,
+                temperature=temperature,
+                functions=functions,
+                function_call=function_call,
+                # Only multi-sample requests pass n, so providers without it keep working
+                **({"n": n} if n != 1 else {})
+            )
+        except RateLimitError as e:
+            self.writer.append({
+                "key": key,
+                "model_name": model_name,
+                "latency": time.perf_counter() - started,
+                "rate_limited": {"message": str(e), "retry_after": e.retry_after}
+            })
+            raise
+
+        self.writer.append({
+            "key": key,
+            "model_name": model_name,
+            "latency": time.perf_counter() - started,
+            "response": {name: value for name, value in response.items() if name != "raw_response"}
+        })
+        return response
+
+
+class ReplayProvider(BaseProvider):
+    """
+    Serves responses from a recording made by RecordingProvider, keyed by request hash.
+
+    Requests recorded several times (e.g. sampled at a non-zero temperature) are replayed in
+    recording order, repeating the last one once exhausted. latency is either None (answer
+    immediately), a fixed number of seconds, or "recorded" to reproduce the latency observed
+    while recording, multiplied by latency_scale.
+    """
+
+    def __init__(self, recording_file: str, latency: Union[None, float, str] = REPLAY_LATENCY,
+                 latency_scale: float = REPLAY_LATENCY_SCALE):
+        if not os.path.exists(recording_file):
+            raise FileNotFoundError(f"Recording file not found at {recording_file}")
+        if isinstance(latency, str) and latency != "recorded":
+            raise ValueError(f"Unknown replay latency: {latency}")
+        self.recording_file = recording_file
+        self.latency = latency
+        self.latency_scale = latency_scale
+        self.records: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        self._positions: Dict[str, int] = defaultdict(int)
+        self.hits = 0
+        self.misses = 0
+
+        with open(recording_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    break
+                self.records[record["key"]].append(record)
+
+    def get_provider_name(self) -> str:
+        return self.__class__.__name__
+
+    async def generate(self,
+                       model_name: str,
+                       prompt: str,
+                       temperature: float = 0.7,
+                       functions: Optional[List[Dict[str, Any]]] = None,
+                       function_call: Optional[Dict[str, str]] = None,
+                       n: int = 1) -> ProviderResponse:
+        key = make_request_key(model_name, temperature, prompt, functions, function_call, n)
+        records = self.records.get(key)
+        if not records:
+            self.misses += 1
+            return self.create_response(error=f"No recorded response for request {key[:12]}")
+
+        position = self._positions[key]
+        record = records[min(position, len(records) - 1)]
+        self._positions[key] = position + 1
+        self.hits += 1
+
+        delay = self._delay(record)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        if "rate_limited" in record:
+            raise RateLimitError(record["rate_limited"]["message"], retry_after=record["rate_limited"]["retry_after"])
+
+        response = record["response"]
+        return self.create_response(
+            function=response.get("function"),
+            message=response.get("message"),
+            messages=response.get("messages"),
+            error=response.get("error"),
+            usage=response.get("usage")
+        )
+
+    def _delay(self, record: Dict[str, Any]) -> float:
+        if self.latency is None:
+            return 0.0
+        if self.latency == "recorded":
+            return record.get("latency", 0.0) * self.latency_scale
+        return float(self.latency)
+
+
+_replay_providers: Dict[str, ReplayProvider] = {}
+
+
+def get_replay_provider(recording_file: str) -> ReplayProvider:
+    """Return the replay provider shared by every model, loading the recording on first use."""
+    if recording_file not in _replay_providers:
+        _replay_providers[recording_file] = ReplayProvider(recording_file)
+    return _replay_providers[recording_file]
@@ -0,0 +1,55 @@
+import contextlib
+import io
+from typing import Any, Awaitable, Dict, List, Optional
+from unittest import mock
+import main
+from optimizer.budget import BudgetController
+from optimizer.model_interface import Model
+from optimizer.prompt_evaluator import Evaluator
+from optimizer.prompt_generator import PromptGenerator
+from providers.mock_provider import MockProvider
+from utils.performance_logger import PerformanceLogger
+
+# Settings of main patched for every optimization run: a few iterations, none of which reaches the threshold
+RUN_SETTINGS = {"MAX_ITERATIONS": 3, "ACCURACY_THRESHOLD": 1.1}
+
+
+async def run_quietly(awaitable: Awaitable, output: Optional[io.StringIO] = None, **settings: Any) -> Any:
+    """Await awaitable with the given settings of main patched and its printed output captured."""
+    with contextlib.ExitStack() as stack:
+        for name, value in settings.items():
+            stack.enter_context(mock.patch.object(main, name, value))
+        stack.enter_context(contextlib.redirect_stdout(output if output is not None else io.StringIO()))
+        return await awaitable
+
+
+class OptimizationRun:
+    """
+    The components of an end-to-end optimization run, all backed by one MockProvider.
+
+    The judge, generator and target models are named "mock-judge", "mock-generator" and
+    "mock-target", so the provider's latencies can be told apart by model.
+    """
+
+    def __init__(self, log_dir: str, dataset: List[Dict[str, Any]], provider: Optional[MockProvider] = None,
+                 **evaluator_options: Any):
+        self.provider = provider or MockProvider(latency_mean=0, seed=1, accuracy=0.5, variables=["text"])
+        self.logger = PerformanceLogger(log_dir, "Summarize: {text}", plot_mode="off")
+        self.evaluator = Evaluator(self.logger, dataset=dataset,
+                                   evaluation_model=Model("mock-judge", provider=self.provider, rate_limiter=None),
+                                   **evaluator_options)
+        self.generator = PromptGenerator(Model("mock-generator", provider=self.provider, rate_limiter=None))
+        self.target_model = Model("mock-target", provider=self.provider, rate_limiter=None)
+
+    async def optimize(self, settings: Optional[Dict[str, Any]] = None, output: Optional[io.StringIO] = None,
+                       **options: Any) -> str:
+        """
+        Run main.optimize_prompt and return the best prompt.
+
+        settings override RUN_SETTINGS, and options are passed to optimize_prompt; the budget is
+        unlimited unless one is given.
+        """
+        options.setdefault("budget", BudgetController(max_seconds=None, max_tokens=None, max_cost=None))
+        return await run_quietly(main.optimize_prompt(generator=self.generator, evaluator=self.evaluator,
+                                                      target_model=self.target_model, **options),
+                                 output, **{**RUN_SETTINGS, **(settings or {})})
@@ -0,0 +1,24 @@
+import unittest
+from benchmarks.benchmark_optimizer import parse_args, run_benchmarks
+
+
+class TestBenchmark(unittest.IsolatedAsyncioTestCase):
+    async def test_run_benchmarks(self):
+        args = parse_args(["--cases", "3", "--candidates", "2", "--iterations", "2", "--latency", "0"])
+
+        report = await run_benchmarks(args)
+
+        scenarios = {scenario["scenario"] for scenario in report["scenarios"]}
+        self.assertEqual(scenarios, {"evaluate_prompts", "optimize_prompt", "performance_logger"})
+        for scenario in report["scenarios"]:
+            self.assertIn("wall_time", scenario)
+            self.assertIn("calls_per_second", scenario)
+            self.assertIn("peak_rss_mb", scenario)
+        evaluation = report["scenarios"][0]
+        self.assertEqual(evaluation["scenario"], "evaluate_prompts")
+        self.assertIn("generation", evaluation["pipeline"])
+        self.assertIn("mock-judge:evaluate_semantic_equivalence", evaluation["provider_latency"])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,113 @@
+import asyncio
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+import main
+from optimizer.budget import BudgetController, BUDGET_OK, BUDGET_DEGRADED, BUDGET_EXHAUSTED
+from optimizer.usage_tracker import UsageTracker
+from tests.helpers import OptimizationRun
+
+USAGE = {"prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0, "cost": None}
+
+
+class TestBudgetController(unittest.IsolatedAsyncioTestCase):
+    def test_unlimited(self):
+        budget = BudgetController(max_seconds=None, max_tokens=None, max_cost=None)
+
+        self.assertEqual(budget.check({**USAGE, "prompt_tokens": 10 ** 9}), BUDGET_OK)
+
+    def test_token_budget(self):
+        budget = BudgetController(max_seconds=None, max_tokens=1000, max_cost=None, degrade_threshold=0.8)
+
+        self.assertEqual(budget.check({**USAGE, "prompt_tokens": 500}), BUDGET_OK)
+        self.assertEqual(budget.check({**USAGE, "prompt_tokens": 700, "completion_tokens": 150}), BUDGET_DEGRADED)
+        self.assertEqual(budget.check({**USAGE, "prompt_tokens": 1000}), BUDGET_EXHAUSTED)
+        self.assertEqual(budget.check({**USAGE, "prompt_tokens": 500, "cancelled_tokens": 500}), BUDGET_EXHAUSTED)
+        self.assertIn("tokens", budget.reason)
+
+    def test_cost_budget(self):
+        budget = BudgetController(max_seconds=None, max_tokens=None, max_cost=1.0)
+
+        self.assertEqual(budget.check(USAGE), BUDGET_OK)
+        self.assertEqual(budget.check({**USAGE, "cost": 1.5}), BUDGET_EXHAUSTED)
+
+    def test_time_budget(self):
+        budget = BudgetController(max_seconds=10, max_tokens=None, max_cost=None)
+
+        with mock.patch("optimizer.budget.time.monotonic", return_value=budget.started + 9):
+            self.assertEqual(budget.check(USAGE), BUDGET_DEGRADED)
+        with mock.patch("optimizer.budget.time.monotonic", return_value=budget.started + 10):
+            self.assertEqual(budget.check(USAGE), BUDGET_EXHAUSTED)
+
+    async def test_run_cancels_calls_once_exhausted(self):
+        budget = BudgetController(max_seconds=None, max_tokens=100, max_cost=None)
+        usage = UsageTracker()
+        budget.track(usage)
+
+        async def spending_call():
+            usage.add("gpt-4o-mini", {"prompt_tokens": 100})
+            return "Spent"
+
+        slow_call = asyncio.create_task(budget.run(asyncio.sleep(10)))
+        await asyncio.sleep(0)
+
+        self.assertEqual(await budget.run(spending_call()), (True, "Spent"))
+        self.assertEqual(await slow_call, (False, None))
+        self.assertEqual(budget.cancelled_calls, 1)
+        self.assertEqual(await budget.run(spending_call()), (False, None))
+
+
+class TestBudgetedOptimization(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.log_dir = tempfile.mkdtemp()
+        dataset = [{"variables": {"text": f"Text {i}"}, "expected_output": "Expected"} for i in range(10)]
+        self.optimization = OptimizationRun(self.log_dir, dataset)
+        self.logger = self.optimization.logger
+        self.evaluator = self.optimization.evaluator
+
+    def tearDown(self):
+        shutil.rmtree(self.log_dir)
+
+    async def optimize(self, budget: BudgetController) -> str:
+        return await self.optimization.optimize({"MAX_ITERATIONS": 5, "DEGRADED_MAX_CASES": 3}, budget=budget)
+
+    async def test_stops_at_budget(self):
+        best_prompt = await self.optimize(BudgetController(max_seconds=None, max_tokens=1, max_cost=None))
+
+        # The first iteration stops at its first model call, and the run with it
+        logs = self.logger.log_data["optimization_logs"]
+        self.assertEqual(len(logs), 1)
+        self.assertTrue(logs[0]["evaluations"][0]["budget_exhausted"])
+        self.assertLess(logs[0]["evaluations"][0]["total_cases"], 10)
+        self.assertEqual(best_prompt, main.ORIGINAL_PROMPT["text"])
+
+    async def test_degrades_near_budget(self):
+        budget = BudgetController(max_seconds=None, max_tokens=10 ** 6, max_cost=None, degrade_threshold=0)
+
+        await self.optimize(budget)
+
+        logs = self.logger.log_data["optimization_logs"]
+        self.assertEqual(len(logs), 5)
+        for evaluation in logs[1]["evaluations"]:
+            self.assertEqual(evaluation["total_cases"], 3)
+            self.assertEqual(evaluation["summary"], "")
+        # PARALLEL_VARIATIONS is halved
+        self.assertEqual(len(logs[1]["prompts"]), 1)
+
+    async def test_degraded_candidates_are_confirmed_on_the_whole_dataset(self):
+        budget = BudgetController(max_seconds=None, max_tokens=10 ** 6, max_cost=None, degrade_threshold=0)
+        self.evaluator.confirm_prompts = mock.AsyncMock(wraps=self.evaluator.confirm_prompts)
+
+        best_prompt = await self.optimize(budget)
+
+        calls = self.evaluator.confirm_prompts.call_args_list
+        self.assertTrue(calls)
+        self.assertTrue(all(call.args[2] == list(range(10)) for call in calls))
+        # Only a confirmed candidate can replace the original prompt
+        confirmed = [prompt for call in calls for prompt in call.args[0]]
+        self.assertIn(best_prompt, confirmed + [main.ORIGINAL_PROMPT["text"]])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import json
+import unittest
+from optimizer.case_result import CaseResult, case_id
+
+CASE = {"variables": {"text": "A long document"}, "expected_output": "Expected"}
+
+
+class TestCaseResult(unittest.TestCase):
+    def setUp(self):
+        self.result = CaseResult("Summarize: {text}", CASE, 3, case_id(CASE), "Output", False, "Too long")
+
+    def test_reads_like_a_result_dict(self):
+        self.assertEqual(dict(self.result), {
+            "prompt": "Summarize: A long document",
+            "model_output": "Output",
+            "expected_output": "Expected",
+            "is_correct": False,
+            "explanation_success": "",
+            "explanation_failure": "Too long"
+        })
+        self.assertIsNone(self.result.get("sample_score"))
+        self.assertFalse(hasattr(self.result, "__dict__"))
+
+    def test_compact_record_round_trip(self):
+        record = json.loads(json.dumps(self.result.to_json()))
+
+        self.assertEqual(record, {"case": 3, "case_id": case_id(CASE), "model_output": "Output",
+                                  "is_correct": False, "explanation": "Too long"})
+        restored = CaseResult.from_record(record, "Summarize: {text}", CASE, 3, case_id(CASE))
+        self.assertEqual(restored, self.result)
+
+    def test_samples(self):
+        result = CaseResult("Summarize: {text}", CASE, 0, case_id(CASE), "A", True, "Same",
+                            model_outputs=["A", "B", "C"], sample_correct=[True, True, False])
+
+        self.assertEqual(result["sample_correct"], [True, True, False])
+        self.assertAlmostEqual(result["sample_score"], 2 / 3)
+        restored = CaseResult.from_record(result.to_json(), "Summarize: {text}", CASE, 0, case_id(CASE))
+        self.assertEqual(restored["model_outputs"], ["A", "B", "C"])
+        self.assertEqual(restored["model_output"], "A")
+
+    def test_case_id_depends_on_content(self):
+        self.assertEqual(case_id(CASE), case_id(dict(CASE)))
+        self.assertNotEqual(case_id(CASE), case_id({**CASE, "expected_output": "Other"}))
+
+
+if __name__ == '__main__':
+    unittest.main()
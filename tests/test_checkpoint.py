@@ -0,0 +1,117 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from optimizer.budget import BudgetController
+from providers.mock_provider import MockProvider
+from tests.helpers import OptimizationRun
+from utils.checkpoint import Checkpoint
+
+DATASET = [{"variables": {"text": f"Text {i}"}, "expected_output": "Expected"} for i in range(4)]
+RESULT = {"prompt": "Summarize: Text 0", "model_output": "Output", "expected_output": "Expected",
+          "is_correct": True, "explanation_success": "Same", "explanation_failure": ""}
+
+
+class TestCheckpoint(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.test_dir, "checkpoint.json")
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def make_run(self, provider: MockProvider, checkpoint: Checkpoint, log_dir: str = "run") -> OptimizationRun:
+        # Each run logs to its own directory, as runs started within the same second share a log name
+        return OptimizationRun(os.path.join(self.test_dir, log_dir), DATASET, provider=provider, checkpoint=checkpoint)
+
+    def test_save_and_load(self):
+        checkpoint = Checkpoint(self.path)
+        checkpoint.save({"iteration": 2, "current_prompts": ["Prompt"]})
+        checkpoint.record_output(2, "Prompt", 0, "Output")
+        checkpoint.record_result(2, "Prompt", 1, RESULT)
+        checkpoint.close()
+
+        restored = Checkpoint(self.path)
+        state = restored.load()
+
+        self.assertEqual(state["iteration"], 2)
+        self.assertEqual(restored.get_output(2, "Prompt", 0), "Output")
+        self.assertEqual(restored.get_result(2, "Prompt", 1), RESULT)
+        self.assertIsNone(restored.get_result(1, "Prompt", 1))
+
+    def test_new_iteration_drops_journal(self):
+        checkpoint = Checkpoint(self.path)
+        checkpoint.record_result(0, "Prompt", 0, RESULT)
+
+        checkpoint.save({"iteration": 1}, new_iteration=True)
+
+        self.assertFalse(os.path.exists(checkpoint.journal_path))
+        self.assertIsNone(checkpoint.get_result(0, "Prompt", 0))
+
+    def test_missing_checkpoint(self):
+        self.assertIsNone(Checkpoint(self.path).load())
+
+    async def test_evaluator_skips_journaled_cases(self):
+        checkpoint = Checkpoint(self.path)
+        checkpoint.record_result(0, "Summarize: {text}", 0, RESULT)
+        checkpoint.record_output(0, "Summarize: {text}", 1, "Journaled output")
+        provider = MockProvider(latency_mean=0, seed=1, variables=["text"])
+        optimization = self.make_run(provider, checkpoint)
+
+        evaluations = await optimization.evaluator.evaluate_prompts(["Summarize: {text}"], optimization.target_model, 0,
+                                                                    summarize=False)
+        checkpoint.close()
+
+        results = evaluations[0]["results"]
+        self.assertEqual(results[0], RESULT)
+        self.assertEqual(results[1]["model_output"], "Journaled output")
+        # Cases 2 and 3 are generated, cases 1 to 3 are judged
+        self.assertEqual(provider.calls, 5)
+        self.assertEqual(len(checkpoint.results), 4)
+
+    async def test_resume_interrupted_run(self):
+        provider = MockProvider(latency_mean=0, seed=1, variables=["text"])
+        optimization = self.make_run(provider, Checkpoint(self.path))
+        generate_suggestions = optimization.generator.generate_suggestions
+        calls = 0
+
+        async def interrupted(*args, **kwargs):
+            nonlocal calls
+            calls += 1
+            if calls == 2:
+                raise KeyboardInterrupt
+            return await generate_suggestions(*args, **kwargs)
+
+        optimization.generator.generate_suggestions = interrupted
+        budget = BudgetController(max_seconds=None, max_tokens=None, max_cost=None)
+        with self.assertRaises(KeyboardInterrupt):
+            await optimization.optimize({"PARALLEL_VARIATIONS": 2}, budget=budget,
+                                        checkpoint=optimization.evaluator.checkpoint)
+        optimization.evaluator.checkpoint.close()
+        self.assertEqual(len(optimization.logger.log_data["optimization_logs"]), 2)
+        with open(self.path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+        # The checkpoint points at the log rather than copying the history
+        self.assertNotIn("optimization_logs", state)
+        self.assertEqual(state["log_file"], optimization.logger.get_log_file_path())
+        self.assertEqual(state["logged_iterations"], 2)
+
+        resumed_provider = MockProvider(latency_mean=0, seed=2, variables=["text"])
+        optimization = self.make_run(resumed_provider, Checkpoint(self.path), log_dir="resumed")
+        await optimization.optimize({"PARALLEL_VARIATIONS": 2}, budget=budget,
+                                    checkpoint=optimization.evaluator.checkpoint, resume=True)
+
+        logs = optimization.logger.log_data["optimization_logs"]
+        self.assertEqual([log["iteration"] for log in logs], [0, 1, 2])
+        # Iteration 1 was fully evaluated before the interruption: only its suggestions and iteration 2 are new
+        self.assertEqual(resumed_provider.latencies.keys(), {
+            "mock-generator:analyze_and_suggest_prompts", "mock-target:message",
+            "mock-judge:evaluate_semantic_equivalence", "mock-judge:message"
+        })
+        self.assertEqual(len(resumed_provider.latencies["mock-target:message"]), 2 * len(DATASET))
+        self.assertFalse(os.path.exists(self.path))
+
+
+if __name__ == '__main__':
+    unittest.main()
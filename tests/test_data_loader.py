@@ -2,7 +2,10 @@ import unittest
 import json
 import os
 import tempfile
-from utils.data_loader import DataLoader, InvalidDataPointError
+from unittest import mock
+from optimizer.prompt_evaluator import Evaluator
+from utils.data_loader import DataLoader, InvalidDataPointError, LazyDataset
+from utils.performance_logger import PerformanceLogger
 
 
 class TestDataLoader(unittest.TestCase):
@@ -90,5 +93,107 @@ class TestDataLoader(unittest.TestCase):
         self.assertEqual(loaded_data, self.test_data)
 
 
+class TestLazyDataLoader(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.temp_dir.name, "cache")
+        self.current_prompt = {"text": "Summarize: {text}", "variables": ["text"]}
+        # Strings with brackets, braces, escaped quotes and non-ASCII text must not confuse the scanner
+        self.test_data = [
+            {"variables": {"text": f"Text {i} with \"quotes\", [brackets] and {{braces}} é"},
+             "expected_output": f"Expected {i}"}
+            for i in range(20)
+        ]
+        self.datasets = []
+
+    def tearDown(self):
+        for dataset in self.datasets:
+            dataset.close()
+        self.temp_dir.cleanup()
+
+    def write(self, file_name, data, jsonl=False):
+        with open(os.path.join(self.temp_dir.name, file_name), 'w', encoding='utf-8') as f:
+            if jsonl:
+                f.write("\n".join(json.dumps(data_point, ensure_ascii=False) for data_point in data) + "\n")
+            else:
+                json.dump(data, f, indent=2, ensure_ascii=False)
+        return DataLoader(self.temp_dir.name, file_name, self.current_prompt, cache_dir=self.cache_dir)
+
+    def open(self, loader, use_mmap=False):
+        dataset = loader.open_data(use_mmap=use_mmap)
+        self.datasets.append(dataset)
+        return dataset
+
+    def test_json_and_jsonl_give_the_same_cases(self):
+        for file_name, jsonl in [("dataset.json", False), ("dataset.jsonl", True)]:
+            loader = self.write(file_name, self.test_data, jsonl)
+            for use_mmap in (False, True):
+                dataset = self.open(loader, use_mmap)
+                self.assertIsInstance(dataset, LazyDataset)
+                self.assertEqual(len(dataset), 20)
+                self.assertEqual(dataset[13], self.test_data[13])
+                self.assertEqual(dataset[-1], self.test_data[-1])
+                self.assertEqual(list(dataset), self.test_data)
+            self.assertEqual(loader.load_data(), self.test_data)
+            self.assertEqual(list(loader.iter_data()), self.test_data)
+
+    def test_index_is_cached_until_the_file_changes(self):
+        loader = self.write("dataset.jsonl", self.test_data, jsonl=True)
+        self.open(loader)
+
+        with mock.patch.object(DataLoader, "_scan", side_effect=AssertionError("parsed again")):
+            self.assertEqual(self.open(loader)[5], self.test_data[5])
+
+        loader = self.write("dataset.jsonl", self.test_data[:3], jsonl=True)
+        self.assertEqual(len(self.open(loader)), 3)
+
+    def test_evaluator_closes_the_dataset(self):
+        dataset = self.open(self.write("dataset.json", self.test_data), use_mmap=True)
+        evaluator = Evaluator(mock.Mock(spec=PerformanceLogger), dataset=dataset)
+
+        evaluator.close()
+
+        self.assertTrue(dataset._file.closed)
+        self.assertIsNone(dataset._buffer)
+
+    def test_repeated_cases_are_the_same_object(self):
+        dataset = self.open(self.write("dataset.json", self.test_data), use_mmap=True)
+
+        self.assertIs(dataset[4], dataset[4])
+
+    def test_invalid_data_point(self):
+        loader = self.write("dataset.jsonl", self.test_data + [{"variables": {}, "expected_output": "x"}], jsonl=True)
+
+        with self.assertRaises(InvalidDataPointError) as context:
+            loader.open_data()
+        self.assertIn("index 20", str(context.exception))
+        self.assertFalse(os.path.exists(self.cache_dir) and os.listdir(self.cache_dir))
+
+    def test_malformed_arrays_are_rejected_like_json_load(self):
+        case = json.dumps(self.test_data[0], ensure_ascii=False)
+        for content, error in [(f'[{case}, 42, null {case}]', InvalidDataPointError),
+                               (f'[{case}, "text"]', InvalidDataPointError),
+                               (f'[{case}, [{case}]]', InvalidDataPointError),
+                               (f'[{case} {case}]', json.JSONDecodeError),
+                               (f'[{case},, {case}]', json.JSONDecodeError),
+                               (f'[{case},]', json.JSONDecodeError),
+                               (f'[, {case}]', json.JSONDecodeError),
+                               (f'[{case}] {case}', json.JSONDecodeError),
+                               (f'x [{case}]', json.JSONDecodeError)]:
+            with open(os.path.join(self.temp_dir.name, "dataset.json"), 'w', encoding='utf-8') as f:
+                f.write(content)
+            loader = DataLoader(self.temp_dir.name, "dataset.json", self.current_prompt, cache_dir=self.cache_dir)
+            with self.assertRaises(error, msg=content):
+                loader.open_data()
+
+        with open(os.path.join(self.temp_dir.name, "dataset.json"), 'w', encoding='utf-8') as f:
+            f.write(f' [ {case} ,\n{case}\n]\n')
+        self.assertEqual(len(self.open(loader)), 2)
+
+    def test_unknown_access(self):
+        with self.assertRaises(ValueError):
+            self.write("dataset.json", self.test_data).get_dataset("remote")
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,163 @@
+import asyncio
+import unittest
+from unittest.mock import Mock
+from optimizer.early_stopping import EarlyStopping, THRESHOLD_REACHED, ITERATION_SETTLED, CANNOT_WIN
+from optimizer.model_interface import Model
+from optimizer.prompt_evaluator import Evaluator
+from optimizer.rate_limiter import RateLimiter
+from optimizer.usage_tracker import UsageTracker, track_usage
+from providers.mock_provider import MockProvider
+from utils.performance_logger import PerformanceLogger
+
+DATASET = [{"variables": {"text": f"Text {i}"}, "expected_output": "Expected"} for i in range(20)]
+
+
+class TestEarlyStopping(unittest.IsolatedAsyncioTestCase):
+    def test_threshold_reached_settles_prompts_that_cannot_beat_it(self):
+        early_stopping = EarlyStopping(prompts=3, total_cases=4, threshold=0.75)
+        early_stopping.record(2, False)
+
+        for _ in range(3):
+            early_stopping.record(0, True)
+
+        self.assertEqual(early_stopping.get_stop_reason(0), THRESHOLD_REACHED)
+        # At most 3/4, prompt 0's score at worst
+        self.assertEqual(early_stopping.get_stop_reason(2), ITERATION_SETTLED)
+        # Nothing judged yet, so it could still score 4/4
+        self.assertFalse(early_stopping.is_stopped(1))
+
+    def test_partial_score_never_beats_the_prompt_reaching_the_threshold(self):
+        early_stopping = EarlyStopping(prompts=2, total_cases=4, threshold=0.75)
+        early_stopping.record(1, True)
+        early_stopping.record(0, False)
+        for _ in range(3):
+            early_stopping.record(0, True)
+
+        # Prompt 0 ends at 3/4; prompt 1, at 1/1 so far, keeps going rather than win on one case
+        self.assertEqual(early_stopping.get_stop_reason(0), THRESHOLD_REACHED)
+        self.assertFalse(early_stopping.is_stopped(1))
+
+        early_stopping.record(1, False)
+        # At most 3/4 now, and 1/2 observed
+        self.assertEqual(early_stopping.get_stop_reason(1), ITERATION_SETTLED)
+
+    def test_prompt_that_cannot_win(self):
+        early_stopping = EarlyStopping(prompts=2, total_cases=10, threshold=0.95, best_score=0.8)
+
+        early_stopping.record(0, False)
+        self.assertFalse(early_stopping.is_stopped(0))
+
+        early_stopping.record(0, False)
+        # At most 8/10, which doesn't beat 0.8
+        self.assertEqual(early_stopping.get_stop_reason(0), CANNOT_WIN)
+        self.assertFalse(early_stopping.is_stopped(1))
+
+    def test_lower_bound_of_another_prompt_counts_as_best(self):
+        early_stopping = EarlyStopping(prompts=2, total_cases=4, threshold=0.95)
+
+        early_stopping.record(0, True)
+        early_stopping.record(0, True)
+        early_stopping.record(1, False)
+        early_stopping.record(1, False)
+
+        # Prompt 1 scores at most 2/4, prompt 0 at least 2/4
+        self.assertEqual(early_stopping.get_stop_reason(1), CANNOT_WIN)
+        self.assertFalse(early_stopping.is_stopped(0))
+
+    async def test_run_cancels_calls_of_stopped_prompts(self):
+        early_stopping = EarlyStopping(prompts=2, total_cases=2, threshold=0.5)
+        started = asyncio.Event()
+
+        async def slow_call():
+            started.set()
+            await asyncio.sleep(10)
+
+        pending = asyncio.create_task(early_stopping.run([1], slow_call()))
+        await started.wait()
+        early_stopping.record(0, True)
+        early_stopping.record(0, True)
+
+        self.assertEqual(await pending, (False, None))
+        self.assertEqual(early_stopping.get_stats()["cancelled_calls"], 1)
+        self.assertEqual(await early_stopping.run([1], slow_call()), (False, None))
+
+    async def test_cancelled_generate_releases_rate_limiter(self):
+        limiter = RateLimiter(6000, 1000000)
+        model = Model("mock-target", provider=MockProvider(latency_mean=10, latency_distribution="constant"),
+                      rate_limiter=limiter)
+
+        task = asyncio.create_task(model.generate("Prompt"))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+
+        self.assertEqual(limiter.in_flight, 0)
+
+    async def test_cancelled_generate_counts_its_estimated_tokens(self):
+        model = Model("mock-target", provider=MockProvider(latency_mean=10, latency_distribution="constant"),
+                      rate_limiter=None)
+        tracker = UsageTracker()
+
+        with track_usage(tracker):
+            task = asyncio.create_task(model.generate("Prompt"))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+
+        summary = tracker.get_summary()
+        self.assertEqual(summary["calls"], 0)
+        self.assertEqual(summary["cancelled_calls"], 1)
+        self.assertEqual(summary["cancelled_tokens"], RateLimiter.estimate_tokens("Prompt"))
+
+    async def evaluate(self, accuracy: float, best_score=None):
+        provider = MockProvider(latency_mean=0.001, seed=1, accuracy=accuracy, variables=["text"])
+        evaluator = Evaluator(Mock(spec=PerformanceLogger), dataset=DATASET, accuracy_threshold=0.5,
+                              early_stopping=True, generation_workers=2, judge_workers=2, queue_size=2,
+                              evaluation_model=Model("mock-judge", provider=provider, rate_limiter=None))
+        target_model = Model("mock-target", provider=provider, rate_limiter=None)
+        evaluations = await evaluator.evaluate_prompts(["Summarize: {text}", "Shorten: {text}"], target_model, 0,
+                                                       summarize=False, best_score=best_score)
+        return evaluator, provider, evaluations
+
+    async def test_iteration_stops_once_threshold_is_certain(self):
+        evaluator, provider, evaluations = await self.evaluate(accuracy=1.0)
+
+        self.assertEqual(evaluations[0]['stop_reason'], THRESHOLD_REACHED)
+        self.assertGreaterEqual(evaluations[0]['score'], 0.5)
+        for evaluation in evaluations:
+            self.assertTrue(evaluation['stopped_early'])
+            self.assertEqual(evaluation['total_cases'] + evaluation['skipped_cases'], len(DATASET))
+            self.assertEqual(len(evaluation['results']), evaluation['total_cases'])
+        stats = evaluator.get_early_stopping_stats()
+        self.assertEqual(stats['stopped_prompts'], 2)
+        self.assertGreater(stats['skipped_cases'], 0)
+        self.assertLess(provider.calls, 4 * len(DATASET))
+        # The stats go to the iteration's log record
+        self.assertEqual(evaluator.logger.log_iteration.call_args.kwargs["early_stopping"], stats)
+
+    async def test_losing_prompts_stop(self):
+        evaluator, provider, evaluations = await self.evaluate(accuracy=0.0, best_score=0.4)
+
+        for evaluation in evaluations:
+            self.assertEqual(evaluation['stop_reason'], CANNOT_WIN)
+            self.assertLessEqual(evaluation['score'], 0.4)
+            self.assertLess(evaluation['total_cases'], len(DATASET))
+
+    async def test_disabled(self):
+        provider = MockProvider(latency_mean=0, seed=1, accuracy=1.0, variables=["text"])
+        evaluator = Evaluator(Mock(spec=PerformanceLogger), dataset=DATASET, accuracy_threshold=0.5,
+                              early_stopping=False,
+                              evaluation_model=Model("mock-judge", provider=provider, rate_limiter=None))
+
+        evaluations = await evaluator.evaluate_prompts(["Summarize: {text}"],
+                                                       Model("mock-target", provider=provider, rate_limiter=None), 0)
+
+        self.assertEqual(evaluations[0]['total_cases'], len(DATASET))
+        self.assertNotIn('stopped_early', evaluations[0])
+        self.assertIsNone(evaluator.get_early_stopping_stats())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+from unittest.mock import AsyncMock, Mock
+from optimizer.local_scorer import LocalScorer
+from optimizer.prompt_evaluator import Evaluator
+from utils.performance_logger import PerformanceLogger
+
+
+class TestLocalScorer(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.scorer = LocalScorer(accept_threshold=0.9, reject_threshold=0.1)
+
+    def test_normalize(self):
+        self.assertEqual(LocalScorer.normalize("  A Fox,  leaps!\n"), "a fox leaps")
+
+    def test_token_f1(self):
+        f1 = LocalScorer.token_f1(["a fox leaps over a dog", "", "cat"],
+                                  ["A fox leaps over a dog.", "anything", "a fox"])
+
+        self.assertAlmostEqual(f1[0], 1.0)
+        self.assertAlmostEqual(f1[1], 0.0)
+        self.assertAlmostEqual(f1[2], 0.0)
+
+    def test_token_f1_partial_overlap(self):
+        f1 = LocalScorer.token_f1(["the fox"], ["the fox jumps high"])
+
+        # precision 1, recall 0.5
+        self.assertAlmostEqual(f1[0], 2 / 3)
+
+    def test_score_resolves_confident_pairs_only(self):
+        results = self.scorer.score([
+            ("A fox leaps over a dog!", "a fox leaps over a dog"),
+            ("Completely unrelated words", "The Eiffel Tower is in Paris"),
+            ("The tower in Paris is famous", "The Eiffel Tower is a famous Parisian landmark")
+        ])
+
+        self.assertTrue(results[0]['is_correct'])
+        self.assertFalse(results[1]['is_correct'])
+        self.assertIsNone(results[2])
+        self.assertEqual(self.scorer.get_stats(), {
+            "resolved_correct": 1,
+            "resolved_incorrect": 1,
+            "forwarded": 1,
+            "judge_calls_saved": 2
+        })
+
+    def test_invalid_thresholds(self):
+        with self.assertRaises(ValueError):
+            LocalScorer(accept_threshold=0.2, reject_threshold=0.5)
+
+    async def test_evaluator_forwards_only_ambiguous_pairs(self):
+        evaluator = Evaluator(logger=Mock(spec=PerformanceLogger), local_scoring=True)
+        evaluator.evaluate_outputs = AsyncMock(return_value=[{
+            'is_correct': True,
+            'explanation_success': 'Judged',
+            'explanation_failure': ''
+        }])
+
+        results = await evaluator.score_outputs([
+            ("a fox leaps over a dog", "A fox leaps over a dog."),
+            ("The tower in Paris is famous", "The Eiffel Tower is a famous Parisian landmark")
+        ])
+
+        evaluator.evaluate_outputs.assert_called_once_with(
+            [("The tower in Paris is famous", "The Eiffel Tower is a famous Parisian landmark")]
+        )
+        self.assertEqual(results[1]['explanation_success'], 'Judged')
+        self.assertEqual(evaluator.get_local_scoring_stats()['judge_calls_saved'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import json
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+from optimizer.minibatch import MinibatchSampler, allocate, case_strata
+from tests.helpers import OptimizationRun
+from utils.data_loader import DataLoader
+
+DATASET = [{"variables": {"text": "x" * (1 + i % 10)}, "expected_output": "Expected",
+            "metadata": {"category": "short" if i % 4 else "long"}} for i in range(100)]
+
+
+class TestMinibatchSampler(unittest.TestCase):
+    def test_allocate(self):
+        self.assertEqual(allocate({"a": 50, "b": 30, "c": 20}, 10), {"a": 5, "b": 3, "c": 2})
+        self.assertEqual(allocate({"a": 1, "b": 1}, 1), {"a": 1, "b": 0})
+        self.assertEqual(allocate({"a": 2, "b": 1}, 10), {"a": 2, "b": 1})
+
+    def test_strata(self):
+        self.assertEqual(len(set(case_strata(DATASET, "length", 4))), 4)
+        self.assertEqual(case_strata(DATASET, "category")[:4], ["long", "short", "short", "short"])
+        self.assertEqual(set(case_strata(DATASET, None)), {""})
+
+    def test_length_strata_of_a_lazy_dataset_read_no_case(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with open(f"{temp_dir}/dataset.jsonl", "w") as f:
+                f.write("".join(json.dumps(case) + "\n" for case in DATASET))
+            loader = DataLoader(temp_dir, "dataset.jsonl", {"text": "{text}", "variables": ["text"]},
+                                cache_dir=f"{temp_dir}/cache")
+            dataset = loader.open_data()
+            dataset._load_case = mock.Mock(side_effect=AssertionError("case read"))
+            try:
+                labels = case_strata(dataset, "length", 4)
+            finally:
+                dataset.close()
+
+        self.assertEqual(len(labels), len(DATASET))
+        self.assertEqual(len(set(labels)), 4)
+
+    def test_lazy_and_memory_datasets_are_split_alike(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            with open(f"{temp_dir}/dataset.jsonl", "w") as f:
+                f.write("".join(json.dumps(case) + "\n" for case in DATASET))
+            loader = DataLoader(temp_dir, "dataset.jsonl", {"text": "{text}", "variables": ["text"]},
+                                cache_dir=f"{temp_dir}/cache")
+            loader.open_data().close()
+            dataset = loader.open_data()
+            try:
+                lazy = MinibatchSampler(dataset, size=10, holdout_fraction=0.2, strata="length", seed=5)
+            finally:
+                dataset.close()
+        memory = MinibatchSampler(DATASET, size=10, holdout_fraction=0.2, strata="length", seed=5)
+
+        self.assertEqual(lazy.holdout, memory.holdout)
+        self.assertEqual(lazy.sample(0), memory.sample(0))
+
+    def test_holdout_is_stratified_and_never_sampled(self):
+        sampler = MinibatchSampler(DATASET, size=20, holdout_fraction=0.2, strata="category", seed=3)
+
+        self.assertEqual(len(sampler.holdout), 20)
+        self.assertEqual(sum(1 for index in sampler.holdout if DATASET[index]["metadata"]["category"] == "long"), 5)
+        for iteration in range(5):
+            minibatch = sampler.sample(iteration)
+            self.assertEqual(len(minibatch), 20)
+            self.assertFalse(set(minibatch) & set(sampler.holdout))
+            self.assertEqual(sum(1 for index in minibatch if DATASET[index]["metadata"]["category"] == "long"), 5)
+
+    def test_sampling_is_reproducible(self):
+        first = MinibatchSampler(DATASET, size=10, seed=7)
+        second = MinibatchSampler(DATASET, size=10, seed=7)
+
+        self.assertEqual(first.holdout, second.holdout)
+        self.assertEqual(first.sample(2), second.sample(2))
+        self.assertNotEqual(first.sample(1), first.sample(2))
+
+    def test_minibatch_larger_than_training_split(self):
+        sampler = MinibatchSampler(DATASET[:10], size=50, holdout_fraction=0.2)
+
+        self.assertEqual(len(sampler.sample(0)), 8)
+
+
+class TestMinibatchOptimization(unittest.IsolatedAsyncioTestCase):
+    async def test_best_prompt_is_confirmed_on_holdout(self):
+        log_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, log_dir)
+        optimization = OptimizationRun(log_dir, DATASET, deduplication=False)
+        evaluator = optimization.evaluator
+        evaluator.confirm_prompts = mock.AsyncMock(wraps=evaluator.confirm_prompts)
+        sampler = MinibatchSampler(DATASET, size=10, holdout_fraction=0.2)
+
+        best_prompt = await optimization.optimize(sampler=sampler)
+
+        for log in optimization.logger.log_data["optimization_logs"]:
+            self.assertTrue(all(evaluation["total_cases"] == 10 for evaluation in log["evaluations"]))
+        confirmed = [call.args[0] for call in evaluator.confirm_prompts.call_args_list]
+        self.assertTrue(confirmed)
+        self.assertIn(best_prompt, [prompt for prompts in confirmed for prompt in prompts])
+        self.assertTrue(all(call.args[2] == sampler.holdout for call in evaluator.confirm_prompts.call_args_list))
+
+
+if __name__ == '__main__':
+    unittest.main()
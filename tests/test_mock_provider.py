@@ -0,0 +1,80 @@
+import unittest
+from providers.base_provider import RateLimitError
+from providers.mock_provider import MockProvider
+from optimizer.model_interface import Model
+from optimizer.prompt_evaluator import Evaluator
+from optimizer.prompt_generator import PromptGenerator
+from utils.performance_logger import PerformanceLogger
+from unittest.mock import Mock
+
+
+class TestMockProvider(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.provider = MockProvider(latency_mean=0, seed=1, variables=["text"])
+
+    async def test_message(self):
+        response = await self.provider.generate("mock-target", "Summarize this")
+
+        self.assertIsInstance(response["message"], str)
+        self.assertIsNone(response["error"])
+
+    async def test_several_completions(self):
+        response = await self.provider.generate("mock-target", "Summarize this", n=3)
+
+        self.assertEqual(len(response["messages"]), 3)
+        self.assertEqual(response["message"], response["messages"][0])
+        self.assertEqual(self.provider.calls, 1)
+
+    async def test_judge_payloads_are_valid(self):
+        evaluator = Evaluator(logger=Mock(spec=PerformanceLogger), dataset=[],
+                              evaluation_model=Model("mock-judge", provider=self.provider))
+
+        single = await evaluator.evaluate_output("Output", "Expected")
+        batch = await evaluator.evaluate_outputs([("A", "B"), ("C", "D"), ("E", "F")])
+
+        self.assertIsInstance(single["is_correct"], bool)
+        self.assertEqual(len(batch), 3)
+        # A complete batch response is used as is, without splitting
+        self.assertEqual(self.provider.calls, 2)
+
+    async def test_suggestion_payload_is_valid(self):
+        generator = PromptGenerator(Model("mock-generator", provider=self.provider))
+
+        result = await generator.generate_suggestions([("Summarize: {text}", "Summary", 0.5)], 4)
+
+        self.assertEqual(len(result["suggestions"]), 4)
+        self.assertTrue(all("{text}" in suggestion["prompt"] for suggestion in result["suggestions"]))
+
+    async def test_error_injection(self):
+        provider = MockProvider(latency_mean=0, error_rate=1.0)
+
+        response = await provider.generate("mock-target", "Prompt")
+
+        self.assertIsNotNone(response["error"])
+        self.assertEqual(provider.errors, 1)
+
+    async def test_rate_limit_injection(self):
+        provider = MockProvider(latency_mean=0, rate_limit_rate=1.0, retry_after=0.5)
+
+        with self.assertRaises(RateLimitError) as context:
+            await provider.generate("mock-target", "Prompt")
+
+        self.assertEqual(context.exception.retry_after, 0.5)
+
+    async def test_latency_stats(self):
+        provider = MockProvider(latency_mean=0.001, latency_distribution="constant")
+        for _ in range(3):
+            await provider.generate("mock-target", "Prompt")
+
+        stats = provider.get_latency_stats()["mock-target:message"]
+
+        self.assertEqual(stats["calls"], 3)
+        self.assertGreaterEqual(stats["p50"], 0.001)
+
+    def test_invalid_distribution(self):
+        with self.assertRaises(ValueError):
+            MockProvider(latency_distribution="normal")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+import unittest
+from openai import AsyncOpenAI
+from openai.types.chat import ChatCompletion
+from optimizer.model_interface import Model
+from providers.openai_provider import OpenAIProvider
+
+
+class TestOpenAIProvider(unittest.IsolatedAsyncioTestCase):
+    async def asyncTearDown(self):
+        await OpenAIProvider.close_shared_client()
+
+    async def test_client_is_async(self):
+        provider = OpenAIProvider()
+        self.assertIsInstance(provider.client, AsyncOpenAI)
+
+    async def test_models_share_client(self):
+        first = Model("gpt-4o-mini")
+        second = Model("gpt-4o-mini", temperature=0.0)
+
+        self.assertIs(first.provider.client, second.provider.client)
+
+    async def test_close_shared_client(self):
+        provider = OpenAIProvider()
+        client = provider.client
+
+        await OpenAIProvider.close_shared_client()
+
+        self.assertIsNot(provider.client, client)
+
+    def test_extract_usage(self):
+        response = ChatCompletion.model_validate({
+            "id": "chatcmpl-test",
+            "object": "chat.completion",
+            "created": 0,
+            "model": "gpt-4o-mini",
+            "choices": [],
+            "usage": {"prompt_tokens": 120, "completion_tokens": 30, "total_tokens": 150,
+                      "prompt_tokens_details": {"cached_tokens": 64}}
+        })
+
+        self.assertEqual(OpenAIProvider._extract_usage(response),
+                         {"prompt_tokens": 120, "completion_tokens": 30, "cached_tokens": 64})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,8 +1,11 @@
 import unittest
 import os
 import json
+import subprocess
+import sys
 import tempfile
 from utils.performance_logger import PerformanceLogger, create_logger
+from utils.jsonl_log_writer import JsonlLogWriter, read_jsonl_log
 
 
 class TestPerformanceLogger(unittest.TestCase):
@@ -24,6 +27,16 @@ class TestPerformanceLogger(unittest.TestCase):
         self.assertEqual(self.logger.log_data["optimization_logs"], [])
         self.assertTrue(os.path.exists(self.logger.log_file))
 
+    def test_historical_prompts(self):
+        self.logger.log_iteration(1, ["A", "B"], [{"prompt": "A", "score": 0.4}, {"prompt": "B", "score": 0.6}])
+        self.logger.log_iteration(2, ["A", "C"], [{"prompt": "A", "score": 0.4}, {"prompt": "C", "score": 0.4}])
+
+        historical_prompts = self.logger.get_historical_prompts(pending_evaluations=[{"prompt": "D", "score": 0.5}])
+
+        # A appears once, and ties with C in the order they were first logged
+        self.assertEqual([evaluation["prompt"] for evaluation in historical_prompts], ["B", "D", "A", "C"])
+        self.assertEqual(len(self.logger.get_historical_prompts()), 3)
+
     def test_log_iteration(self):
         prompts = ["Test prompt 1", "Test prompt 2"]
         evaluations = [
@@ -87,6 +100,96 @@ class TestPerformanceLogger(unittest.TestCase):
         self.assertTrue(path.startswith(self.test_dir))
         self.assertTrue(path.endswith('.json'))
 
+    def test_jsonl_log_reconstructs_log_data(self):
+        logger = PerformanceLogger(self.test_dir, self.original_prompt, log_format="jsonl")
+        self.assertTrue(logger.log_file.endswith('.jsonl'))
+        self.assertTrue(os.path.exists(logger.log_file))
+
+        for i in range(3):
+            prompts = [f"Test prompt {i}"]
+            evaluations = [{"prompt": prompts[0], "score": 0.5 + i * 0.1}]
+            logger.log_iteration(i + 1, prompts, evaluations)
+        logger.log_optimized_prompt("Test prompt 2")
+        logger.close()
+
+        self.assertEqual(read_jsonl_log(logger.log_file), logger.log_data)
+
+    def test_jsonl_log_keeps_usage(self):
+        logger = PerformanceLogger(self.test_dir, self.original_prompt, log_format="jsonl")
+        usage = {"calls": 2, "prompt_tokens": 100, "completion_tokens": 20, "cached_tokens": 0, "cost": 0.0001}
+        logger.log_iteration(1, ["Test prompt"], [{"prompt": "Test prompt", "score": 0.5}], usage=usage)
+        logger.log_optimized_prompt("Test prompt", usage=usage)
+        logger.close()
+
+        log_data = read_jsonl_log(logger.log_file)
+
+        self.assertEqual(log_data["optimization_logs"][0]["usage"], usage)
+        self.assertEqual(log_data["usage"], usage)
+
+    def test_jsonl_log_appends_one_line_per_event(self):
+        logger = PerformanceLogger(self.test_dir, self.original_prompt, log_format="jsonl")
+        logger.log_iteration(1, ["Test prompt"], [{"prompt": "Test prompt", "score": 0.5}])
+        logger.log_iteration(2, ["Test prompt"], [{"prompt": "Test prompt", "score": 0.6}])
+        logger.close()
+
+        with open(logger.log_file, 'r') as f:
+            lines = f.readlines()
+
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(json.loads(lines[2])["iteration"], 2)
+
+    def test_jsonl_reader_ignores_truncated_last_line(self):
+        path = os.path.join(self.test_dir, "truncated.jsonl")
+        writer = JsonlLogWriter(path, flush_every=10, fsync="never")
+        writer.append({"type": "start", "original_prompt": self.original_prompt})
+        writer.append({"type": "iteration", "iteration": 1, "prompts": [], "evaluations": []})
+        writer.close()
+        with open(path, 'a') as f:
+            f.write('{"type": "iteration", "itera')
+
+        log_data = read_jsonl_log(path)
+
+        self.assertEqual(log_data["original_prompt"], self.original_prompt)
+        self.assertEqual(len(log_data["optimization_logs"]), 1)
+
+    def test_invalid_log_format(self):
+        with self.assertRaises(ValueError):
+            PerformanceLogger(self.test_dir, self.original_prompt, log_format="xml")
+
+    def test_plot_rendered_at_end(self):
+        self.logger.log_iteration(1, ["Test prompt"], [{"prompt": "Test prompt", "score": 0.5}])
+        self.assertFalse(os.path.exists(self.logger.get_plot_file_path()))
+
+        self.logger.log_optimized_prompt("Test prompt")
+
+        self.assertTrue(os.path.exists(self.logger.get_plot_file_path()))
+
+    def test_background_plot(self):
+        logger = PerformanceLogger(self.test_dir, self.original_prompt, plot_mode="background")
+        for i in range(5):
+            logger.log_iteration(i + 1, ["Test prompt"], [{"prompt": "Test prompt", "score": 0.5}])
+        logger.log_optimized_prompt("Test prompt")
+        logger.close()
+
+        self.assertTrue(os.path.exists(logger.get_plot_file_path()))
+        # Updates submitted while a render is running are coalesced
+        self.assertLessEqual(logger.plot_renderer.renders, 6)
+
+    def test_plotting_off_never_imports_matplotlib(self):
+        script = (
+            "import sys\n"
+            "from utils.performance_logger import PerformanceLogger\n"
+            f"logger = PerformanceLogger({self.test_dir!r}, 'Prompt', plot_mode='off')\n"
+            "logger.log_iteration(1, ['Prompt'], [{'prompt': 'Prompt', 'score': 0.5}])\n"
+            "logger.log_optimized_prompt('Prompt')\n"
+            "assert 'matplotlib' not in sys.modules\n"
+            "assert not __import__('os').path.exists(logger.get_plot_file_path())\n"
+        )
+        project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        result = subprocess.run([sys.executable, "-c", script], cwd=project_root, capture_output=True, text=True)
+
+        self.assertEqual(result.returncode, 0, result.stderr)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,93 @@
+import asyncio
+import unittest
+from optimizer.pipeline import Pipeline, Stage
+
+
+class TestPipeline(unittest.IsolatedAsyncioTestCase):
+    async def test_results_keep_input_order(self):
+        async def double(value):
+            # Later items finish first
+            await asyncio.sleep(0.001 * (10 - value))
+            return value * 2
+
+        async def increment(value):
+            return value + 1
+
+        pipeline = Pipeline([Stage("double", double, 4, 2), Stage("increment", increment, 2, 2)])
+
+        results = await pipeline.run(range(10))
+
+        self.assertEqual(results, [value * 2 + 1 for value in range(10)])
+
+    async def test_second_stage_starts_before_first_stage_finishes(self):
+        events = []
+
+        async def first(value):
+            await asyncio.sleep(0.01 * value)
+            events.append(("first", value))
+            return value
+
+        async def second(value):
+            events.append(("second", value))
+            return value
+
+        pipeline = Pipeline([Stage("first", first, 3, 3), Stage("second", second, 1, 3)])
+
+        await pipeline.run([0, 1, 2])
+
+        self.assertLess(events.index(("second", 0)), events.index(("first", 2)))
+
+    async def test_batched_stage(self):
+        batches = []
+
+        async def produce(value):
+            return value
+
+        async def collect(values):
+            batches.append(values)
+            return [value * 10 for value in values]
+
+        pipeline = Pipeline([Stage("produce", produce, 4, 10), Stage("collect", collect, 1, 10, batch_size=3,
+                                                                       batch_wait=0.05)])
+
+        results = await pipeline.run(range(7))
+
+        self.assertEqual(results, [value * 10 for value in range(7)])
+        self.assertTrue(all(len(batch) <= 3 for batch in batches))
+        self.assertLess(len(batches), 7)
+        self.assertEqual(pipeline.get_stats()["collect"]["batches"], len(batches))
+
+    async def test_stats(self):
+        async def identity(value):
+            return value
+
+        pipeline = Pipeline([Stage("identity", identity, 2, 5)])
+
+        await pipeline.run(range(6))
+        stats = pipeline.get_stats()["identity"]
+
+        self.assertEqual(stats["workers"], 2)
+        self.assertEqual(stats["processed"], 6)
+        self.assertEqual(stats["queue_depth"], 0)
+        self.assertLessEqual(stats["max_queue_depth"], 5)
+        self.assertGreaterEqual(stats["utilization"], 0.0)
+
+    async def test_handler_error_propagates(self):
+        async def fail(value):
+            raise RuntimeError("boom")
+
+        pipeline = Pipeline([Stage("fail", fail, 2, 2)])
+
+        with self.assertRaises(RuntimeError):
+            await pipeline.run(range(5))
+
+    def test_stage_requires_worker(self):
+        async def identity(value):
+            return value
+
+        with self.assertRaises(ValueError):
+            Stage("identity", identity, 0, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
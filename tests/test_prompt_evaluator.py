@@ -1,8 +1,10 @@
+import asyncio
 import unittest
 from unittest.mock import Mock, AsyncMock, patch
 import os
 from optimizer.prompt_evaluator import Evaluator
 from optimizer.model_interface import Model
+from providers.mock_provider import MockProvider
 from utils.performance_logger import PerformanceLogger
 
 
@@ -64,6 +66,37 @@ class TestEvaluator(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(result['score'], 0.0)
         self.assertEqual(len(result['results']), 1)
 
+    async def test_evaluate_prompts_respects_concurrency_limit(self):
+        evaluator = Evaluator(logger=self.mock_logger, max_concurrent_requests=2)
+        evaluator.dataset = [
+            {'variables': {'text': f'Sample {i}'}, 'expected_output': f'Expected {i}'} for i in range(5)
+        ]
+        in_flight = 0
+        peak = 0
+
+        async def slow_output(prompt, generator_model):
+            nonlocal in_flight, peak
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return prompt
+
+        evaluator.generate_model_output = slow_output
+        evaluator.evaluate_output = AsyncMock(return_value={
+            'is_correct': True,
+            'explanation_success': 'Test success explanation',
+            'explanation_failure': ''
+        })
+        evaluator.summarize_explanations = AsyncMock(return_value='Summary')
+
+        result = await evaluator.evaluate_prompts(['A: {text}', 'B: {text}'], Model('test-model'), iteration=1)
+
+        self.assertEqual(peak, 2)
+        self.assertEqual([evaluation['prompt'] for evaluation in result], ['A: {text}', 'B: {text}'])
+        self.assertEqual([case['model_output'] for case in result[1]['results']],
+                         [f'B: Sample {i}' for i in range(5)])
+
     async def test_generate_model_output(self):
         generator_model = Model('test-model')
         result = await self.evaluator.generate_model_output('Test prompt', generator_model)
@@ -97,6 +130,188 @@ class TestEvaluator(unittest.IsolatedAsyncioTestCase):
         self.assertEqual(result['explanation_success'], 'Test success explanation')
         self.assertEqual(result['explanation_failure'], '')
 
+    async def test_evaluate_outputs_batch(self):
+        evaluation_model = Model('test-model')
+        evaluation_model.generate = AsyncMock(return_value={
+            'function': {
+                'name': 'evaluate_semantic_equivalence_batch',
+                'data': {
+                    'evaluations': [
+                        {'index': 1, 'is_equivalent': False, 'explanation_success': '',
+                         'explanation_failure': 'Different'},
+                        {'index': 0, 'is_equivalent': True, 'explanation_success': 'Same',
+                         'explanation_failure': ''}
+                    ]
+                }
+            }
+        })
+        self.evaluator.evaluation_model = evaluation_model
+
+        result = await self.evaluator.evaluate_outputs([('A', 'A'), ('B', 'C')])
+
+        evaluation_model.generate.assert_called_once()
+        self.assertEqual([r['is_correct'] for r in result], [True, False])
+        self.assertEqual(result[0]['explanation_success'], 'Same')
+        self.assertEqual(result[1]['explanation_failure'], 'Different')
+
+    async def test_evaluate_outputs_rejudges_missing_pairs(self):
+        evaluation_model = Model('test-model')
+        evaluation_model.generate = AsyncMock(return_value={
+            'function': {
+                'name': 'evaluate_semantic_equivalence_batch',
+                'data': {'evaluations': [{'index': 0, 'is_equivalent': True, 'explanation_success': 'Same',
+                                          'explanation_failure': ''}]}
+            }
+        })
+        self.evaluator.evaluation_model = evaluation_model
+        self.evaluator.evaluate_output = AsyncMock(return_value={
+            'is_correct': True,
+            'explanation_success': 'Single',
+            'explanation_failure': ''
+        })
+
+        result = await self.evaluator.evaluate_outputs([('A', 'A'), ('B', 'B'), ('C', 'C')])
+
+        self.assertEqual(len(result), 3)
+        self.assertTrue(all(r['is_correct'] for r in result))
+        # Only the pairs a response misses are judged again: B and C, then C on its own
+        self.assertEqual(evaluation_model.generate.call_count, 2)
+        self.assertEqual([call.args[0] for call in self.evaluator.evaluate_output.call_args_list], ['C'])
+        self.assertEqual([r['explanation_success'] for r in result], ['Same', 'Same', 'Single'])
+
+    async def test_reuses_evaluations_of_duplicate_prompts(self):
+        self.evaluator.evaluate_output = AsyncMock(return_value={
+            'is_correct': True,
+            'explanation_success': 'Good',
+            'explanation_failure': ''
+        })
+        self.evaluator.generate_model_output = AsyncMock(return_value='Output')
+        self.evaluator.summarize_explanations = AsyncMock(return_value='Summary')
+
+        first = await self.evaluator.evaluate_prompts(['Summarize: {text}'], Model('test-model'), iteration=0)
+        second = await self.evaluator.evaluate_prompts(['summarize:  {text}', 'Paraphrase: {text}'],
+                                                       Model('test-model'), iteration=1)
+
+        self.assertEqual(self.evaluator.generate_model_output.call_count, 2)
+        self.assertTrue(second[0]['reused'])
+        self.assertEqual(second[0]['prompt'], 'summarize:  {text}')
+        self.assertEqual(second[0]['score'], first[0]['score'])
+        self.assertEqual(second[0]['usage']['calls'], 0)
+        self.assertNotIn('reused', second[1])
+        self.assertEqual(len(self.evaluator.prompt_index), 2)
+
+    async def test_partial_evaluations_are_not_reused(self):
+        self.evaluator.dataset = [
+            {'variables': {'text': 'First text'}, 'expected_output': 'First'},
+            {'variables': {'text': 'Second text'}, 'expected_output': 'Second'}
+        ]
+        self.evaluator.evaluate_output = AsyncMock(return_value={
+            'is_correct': True,
+            'explanation_success': 'Good',
+            'explanation_failure': ''
+        })
+        self.evaluator.generate_model_output = AsyncMock(return_value='Output')
+        self.evaluator.summarize_explanations = AsyncMock(return_value='Summary')
+
+        await self.evaluator.evaluate_prompts(['Summarize: {text}'], Model('test-model'), iteration=0,
+                                              case_indices=[0])
+        full = await self.evaluator.evaluate_prompts(['Summarize: {text}'], Model('test-model'), iteration=1)
+        again = await self.evaluator.evaluate_prompts(['summarize:  {text}'], Model('test-model'), iteration=2)
+
+        # The minibatch evaluation isn't reused, the full one replaces it in the index and is
+        self.assertNotIn('reused', full[0])
+        self.assertEqual(full[0]['total_cases'], 2)
+        self.assertTrue(again[0]['reused'])
+        self.assertEqual(again[0]['total_cases'], 2)
+        self.assertEqual(self.evaluator.generate_model_output.call_count, 3)
+
+    async def test_invalid_prompts_are_rejected_before_any_call(self):
+        self.evaluator.evaluate_output = AsyncMock(return_value={
+            'is_correct': True,
+            'explanation_success': 'Good',
+            'explanation_failure': ''
+        })
+        self.evaluator.generate_model_output = AsyncMock(return_value='Output')
+        self.evaluator.summarize_explanations = AsyncMock(return_value='Summary')
+
+        result = await self.evaluator.evaluate_prompts(['Summarize {text} as {format}', 'Summarize: {text}'],
+                                                       Model('test-model'), iteration=0)
+
+        self.assertEqual(self.evaluator.generate_model_output.call_count, 1)
+        self.assertEqual(result[0]['score'], 0.0)
+        self.assertEqual(result[0]['usage']['calls'], 0)
+        self.assertIn('{format}', result[0]['invalid'])
+        self.assertNotIn('invalid', result[1])
+        self.assertEqual(result[1]['score'], 1.0)
+        self.assertEqual(self.evaluator.get_template_stats()['renders'], 1)
+
+    async def test_invalid_prompts_never_reuse_an_evaluation(self):
+        self.evaluator.generate_model_output = AsyncMock(return_value='Output')
+        self.evaluator.prompt_index.add('Summarize: {TEXT}', {'prompt': 'Summarize: {TEXT}', 'score': 1.0,
+                                                             'total_cases': 1})
+
+        result = await self.evaluator.evaluate_prompts(['Summarize: {TEXT}'], Model('test-model'), iteration=0)
+
+        self.assertNotIn('reused', result[0])
+        self.assertIn('{TEXT}', result[0]['invalid'])
+        self.assertEqual(result[0]['score'], 0.0)
+        self.evaluator.generate_model_output.assert_not_called()
+
+    def test_prepare_prompts_repairs_stray_braces(self):
+        prepared, rejected = self.evaluator.prepare_prompts(
+            ['Answer as {"summary": "..."}: {text}', 'Summarize the text', 'Summarize: {text}'])
+
+        self.assertEqual(prepared, ['Answer as {{"summary": "..."}}: {text}', 'Summarize: {text}'])
+        self.assertEqual([prompt for prompt, _ in rejected], ['Summarize the text'])
+        self.assertEqual(self.evaluator.compile_prompt(prepared[0]).render({'text': 'Hi'}),
+                         'Answer as {"summary": "..."}: Hi')
+        stats = self.evaluator.get_template_stats()
+        self.assertEqual((stats['compiled'], stats['repaired'], stats['rejected']), (2, 1, 1))
+
+    async def test_multi_sample_evaluation(self):
+        provider = MockProvider(latency_mean=0)
+        evaluator = Evaluator(logger=self.mock_logger, samples=3, dataset=[
+            {'variables': {'text': 'First'}, 'expected_output': 'Expected'},
+            {'variables': {'text': 'Second'}, 'expected_output': 'Expected'}
+        ])
+        verdicts = iter([[True, True, False], [True, False, False]])
+
+        async def evaluate_outputs(pairs):
+            return [{'is_correct': is_correct, 'explanation_success': 'Good' if is_correct else '',
+                     'explanation_failure': '' if is_correct else 'Bad'}
+                    for is_correct, _ in zip(next(verdicts), pairs)]
+
+        evaluator.evaluate_outputs = AsyncMock(side_effect=evaluate_outputs)
+
+        result = await evaluator.evaluate_prompts(['Summarize: {text}'], Model('mock-target', provider=provider),
+                                                  iteration=1, summarize=False)
+
+        # One generation request per case, and its three samples judged in one call
+        self.assertEqual(provider.calls, 2)
+        self.assertEqual([len(call.args[0]) for call in evaluator.evaluate_outputs.call_args_list], [3, 3])
+        evaluation = result[0]
+        self.assertEqual(len(evaluation['results'][0]['model_outputs']), 3)
+        self.assertEqual([r['is_correct'] for r in evaluation['results']], [True, False])
+        self.assertEqual(evaluation['correct_answers'], 1)
+        self.assertAlmostEqual(evaluation['score'], 0.5)
+        self.assertAlmostEqual(evaluation['mean_score'], 0.5)
+        # Sample runs score 1.0, 0.5 and 0.0
+        self.assertAlmostEqual(evaluation['score_variance'], 0.25)
+
+    async def test_single_sample_has_no_variance(self):
+        self.evaluator.evaluate_output = AsyncMock(return_value={
+            'is_correct': True,
+            'explanation_success': 'Good',
+            'explanation_failure': ''
+        })
+        self.evaluator.generate_model_output = AsyncMock(return_value='Output')
+
+        result = await self.evaluator.evaluate_prompt('Summarize: {text}', Model('test-model'))
+
+        self.assertEqual(result['mean_score'], 1.0)
+        self.assertEqual(result['score_variance'], 0.0)
+        self.assertNotIn('model_outputs', result['results'][0])
+
 
 if __name__ == '__main__':
     unittest.main()
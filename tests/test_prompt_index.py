@@ -0,0 +1,60 @@
+import unittest
+from optimizer.prompt_index import PromptIndex, normalize_prompt
+
+
+class TestPromptIndex(unittest.TestCase):
+    def setUp(self):
+        self.index = PromptIndex(threshold=0.8)
+        self.evaluation = {'prompt': 'Summarize the following text in one sentence: {text}', 'score': 0.5}
+        self.index.add(self.evaluation['prompt'], self.evaluation)
+
+    def test_normalize_prompt(self):
+        self.assertEqual(normalize_prompt("  Summarize:\n\t{text} "), "summarize: {text}")
+        self.assertEqual(normalize_prompt("Summarize: {TEXT}"), "summarize: {TEXT}")
+
+    def test_exact_duplicate_ignores_case_and_whitespace(self):
+        self.assertIs(self.index.get('summarize the following  text in one sentence:\n{text}'), self.evaluation)
+        self.assertIsNone(self.index.get('Summarize the following text in two sentences: {text}'))
+        self.assertIsNone(self.index.get('Summarize the following text in one sentence: {TEXT}'))
+
+    def test_near_duplicate(self):
+        prompt, similarity = self.index.find_near_duplicate('Summarize the following text, in one sentence: {text}.')
+
+        self.assertEqual(prompt, self.evaluation['prompt'])
+        self.assertGreaterEqual(similarity, 0.8)
+        self.assertIsNone(self.index.find_near_duplicate('Write a haiku inspired by this passage: {text}'))
+
+    def test_first_evaluation_is_kept(self):
+        self.index.add(self.evaluation['prompt'], {'prompt': self.evaluation['prompt'], 'score': 0.9})
+
+        self.assertEqual(len(self.index), 1)
+        self.assertIs(self.index.get(self.evaluation['prompt']), self.evaluation)
+
+    def test_replace_evaluation(self):
+        evaluation = {'prompt': self.evaluation['prompt'], 'score': 0.9}
+        self.index.add(self.evaluation['prompt'], evaluation, replace=True)
+
+        self.assertEqual(len(self.index), 1)
+        self.assertIs(self.index.get(self.evaluation['prompt']), evaluation)
+
+    def test_select(self):
+        kept, near_duplicates = self.index.select([
+            'Summarize the following text in one sentence: {text}',
+            'Summarize the following text, in one sentence: {text}.',
+            'Write a haiku inspired by this passage: {text}',
+            'write a haiku inspired by this passage:  {text}',
+            'List the three key facts stated in: {text}'
+        ], accepted=['List the three key facts stated in: {text}'])
+
+        # The exact duplicate is kept to reuse its evaluation, duplicates of kept prompts are dropped
+        self.assertEqual(kept, ['Summarize the following text in one sentence: {text}',
+                                'Write a haiku inspired by this passage: {text}'])
+        self.assertEqual(len(near_duplicates), 3)
+
+    def test_permutations_must_split_into_bands(self):
+        with self.assertRaises(ValueError):
+            PromptIndex(permutations=10, bands=4)
+
+
+if __name__ == '__main__':
+    unittest.main()
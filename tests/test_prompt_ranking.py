@@ -0,0 +1,56 @@
+import random
+import unittest
+from utils.prompt_ranking import PromptRanking
+
+
+def evaluation(prompt, score):
+    return {"prompt": prompt, "score": score}
+
+
+class TestPromptRanking(unittest.TestCase):
+    def test_select_matches_full_sort(self):
+        generator = random.Random(0)
+        evaluations = [evaluation(f"Prompt {index}", generator.choice([0.1, 0.5, 0.7, 0.9])) for index in range(200)]
+        ranking = PromptRanking()
+        for item in evaluations:
+            ranking.add(item)
+
+        # sorted is stable, so equal scores keep the order they were added in
+        expected = sorted(evaluations, key=lambda item: item["score"], reverse=True)
+        self.assertEqual(ranking.select(10), expected[:5] + expected[-5:])
+        self.assertEqual(ranking.select(7), expected[:4] + expected[-3:])
+        self.assertEqual(ranking.select(500), expected)
+
+    def test_latest_evaluation_of_a_prompt_replaces_earlier_ones(self):
+        ranking = PromptRanking()
+        ranking.add(evaluation("A", 0.2))
+        ranking.add(evaluation("B", 0.5))
+        ranking.add(evaluation("A", 0.9))
+
+        self.assertEqual(len(ranking), 2)
+        self.assertEqual(ranking.select(10), [evaluation("A", 0.9), evaluation("B", 0.5)])
+
+    def test_ties_keep_first_logged_order(self):
+        ranking = PromptRanking()
+        for prompt in ["C", "A", "B"]:
+            ranking.add(evaluation(prompt, 0.5))
+        ranking.add(evaluation("C", 0.5))
+
+        self.assertEqual([item["prompt"] for item in ranking.select(10)], ["C", "A", "B"])
+
+    def test_with_pending(self):
+        ranking = PromptRanking()
+        for index in range(50):
+            ranking.add(evaluation(f"Prompt {index}", index / 50))
+
+        pending = [evaluation("New best", 1.0), evaluation("Prompt 0", 0.99)]
+        selected = ranking.with_pending(pending, 4).select(4)
+
+        self.assertEqual([item["prompt"] for item in selected], ["New best", "Prompt 0", "Prompt 2", "Prompt 1"])
+        # The ranking itself is unchanged
+        self.assertEqual(len(ranking), 50)
+        self.assertEqual(ranking.select(4)[0]["prompt"], "Prompt 49")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import unittest
+from unittest.mock import AsyncMock, Mock
+import main
+from optimizer.prompt_evaluator import Evaluator
+from optimizer.prompt_template import PromptTemplate, TemplateError, compile_prompt, repair_template
+from tests.helpers import run_quietly
+from utils.performance_logger import PerformanceLogger
+
+
+class TestPromptTemplate(unittest.TestCase):
+    def test_renders_like_str_format(self):
+        for text in ['Summarize: {text}', '{text}', '{{literal}} {text} and {text}!', 'Quote {text!r:>12} please']:
+            template = PromptTemplate(text, ['text'])
+            self.assertEqual(template.render({'text': 'Hello', 'other': 1}), text.format(text='Hello', other=1))
+
+    def test_fields(self):
+        template = PromptTemplate('Translate {text} into {language}', ['text', 'language'])
+        self.assertEqual(template.fields, {'text', 'language'})
+
+    def test_rejects_invalid_templates(self):
+        for text in ['Summarize the text', 'Summarize {text} as {format}', 'Summarize {text} {}',
+                     'Summarize {text.title}', 'Summarize {text', 'Summarize {text} }']:
+            with self.assertRaises(TemplateError, msg=text):
+                PromptTemplate(text, ['text'])
+
+    def test_records_timings(self):
+        template = PromptTemplate('Summarize: {text}', ['text'])
+        template.render({'text': 'a'})
+        template.render({'text': 'b'})
+        self.assertGreaterEqual(template.compile_seconds, 0)
+        self.assertEqual(template.renders, 2)
+        self.assertGreaterEqual(template.render_seconds, 0)
+
+    def test_repair_escapes_stray_braces(self):
+        text = 'Reply with {"summary": ...} for {text} or {{kept}} }'
+        self.assertEqual(repair_template(text, ['text']), 'Reply with {{"summary": ...}} for {text} or {{kept}} }}')
+
+    def test_compile_prompt_repairs_only_when_asked(self):
+        text = 'Reply with {"summary": ...} for {text}'
+        with self.assertRaises(TemplateError):
+            compile_prompt(text, ['text'])
+        template = compile_prompt(text, ['text'], repair=True)
+        self.assertEqual(template.render({'text': 'Hi'}), 'Reply with {"summary": ...} for Hi')
+        self.assertIs(compile_prompt('Summarize: {text}', ['text'], repair=True).text, 'Summarize: {text}')
+
+    def test_repair_doesnt_add_missing_variables(self):
+        with self.assertRaises(TemplateError):
+            compile_prompt('Reply with {"summary": ...}', ['text'], repair=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+
+class TestSelectNewPrompts(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.evaluator = Evaluator(logger=Mock(spec=PerformanceLogger), dataset=[
+            {'variables': {'text': 'Sample text'}, 'expected_output': 'Expected output'}
+        ])
+        self.evaluator.prompt_index.add('Summarize the text: {text}', {'prompt': 'Summarize the text: {text}',
+                                                                      'score': 0.5, 'total_cases': 1})
+        self.generator = Mock()
+        self.history = [('Summarize the text: {text}', 'Summary', 0.5), ('Summarize {text} as {format}', '', 0.0)]
+
+    async def select(self, prompts):
+        return await run_quietly(main.select_new_prompts(self.generator, self.evaluator, prompts, self.history, 2))
+
+    async def test_rejected_suggestions_are_never_returned(self):
+        self.generator.generate_suggestions = AsyncMock(return_value={'suggestions': [{'prompt': 'Summarize'}]})
+
+        selected = await self.select(['SUMMARIZE: {TEXT}', 'Summarize the text'])
+
+        # Nothing compiles, so the best evaluated prompt that does is evaluated again
+        self.assertEqual(selected, ['Summarize the text: {text}'])
+
+    async def test_valid_near_duplicates_are_returned_repaired(self):
+        self.generator.generate_suggestions = AsyncMock(return_value={'suggestions': [{'prompt': '{TEXT}'}]})
+
+        selected = await self.select(['Summarize the text {"a": 1}: {text}', 'SUMMARIZE: {TEXT}'])
+
+        self.assertEqual(selected, ['Summarize the text {{"a": 1}}: {text}'])
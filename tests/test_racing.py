@@ -0,0 +1,69 @@
+import unittest
+from unittest.mock import AsyncMock, Mock
+import main
+from optimizer.model_interface import Model
+from optimizer.prompt_evaluator import Evaluator
+from optimizer.racing import racing_schedule, confidence_bounds, surviving_candidates
+from utils.performance_logger import PerformanceLogger
+
+
+class TestRacing(unittest.IsolatedAsyncioTestCase):
+    def test_racing_schedule(self):
+        self.assertEqual(racing_schedule(50, 5, 2), [5, 10, 20, 40, 50])
+        self.assertEqual(racing_schedule(3, 5, 2), [3])
+        with self.assertRaises(ValueError):
+            racing_schedule(10, 5, 1)
+
+    def test_confidence_bounds_shrink_with_cases(self):
+        few_lower, few_upper = confidence_bounds(5, 10, 0.95)
+        many_lower, many_upper = confidence_bounds(50, 100, 0.95)
+
+        self.assertLess(few_lower, many_lower)
+        self.assertGreater(few_upper, many_upper)
+        self.assertEqual(confidence_bounds(0, 0, 0.95), (0.0, 1.0))
+
+    def test_eliminated_prompts_never_become_the_best(self):
+        evaluations = [{'prompt': 'Lucky', 'score': 1.0, 'eliminated': True},
+                       {'prompt': 'Survivor', 'score': 0.6, 'eliminated': False}]
+
+        self.assertEqual(main.pick_best(evaluations, 'Original', 0.5), ('Survivor', 0.6))
+        self.assertEqual(main.pick_best(evaluations, 'Original', 0.7), ('Original', 0.7))
+
+    def test_surviving_candidates(self):
+        self.assertEqual(surviving_candidates([(40, 40), (0, 40), (30, 40)], 0.95), [True, False, True])
+        self.assertEqual(surviving_candidates([(3, 5), (2, 5)], 0.95), [True, True])
+
+    async def test_race_eliminates_losing_prompt(self):
+        evaluator = Evaluator(logger=Mock(spec=PerformanceLogger), racing=True)
+        evaluator.dataset = [
+            {'variables': {'text': f'Sample {i}'}, 'expected_output': f'Expected {i}'} for i in range(80)
+        ]
+
+        async def score_outputs(pairs):
+            return [{
+                'is_correct': model_output.startswith('Good'),
+                'explanation_success': '',
+                'explanation_failure': ''
+            } for model_output, _ in pairs]
+
+        async def echo(prompt, generator_model):
+            return prompt
+
+        evaluator.generate_model_output = echo
+        evaluator.score_outputs = score_outputs
+        evaluator.summarize_explanations = AsyncMock(return_value='Summary')
+
+        result = await evaluator.evaluate_prompts(['Good: {text}', 'Bad: {text}'], Model('test-model'), iteration=0)
+
+        self.assertFalse(result[0]['eliminated'])
+        self.assertEqual(result[0]['total_cases'], 80)
+        self.assertEqual(result[0]['score'], 1.0)
+        self.assertTrue(result[1]['eliminated'])
+        self.assertLess(result[1]['total_cases'], 80)
+        # Survivors' results come back in dataset order
+        self.assertEqual([case['model_output'] for case in result[0]['results']],
+                         [f'Good: Sample {i}' for i in range(80)])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,133 @@
+import asyncio
+import time
+import unittest
+from unittest.mock import AsyncMock, patch
+from optimizer.model_interface import Model
+from optimizer.rate_limiter import RateLimiter, TokenBucket, get_rate_limiter
+from providers.base_provider import RateLimitError
+
+
+class TestRateLimiter(unittest.IsolatedAsyncioTestCase):
+    def test_token_bucket(self):
+        bucket = TokenBucket(60)
+        now = bucket.updated_at
+
+        bucket.consume(60, now)
+
+        self.assertAlmostEqual(bucket.time_until(1, now), 1.0)
+        self.assertAlmostEqual(bucket.time_until(1, now + 1), 0.0)
+        # Requests larger than the bucket are capped to its capacity
+        self.assertAlmostEqual(bucket.time_until(120, now + 60), 0.0)
+
+    def test_rate_limits_must_be_positive(self):
+        with self.assertRaises(ValueError):
+            TokenBucket(0)
+        with self.assertRaises(ValueError):
+            RateLimiter(500, 0)
+
+    async def test_concurrency_limit(self):
+        limiter = RateLimiter(6000, 1000000, initial_concurrency=2, max_concurrency=2)
+        in_flight = 0
+        peak = 0
+
+        async def call():
+            nonlocal in_flight, peak
+            await limiter.acquire(10)
+            in_flight += 1
+            peak = max(peak, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            limiter.release()
+
+        await asyncio.gather(*(call() for _ in range(6)))
+
+        self.assertEqual(peak, 2)
+        self.assertEqual(limiter.get_state()["in_flight"], 0)
+        self.assertEqual(limiter.get_state()["successes"], 6)
+
+    async def test_request_bucket_delays_requests(self):
+        limiter = RateLimiter(1200, 1000000)  # 20 requests per second
+        limiter.request_bucket.available = 0
+
+        started = time.monotonic()
+        await limiter.acquire(10)
+
+        self.assertGreaterEqual(time.monotonic() - started, 0.04)
+
+    def test_aimd(self):
+        limiter = RateLimiter(500, 100000, initial_concurrency=8, min_concurrency=1, max_concurrency=16)
+
+        limiter.in_flight = 1
+        limiter.release(success=True)
+        self.assertAlmostEqual(limiter.concurrency_limit, 8.125)
+
+        limiter.on_rate_limited(retry_after=2)
+        self.assertAlmostEqual(limiter.concurrency_limit, 4.0625)
+        self.assertGreater(limiter.get_state()["blocked_for"], 1.5)
+
+        # A second rejection from the same burst doesn't halve again
+        limiter.on_rate_limited()
+        self.assertAlmostEqual(limiter.concurrency_limit, 4.0625)
+        self.assertEqual(limiter.get_state()["rate_limited"], 2)
+
+    def test_estimate_tokens(self):
+        self.assertGreater(RateLimiter.estimate_tokens("x" * 400), RateLimiter.estimate_tokens("x"))
+
+    def test_shared_per_model(self):
+        self.assertIs(get_rate_limiter("gpt-4o-mini"), get_rate_limiter("gpt-4o-mini"))
+        self.assertIs(Model("test-model").rate_limiter, Model("test-model").rate_limiter)
+
+    async def test_model_retries_rate_limited_requests(self):
+        limiter = RateLimiter(500, 100000)
+        model = Model("test-model", rate_limiter=limiter)
+        model.provider.generate = AsyncMock(side_effect=[
+            RateLimitError("Too many requests", retry_after=0.01),
+            {"message": "Hello", "function": None, "error": None}
+        ])
+
+        started = time.monotonic()
+        result = await model.generate("Prompt")
+
+        self.assertEqual(result["message"], "Hello")
+        self.assertEqual(limiter.get_state()["rate_limited"], 1)
+        self.assertEqual(limiter.get_state()["in_flight"], 0)
+        # Waits out Retry-After rather than the much longer RETRY_DELAY backoff
+        self.assertGreaterEqual(time.monotonic() - started, 0.01)
+        self.assertLess(time.monotonic() - started, 1)
+
+    async def test_model_backs_off_on_errors(self):
+        model = Model("test-model", rate_limiter=RateLimiter(500, 100000))
+        model.provider.generate = AsyncMock(side_effect=[
+            ConnectionError("Connection reset"),
+            {"message": "Hello", "function": None, "error": None}
+        ])
+
+        with patch("optimizer.model_interface.asyncio.sleep", new=AsyncMock()) as sleep:
+            result = await model.generate("Prompt")
+
+        self.assertEqual(result["message"], "Hello")
+        sleep.assert_called_once()
+        self.assertLessEqual(sleep.call_args[0][0], 5)
+
+    async def test_cancelled_request_releases_its_slot(self):
+        limiter = RateLimiter(500, 100000, initial_concurrency=1, max_concurrency=1)
+        model = Model("test-model", rate_limiter=limiter)
+
+        async def slow_generate(**kwargs):
+            await asyncio.sleep(10)
+
+        model.provider.generate = slow_generate
+
+        task = asyncio.create_task(model.generate("Prompt"))
+        await asyncio.sleep(0.01)
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await task
+
+        self.assertEqual(limiter.get_state()["in_flight"], 0)
+        # The next caller gets the only slot instead of waiting forever
+        await asyncio.wait_for(limiter.acquire(10), timeout=1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from providers.base_provider import BaseProvider, RateLimitError
+from providers.record_replay_provider import RecordingProvider, ReplayProvider, close_recordings
+
+
+class FakeProvider(BaseProvider):
+    def __init__(self):
+        self.calls = 0
+
+    def get_provider_name(self) -> str:
+        return "FakeProvider"
+
+    async def generate(self, model_name, prompt, temperature=0.7, functions=None, function_call=None):
+        self.calls += 1
+        if prompt == "rate limited":
+            raise RateLimitError("Too many requests", retry_after=1.5)
+        if functions:
+            return self.create_response(function={"name": functions[0]["name"], "data": {"value": self.calls}},
+                                        raw_response={"large": "payload"})
+        return self.create_response(message=f"Answer {self.calls}", raw_response={"large": "payload"})
+
+
+class TestRecordReplayProvider(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.recording_file = os.path.join(self.test_dir, "recordings", "responses.jsonl")
+        self.functions = [{"name": "sum", "parameters": {"type": "object", "properties": {}}}]
+
+    def tearDown(self):
+        close_recordings()
+        shutil.rmtree(self.test_dir)
+
+    async def _record(self):
+        recorder = RecordingProvider(FakeProvider(), self.recording_file)
+        await recorder.generate("gpt-4o-mini", "Prompt")
+        await recorder.generate("gpt-4o-mini", "Prompt")
+        await recorder.generate("gpt-4o-mini", "Add", functions=self.functions, function_call={"name": "sum"})
+        with self.assertRaises(RateLimitError):
+            await recorder.generate("gpt-4o-mini", "rate limited")
+        close_recordings()
+
+    async def test_replay_serves_recorded_responses(self):
+        await self._record()
+        replay = ReplayProvider(self.recording_file)
+
+        first = await replay.generate("gpt-4o-mini", "Prompt")
+        second = await replay.generate("gpt-4o-mini", "Prompt")
+        third = await replay.generate("gpt-4o-mini", "Prompt")
+        function_response = await replay.generate("gpt-4o-mini", "Add", functions=self.functions,
+                                                  function_call={"name": "sum"})
+
+        self.assertEqual(first["message"], "Answer 1")
+        self.assertEqual(second["message"], "Answer 2")
+        # Exhausted requests keep returning the last recorded response
+        self.assertEqual(third["message"], "Answer 2")
+        self.assertEqual(function_response["function"], {"name": "sum", "data": {"value": 3}})
+        self.assertIsNone(function_response["raw_response"])
+        self.assertEqual(replay.hits, 4)
+
+    async def test_replay_missing_request(self):
+        await self._record()
+        replay = ReplayProvider(self.recording_file)
+
+        response = await replay.generate("gpt-4o-mini", "Never recorded")
+
+        self.assertIsNotNone(response["error"])
+        self.assertEqual(replay.misses, 1)
+
+    async def test_replay_reproduces_rate_limits(self):
+        await self._record()
+        replay = ReplayProvider(self.recording_file)
+
+        with self.assertRaises(RateLimitError) as context:
+            await replay.generate("gpt-4o-mini", "rate limited")
+
+        self.assertEqual(context.exception.retry_after, 1.5)
+
+    async def test_replay_latency(self):
+        await self._record()
+        replay = ReplayProvider(self.recording_file, latency=0.05)
+
+        started = time.monotonic()
+        await replay.generate("gpt-4o-mini", "Prompt")
+
+        self.assertGreaterEqual(time.monotonic() - started, 0.05)
+
+    def test_missing_recording(self):
+        with self.assertRaises(FileNotFoundError):
+            ReplayProvider(os.path.join(self.test_dir, "missing.jsonl"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import AsyncMock
+from optimizer.model_interface import Model
+from utils.response_cache import ResponseCache
+
+
+class TestResponseCache(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.cache_file = os.path.join(self.test_dir, "cache", "responses.sqlite")
+        self.cache = ResponseCache(self.cache_file, max_entries=3, max_age=None)
+
+    def tearDown(self):
+        self.cache.close()
+        shutil.rmtree(self.test_dir)
+
+    def test_set_and_get(self):
+        key = ResponseCache.make_key("gpt-4o-mini", 0.0, "Prompt")
+        self.assertIsNone(self.cache.get(key))
+
+        self.cache.set(key, {"message": "Hello", "function": None, "error": None})
+
+        self.assertEqual(self.cache.get(key)["message"], "Hello")
+        self.assertEqual(self.cache.get_stats()["hits"], 1)
+        self.assertEqual(self.cache.get_stats()["misses"], 1)
+
+    def test_key_depends_on_request(self):
+        functions = [{"name": "f", "parameters": {"type": "object", "properties": {}}}]
+        base = ResponseCache.make_key("gpt-4o-mini", 0.0, "Prompt")
+
+        self.assertEqual(base, ResponseCache.make_key("gpt-4o-mini", 0.0, "Prompt"))
+        self.assertNotEqual(base, ResponseCache.make_key("gpt-4o", 0.0, "Prompt"))
+        self.assertNotEqual(base, ResponseCache.make_key("gpt-4o-mini", 0.7, "Prompt"))
+        self.assertNotEqual(base, ResponseCache.make_key("gpt-4o-mini", 0.0, "Other prompt"))
+        self.assertNotEqual(base, ResponseCache.make_key("gpt-4o-mini", 0.0, "Prompt", functions))
+
+    def test_size_eviction_drops_least_recently_used(self):
+        keys = [ResponseCache.make_key("gpt-4o-mini", 0.0, f"Prompt {i}") for i in range(4)]
+        for key in keys[:3]:
+            self.cache.set(key, {"message": key})
+        self.cache.get(keys[0])
+
+        self.cache.set(keys[3], {"message": keys[3]})
+
+        self.assertEqual(self.cache.get_stats()["entries"], 3)
+        self.assertIsNone(self.cache.get(keys[1]))
+        self.assertIsNotNone(self.cache.get(keys[0]))
+
+    def test_age_eviction(self):
+        cache = ResponseCache(self.cache_file, max_entries=3, max_age=-1)
+        key = ResponseCache.make_key("gpt-4o-mini", 0.0, "Prompt")
+        cache.set(key, {"message": "Hello"})
+
+        self.assertIsNone(cache.get(key))
+        # The expired entry is removed by the lookup, not only at the next startup
+        self.assertEqual(cache.get_stats()["entries"], 0)
+        cache.close()
+
+    def test_hits_write_access_times_in_batches(self):
+        key = ResponseCache.make_key("gpt-4o-mini", 0.0, "Prompt")
+        self.cache.set(key, {"message": "Hello"})
+        changes = self.cache.connection.total_changes
+
+        for _ in range(10):
+            self.cache.get(key)
+
+        self.assertEqual(self.cache.connection.total_changes, changes)
+        self.cache.close()
+        reopened = ResponseCache(self.cache_file)
+        last_access = reopened.connection.execute("SELECT last_access, created_at FROM responses").fetchone()
+        self.assertGreater(last_access[0], last_access[1])
+        reopened.close()
+        self.cache = ResponseCache(self.cache_file, max_entries=3, max_age=None)
+
+    def test_persists_across_instances(self):
+        key = ResponseCache.make_key("gpt-4o-mini", 0.0, "Prompt")
+        self.cache.set(key, {"message": "Hello"})
+
+        reopened = ResponseCache(self.cache_file)
+        self.assertEqual(reopened.get(key)["message"], "Hello")
+        reopened.close()
+
+    async def test_model_uses_cache(self):
+        model = Model("test-model", cache=self.cache)
+        model.provider.generate = AsyncMock(return_value={"message": "Hello", "function": None, "error": None})
+
+        first = await model.generate("Prompt")
+        second = await model.generate("Prompt")
+
+        model.provider.generate.assert_called_once()
+        self.assertEqual(first, second)
+
+    async def test_model_does_not_cache_errors(self):
+        model = Model("test-model", cache=self.cache)
+        model.provider.generate = AsyncMock(return_value={"message": None, "function": None, "error": "Failure"})
+
+        await model.generate("Prompt")
+        await model.generate("Prompt")
+
+        self.assertEqual(model.provider.generate.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
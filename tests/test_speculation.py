@@ -0,0 +1,81 @@
+import asyncio
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import AsyncMock, Mock
+from optimizer.prompt_generator import PromptGenerator
+from optimizer.speculation import EvaluationProgress, SpeculativeGeneration
+from providers.mock_provider import MockProvider
+from tests.helpers import OptimizationRun
+from utils.performance_logger import PerformanceLogger
+
+SUGGESTIONS = {"suggestions": [{"prompt": "Next: {text}", "explanation": "Speculative"}]}
+
+
+class TestSpeculation(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.log_dir = tempfile.mkdtemp()
+        self.logger = PerformanceLogger(self.log_dir, "Summarize: {text}", plot_mode="off")
+
+    def tearDown(self):
+        shutil.rmtree(self.log_dir)
+
+    async def test_progress_wait_for(self):
+        progress = EvaluationProgress()
+        progress.reset(["A", "B"], 2)
+        waiter = asyncio.create_task(progress.wait_for(0.5))
+
+        progress.record(0, True)
+        await asyncio.sleep(0)
+        self.assertFalse(waiter.done())
+        progress.record(1, False)
+        await asyncio.wait_for(waiter, 1)
+
+        self.assertEqual([evaluation['score'] for evaluation in progress.get_provisional_evaluations()], [1.0, 0.0])
+
+    async def speculate(self, final_score: float):
+        generator = Mock(spec=PromptGenerator)
+        generator.generate_suggestions = AsyncMock(return_value=SUGGESTIONS)
+        progress = EvaluationProgress()
+        speculation = SpeculativeGeneration(generator, self.logger, progress, 1, start_fraction=0.5,
+                                            score_tolerance=0.1)
+        speculation.start()
+        progress.reset(["A: {text}"], 2)
+        progress.record(0, True)
+        await asyncio.sleep(0.01)
+        generator.generate_suggestions.assert_awaited_once()
+        return await speculation.resolve([("A: {text}", "Summary", final_score)])
+
+    async def test_keeps_suggestions_when_ranking_holds(self):
+        self.assertEqual(await self.speculate(final_score=1.0), SUGGESTIONS)
+
+    async def test_discards_suggestions_when_scores_move(self):
+        self.assertIsNone(await self.speculate(final_score=0.5))
+
+    async def test_discards_speculation_that_never_started(self):
+        generator = Mock(spec=PromptGenerator)
+        speculation = SpeculativeGeneration(generator, self.logger, EvaluationProgress(), 1)
+        speculation.start()
+
+        self.assertIsNone(await speculation.resolve([("A: {text}", "", 1.0)]))
+        self.assertTrue(speculation.task.cancelled())
+
+    async def test_optimize_prompt_uses_speculative_suggestions(self):
+        provider = MockProvider(latency_mean=0.002, latency_distribution="constant", seed=1, accuracy=1.0,
+                                variables=["text"])
+        dataset = [{"variables": {"text": f"Text {i}"}, "expected_output": "Expected"} for i in range(6)]
+        optimization = OptimizationRun(os.path.join(self.log_dir, "run"), dataset, provider=provider)
+        output = io.StringIO()
+
+        await optimization.optimize({"SPECULATIVE_GENERATION": True}, output)
+
+        # Every output is judged correct, so the partial ranking always holds
+        self.assertEqual(output.getvalue().count("Using the suggestions generated speculatively"), 3)
+        self.assertEqual(len(optimization.logger.log_data["optimization_logs"]), 3)
+        self.assertEqual(len(provider.latencies["mock-generator:analyze_and_suggest_prompts"]), 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from unittest.mock import patch
+from optimizer.model_interface import Model
+from utils.tracer import Tracer
+
+
+class TestTracer(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def test_disabled_tracer_records_nothing(self):
+        tracer = Tracer(enabled=False)
+
+        with tracer.span("stage", size=1) as span:
+            span.set(result=2)
+
+        self.assertEqual(tracer.spans, [])
+
+    def test_span_attributes(self):
+        tracer = Tracer(enabled=True)
+
+        with tracer.span("stage", size=1) as span:
+            span.set(result=2)
+
+        self.assertEqual(len(tracer.spans), 1)
+        self.assertEqual(tracer.spans[0].attrs, {"size": 1, "result": 2})
+        self.assertGreaterEqual(tracer.spans[0].duration, 0)
+
+    def test_span_records_errors(self):
+        tracer = Tracer(enabled=True)
+
+        with self.assertRaises(ValueError):
+            with tracer.span("stage"):
+                raise ValueError("boom")
+
+        self.assertEqual(tracer.spans[0].attrs["error"], "ValueError")
+
+    async def test_concurrent_tasks_get_separate_tracks(self):
+        tracer = Tracer(enabled=True)
+
+        async def work():
+            with tracer.span("call"):
+                await asyncio.sleep(0.001)
+
+        await asyncio.gather(work(), work())
+
+        self.assertEqual(len({span.track for span in tracer.spans}), 2)
+
+    def test_export_chrome_trace(self):
+        tracer = Tracer(enabled=True)
+        with tracer.span("stage", category="llm", model="gpt-4o-mini"):
+            pass
+        path = os.path.join(self.test_dir, "trace.json")
+
+        tracer.export_chrome_trace(path)
+
+        with open(path) as f:
+            trace = json.load(f)
+        event = trace["traceEvents"][0]
+        self.assertEqual(event["name"], "stage")
+        self.assertEqual(event["ph"], "X")
+        self.assertEqual(event["cat"], "llm")
+        self.assertEqual(event["args"]["model"], "gpt-4o-mini")
+
+    def test_summary(self):
+        tracer = Tracer(enabled=True)
+        for _ in range(3):
+            with tracer.span("stage"):
+                pass
+
+        summary = tracer.summary()
+
+        self.assertEqual(summary["stage"]["count"], 3)
+        self.assertIn("stage", tracer.format_summary())
+
+    async def test_model_generate_span(self):
+        tracer = Tracer(enabled=True)
+        model = Model("test-model", rate_limiter=None)
+
+        with patch("optimizer.model_interface.tracer", tracer):
+            await model.generate("Prompt")
+
+        span = next(span for span in tracer.spans if span.name == "model.generate")
+        self.assertEqual(span.attrs["model"], "test-model")
+        self.assertEqual(span.attrs["attempt"], 1)
+        self.assertEqual(span.attrs["prompt_chars"], 6)
+        self.assertGreater(span.attrs["response_chars"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import unittest
+from unittest.mock import Mock
+from optimizer.model_interface import Model
+from optimizer.prompt_evaluator import Evaluator
+from optimizer.usage_tracker import UsageTracker, estimate_cost, record_usage, track_usage
+from providers.mock_provider import MockProvider
+from utils.performance_logger import PerformanceLogger
+
+
+class TestUsageTracker(unittest.IsolatedAsyncioTestCase):
+    def test_estimate_cost(self):
+        usage = {"prompt_tokens": 1_000_000, "completion_tokens": 1_000_000, "cached_tokens": 500_000}
+
+        # Half of the prompt at the cached price, plus the completion
+        self.assertAlmostEqual(estimate_cost("gpt-4o-mini", usage), 0.075 + 0.0375 + 0.60)
+        self.assertIsNone(estimate_cost("unknown-model", usage))
+
+    def test_summary(self):
+        tracker = UsageTracker()
+        tracker.add("gpt-4o-mini", {"prompt_tokens": 100, "completion_tokens": 10, "cached_tokens": 0})
+        tracker.add("unknown-model", {"prompt_tokens": 50, "completion_tokens": 5, "cached_tokens": 20})
+
+        summary = tracker.get_summary()
+
+        self.assertEqual(summary["calls"], 2)
+        self.assertEqual(summary["prompt_tokens"], 150)
+        self.assertEqual(summary["cached_tokens"], 20)
+        self.assertIsNone(summary["models"]["unknown-model"]["cost"])
+        self.assertAlmostEqual(summary["cost"], summary["models"]["gpt-4o-mini"]["cost"])
+
+    def test_cancelled_calls_are_counted_apart(self):
+        tracker = UsageTracker()
+        tracker.add("gpt-4o-mini", {"prompt_tokens": 100, "completion_tokens": 10, "cached_tokens": 0})
+        tracker.add_cancelled("gpt-4o-mini", 1000)
+
+        summary = tracker.get_summary()
+
+        self.assertEqual((summary["calls"], summary["prompt_tokens"]), (1, 100))
+        self.assertEqual((summary["cancelled_calls"], summary["cancelled_tokens"]), (1, 1000))
+        # The estimated tokens are priced as prompt tokens
+        self.assertAlmostEqual(summary["cost"], estimate_cost("gpt-4o-mini", {"prompt_tokens": 1100,
+                                                                             "completion_tokens": 10}))
+
+    def test_track_usage_nests_and_shares(self):
+        outer, first, second = UsageTracker(), UsageTracker(), UsageTracker()
+
+        with track_usage(outer), track_usage(first, 0.25), track_usage(second, 0.75):
+            record_usage("gpt-4o-mini", {"prompt_tokens": 100, "completion_tokens": 20, "cached_tokens": 0})
+        record_usage("gpt-4o-mini", {"prompt_tokens": 100, "completion_tokens": 20, "cached_tokens": 0})
+
+        self.assertEqual(outer.get_summary()["prompt_tokens"], 100)
+        self.assertEqual(first.get_summary()["prompt_tokens"], 25)
+        self.assertEqual(second.get_summary()["completion_tokens"], 15)
+
+    async def test_model_records_provider_usage_only(self):
+        model = Model("mock-target", provider=MockProvider(latency_mean=0, seed=1), rate_limiter=None)
+        model.cache = Mock()
+        model.cache.get.return_value = {"message": "Cached", "usage": {"prompt_tokens": 5}}
+        tracker = UsageTracker()
+
+        with track_usage(tracker):
+            await model.generate("Prompt")
+
+        self.assertEqual(tracker.get_summary()["calls"], 0)
+
+    async def test_evaluator_attributes_usage(self):
+        provider = MockProvider(latency_mean=0, seed=1, variables=["text"])
+        logger = Mock(spec=PerformanceLogger)
+        dataset = [{"variables": {"text": f"Text {i}"}, "expected_output": "Expected"} for i in range(4)]
+        evaluator = Evaluator(logger=logger, dataset=dataset, judge_batch_size=3, judge_batch_wait=0.05,
+                              evaluation_model=Model("mock-judge", provider=provider, rate_limiter=None))
+        target_model = Model("mock-target", provider=provider, rate_limiter=None)
+
+        evaluations = await evaluator.evaluate_prompts(["Summarize: {text}", "Shorten: {text}"], target_model, 0)
+
+        iteration_usage = evaluator.get_usage_stats()
+        self.assertEqual(iteration_usage["calls"], provider.calls)
+        self.assertEqual(set(iteration_usage["models"]), {"mock-target", "mock-judge"})
+        for evaluation in evaluations:
+            self.assertEqual(evaluation["usage"]["models"]["mock-target"]["calls"], 4)
+            self.assertGreater(evaluation["usage"]["prompt_tokens"], 0)
+        # Shared judge batches are split between the prompts, so the prompts add up to the iteration
+        self.assertAlmostEqual(sum(evaluation["usage"]["prompt_tokens"] for evaluation in evaluations),
+                               iteration_usage["prompt_tokens"], delta=2)
+        self.assertEqual(logger.log_iteration.call_args.kwargs["usage"], iteration_usage)
+
+
+if __name__ == '__main__':
+    unittest.main()
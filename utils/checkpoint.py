@@ -0,0 +1,102 @@
+import json
+import os
+from typing import Any, Dict, List, Optional, Tuple, Union
+from utils.jsonl_log_writer import JsonlLogWriter, encode_json
+
+CaseKey = Tuple[int, str, int]
+
+
+class Checkpoint:
+    """
+    Saved state of an optimization run, so an interrupted run can be resumed.
+
+    The loop state (current prompts, best prompt and score, usage, elapsed time and where the
+    run's log is) is rewritten atomically at every iteration boundary. It is small: the
+    optimization history isn't copied, a resumed run reads it back from the log. Within an
+    iteration, each generated output and each judged case is appended to a journal next to it,
+    so a resumed run only issues the model calls that hadn't completed.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.journal_path = f"{os.path.splitext(path)[0]}.cases.jsonl"
+        self.outputs: Dict[CaseKey, Union[str, List[str]]] = {}
+        self.results: Dict[CaseKey, Dict[str, Any]] = {}
+        self.writer: Optional[JsonlLogWriter] = None
+
+    def load(self) -> Optional[Dict[str, Any]]:
+        """Return the saved loop state, or None if there is no checkpoint, and load the case journal."""
+        if not os.path.exists(self.path):
+            return None
+        with open(self.path, 'r', encoding='utf-8') as f:
+            state = json.load(f)
+
+        if os.path.exists(self.journal_path):
+            with open(self.journal_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Killed mid-write
+                        break
+                    key = (record["iteration"], record["prompt"], record["case"])
+                    if "result" in record:
+                        self.results[key] = record["result"]
+                    else:
+                        self.outputs[key] = record["model_output"]
+        return state
+
+    def save(self, state: Dict[str, Any], new_iteration: bool = False):
+        """
+        Atomically replace the saved loop state.
+
+        new_iteration drops the case journal, whose cases are all part of the logged history by then.
+        """
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        temporary_path = f"{self.path}.tmp"
+        with open(temporary_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f, default=encode_json)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary_path, self.path)
+        if new_iteration:
+            self._clear_journal()
+
+    def get_output(self, iteration: int, prompt: str, case: int) -> Optional[Union[str, List[str]]]:
+        return self.outputs.get((iteration, prompt, case))
+
+    def get_result(self, iteration: int, prompt: str, case: int) -> Optional[Dict[str, Any]]:
+        return self.results.get((iteration, prompt, case))
+
+    def record_output(self, iteration: int, prompt: str, case: int, model_output: Union[str, List[str]]):
+        self.outputs[(iteration, prompt, case)] = model_output
+        self._append({"iteration": iteration, "prompt": prompt, "case": case, "model_output": model_output})
+
+    def record_result(self, iteration: int, prompt: str, case: int, result: Dict[str, Any]):
+        self.results[(iteration, prompt, case)] = result
+        self._append({"iteration": iteration, "prompt": prompt, "case": case, "result": result})
+
+    def clear(self):
+        """Remove the checkpoint once the run it belongs to has completed."""
+        self._clear_journal()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+    def _append(self, record: Dict[str, Any]):
+        if self.writer is None:
+            self.writer = JsonlLogWriter(self.journal_path, flush_every=1, fsync="never")
+        self.writer.append(record)
+
+    def _clear_journal(self):
+        self.close()
+        self.outputs.clear()
+        self.results.clear()
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
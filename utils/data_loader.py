@@ -1,21 +1,101 @@
+import hashlib
 import json
+import mmap
 import os
-from typing import List, Dict, Any
-from config import DATASET_DIR, DATASET_FILE, ORIGINAL_PROMPT
+import re
+from array import array
+from collections.abc import Sequence
+from functools import lru_cache
+from typing import List, Dict, Any, Iterator, Tuple, Union
+from config import (
+    DATASET_DIR,
+    DATASET_FILE,
+    ORIGINAL_PROMPT,
+    DATASET_ACCESS,
+    DATASET_CACHE_DIR,
+    DATASET_CASE_CACHE_SIZE
+)
+
+DATASET_ACCESS_MODES = ("memory", "lazy", "mmap")
+# Bumped whenever the layout of the cached case indexes, or the validation they vouch for, changes
+INDEX_VERSION = 3
+
+# Strings, skipped whole, and the brackets that delimit the elements of a JSON array
+_JSON_TOKEN = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"|[\[\]{}]', re.DOTALL)
+
+# Eagerly loaded datasets, by path, with the cache key they were loaded under
+_loaded_datasets: Dict[str, Tuple[str, List[Dict[str, Any]]]] = {}
 
 class InvalidDataPointError(Exception):
     """Custom exception for invalid data points."""
     pass
 
+def input_length(data_point: Dict[str, Any]) -> int:
+    """Total length of a data point's input variables, as text."""
+    return sum(len(str(value)) for value in data_point['variables'].values())
+
+class LazyDataset(Sequence):
+    """
+    Dataset cases read from the file only when accessed, by their byte offset and length.
+
+    input_lengths holds the input_length of every case, recorded when the file was validated,
+    so the cases can be told apart by length without reading them.
+
+    The most recently used cases are kept parsed, so repeated accesses to a case during an
+    evaluation return the same dict. With use_mmap the file is memory mapped, which makes
+    random access to a large file cheap; otherwise each case is read with a seek.
+    """
+
+    def __init__(self, path: str, offsets: array, lengths: array, input_lengths: array, use_mmap: bool = False,
+                 cache_size: int = DATASET_CASE_CACHE_SIZE):
+        self.path = path
+        self.offsets = offsets
+        self.lengths = lengths
+        self.input_lengths = input_lengths
+        self._file = open(path, 'rb')
+        self._buffer = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) \
+            if use_mmap and os.path.getsize(path) else None
+        self._load_case = lru_cache(maxsize=cache_size)(self._read_case)
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def __getitem__(self, index: Union[int, slice]) -> Any:
+        if isinstance(index, slice):
+            return [self[position] for position in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("dataset index out of range")
+        return self._load_case(index)
+
+    def _read_case(self, index: int) -> Dict[str, Any]:
+        offset, length = self.offsets[index], self.lengths[index]
+        if self._buffer is not None:
+            return json.loads(self._buffer[offset:offset + length])
+        self._file.seek(offset)
+        return json.loads(self._file.read(length))
+
+    def close(self):
+        if self._buffer is not None:
+            self._buffer.close()
+            self._buffer = None
+        self._file.close()
+
 class DataLoader:
-    def __init__(self, dataset_dir=DATASET_DIR, dataset_file=DATASET_FILE, current_prompt=ORIGINAL_PROMPT):
+    def __init__(self, dataset_dir=DATASET_DIR, dataset_file=DATASET_FILE, current_prompt=ORIGINAL_PROMPT,
+                 cache_dir=DATASET_CACHE_DIR):
         self.dataset_path = os.path.join(dataset_dir, dataset_file)
         self.current_prompt = current_prompt
+        self.cache_dir = cache_dir
 
     def load_data(self) -> List[Dict[str, Any]]:
         """
         Load data from the dataset file.
 
+        The file is parsed and validated once per process for a given version of it; later calls
+        return the same cases.
+
         Returns:
             List[Dict[str, Any]]: A list of valid data points, each containing variables and expected output.
 
@@ -23,11 +103,17 @@ class DataLoader:
             FileNotFoundError: If the dataset file is not found.
             InvalidDataPointError: If any data point is invalid.
         """
-        if not os.path.exists(self.dataset_path):
-            raise FileNotFoundError(f"Dataset file not found at {self.dataset_path}")
+        cache_key = self.get_cache_key()
+        loaded = _loaded_datasets.get(self.dataset_path)
+        if loaded is not None and loaded[0] == cache_key:
+            return list(loaded[1])
 
-        with open(self.dataset_path, 'r') as f:
-            loaded_data = json.load(f)
+        # Parsing the whole file at once is faster than streaming it when every case is kept anyway
+        with open(self.dataset_path, 'r', encoding='utf-8') as f:
+            if self.dataset_path.endswith('.jsonl'):
+                loaded_data = [json.loads(line) for line in f if line.strip()]
+            else:
+                loaded_data = json.load(f)
 
         valid_data = []
         for index, data_point in enumerate(loaded_data):
@@ -37,7 +123,150 @@ class DataLoader:
             except InvalidDataPointError as e:
                 raise InvalidDataPointError(f"Invalid data point at index {index}: {str(e)}") from e
 
-        return valid_data
+        _loaded_datasets[self.dataset_path] = (cache_key, valid_data)
+        return list(valid_data)
+
+    def iter_data(self) -> Iterator[Dict[str, Any]]:
+        """
+        Stream the valid data points of the dataset file one at a time, without loading the whole file.
+
+        Raises:
+            FileNotFoundError: If the dataset file is not found.
+            InvalidDataPointError: If any data point is invalid.
+        """
+        for _, _, data_point in self._scan(validate=True):
+            yield data_point
+
+    def open_data(self, use_mmap: bool = False) -> LazyDataset:
+        """
+        Open the dataset for lazy access, reading each case from the file only when it is used.
+
+        The file is validated the first time it is opened, and the offsets and input lengths of
+        its cases are cached in cache_dir under the file's path, modification time, size and the prompt's
+        required variables, so later runs open it without parsing anything.
+
+        Raises:
+            FileNotFoundError: If the dataset file is not found.
+            InvalidDataPointError: If any data point is invalid.
+        """
+        index_path = os.path.join(self.cache_dir, f"{self.get_cache_key()}.idx")
+        offsets, lengths, input_lengths = array('Q'), array('Q'), array('Q')
+        if os.path.exists(index_path):
+            with open(index_path, 'rb') as f:
+                count = os.path.getsize(index_path) // (3 * offsets.itemsize)
+                offsets.fromfile(f, count)
+                lengths.fromfile(f, count)
+                input_lengths.fromfile(f, count)
+        else:
+            for offset, length, data_point in self._scan(validate=True):
+                offsets.append(offset)
+                lengths.append(length)
+                input_lengths.append(input_length(data_point))
+            os.makedirs(self.cache_dir, exist_ok=True)
+            temporary_path = f"{index_path}.tmp"
+            with open(temporary_path, 'wb') as f:
+                offsets.tofile(f)
+                lengths.tofile(f)
+                input_lengths.tofile(f)
+            os.replace(temporary_path, index_path)
+        return LazyDataset(self.dataset_path, offsets, lengths, input_lengths, use_mmap=use_mmap)
+
+    def get_dataset(self, access: str = DATASET_ACCESS) -> Sequence:
+        """The dataset as a list ("memory") or a LazyDataset read through seeks ("lazy") or a memory map ("mmap")."""
+        if access not in DATASET_ACCESS_MODES:
+            raise ValueError(f"Unknown dataset access: {access}. Expected one of {DATASET_ACCESS_MODES}")
+        if access == "memory":
+            return self.load_data()
+        return self.open_data(use_mmap=access == "mmap")
+
+    def get_cache_key(self) -> str:
+        """Identifies a version of the dataset file validated against the current prompt's variables."""
+        if not os.path.exists(self.dataset_path):
+            raise FileNotFoundError(f"Dataset file not found at {self.dataset_path}")
+        stat = os.stat(self.dataset_path)
+        fingerprint = json.dumps([INDEX_VERSION, os.path.abspath(self.dataset_path), stat.st_mtime_ns, stat.st_size,
+                                  sorted(self.current_prompt['variables'])])
+        return hashlib.sha256(fingerprint.encode('utf-8')).hexdigest()
+
+    def _scan(self, validate: bool) -> Iterator[Tuple[int, int, Dict[str, Any]]]:
+        """Yield the byte offset, length and parsed content of every data point in the file."""
+        if not os.path.exists(self.dataset_path):
+            raise FileNotFoundError(f"Dataset file not found at {self.dataset_path}")
+
+        with open(self.dataset_path, 'rb') as f:
+            if os.path.getsize(self.dataset_path) == 0:
+                if not self.dataset_path.endswith('.jsonl'):
+                    raise json.JSONDecodeError("Expecting value", "", 0)
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                spans = self._jsonl_spans(buffer) if self.dataset_path.endswith('.jsonl') \
+                    else self._json_array_spans(buffer)
+                for index, (offset, length) in enumerate(spans):
+                    data_point = json.loads(buffer[offset:offset + length])
+                    if validate:
+                        try:
+                            self._validate_data_point(data_point, index)
+                        except InvalidDataPointError as e:
+                            raise InvalidDataPointError(f"Invalid data point at index {index}: {str(e)}") from e
+                    yield offset, length, data_point
+
+    @staticmethod
+    def _jsonl_spans(buffer: mmap.mmap) -> Iterator[Tuple[int, int]]:
+        position = 0
+        while position < len(buffer):
+            end = buffer.find(b'\n', position)
+            if end == -1:
+                end = len(buffer)
+            if buffer[position:end].strip():
+                yield position, end - position
+            position = end + 1
+
+    @staticmethod
+    def _json_array_spans(buffer: mmap.mmap) -> Iterator[Tuple[int, int]]:
+        """
+        Spans of the elements of a top-level JSON array, found without parsing them.
+
+        Only the array itself is checked here: its elements must be objects separated by single
+        commas, with nothing but whitespace around the array. Each element is parsed on its own.
+        """
+        depth = 0
+        start = 0
+        # End of the last token outside the elements, and whether an element came since the last comma
+        boundary = 0
+        after_element = False
+        for match in _JSON_TOKEN.finditer(buffer):
+            if depth > 1:
+                if buffer[match.start()] in b'[{':
+                    depth += 1
+                elif buffer[match.start()] in b']}':
+                    depth -= 1
+                    if depth == 1:
+                        yield start, match.end() - start
+                        boundary, after_element = match.end(), True
+                continue
+            token = buffer[match.start()]
+            gap = buffer[boundary:match.start()]
+            if depth == 0:
+                if token != ord('[') or gap.strip():
+                    break
+                depth, boundary = 1, match.end()
+                continue
+            separators = gap.split(b',')
+            if any(separator.strip() for separator in separators) or token == ord('"') or token == ord('['):
+                raise InvalidDataPointError("Data points must be JSON objects")
+            commas = len(separators) - 1
+            if token == ord('{'):
+                if commas != (1 if after_element else 0):
+                    raise json.JSONDecodeError("Expecting one comma between data points", "", match.start())
+                start = match.start()
+                depth = 2
+            elif token == ord(']') and commas == 0:
+                if buffer[match.end():].strip():
+                    raise json.JSONDecodeError("Extra data", "", match.end())
+                return
+            else:
+                raise json.JSONDecodeError("Expecting a data point or the end of the array", "", match.start())
+        raise json.JSONDecodeError("Expecting a JSON array of data points", "", 0)
 
     def _validate_data_point(self, data_point: Dict[str, Any], index: int) -> None:
         """
@@ -58,4 +287,4 @@ class DataLoader:
             raise InvalidDataPointError(f"Missing required variables: {missing_vars}")
 
         if 'expected_output' not in data_point:
-            raise InvalidDataPointError("Missing expected output")
\ No newline at end of file
+            raise InvalidDataPointError("Missing expected output")
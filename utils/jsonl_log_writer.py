@@ -0,0 +1,83 @@
+import json
+import os
+from typing import Any, Dict
+from config import LOG_FLUSH_EVERY, LOG_FSYNC
+
+FSYNC_POLICIES = ("never", "flush", "close")
+
+
+def encode_json(value: Any) -> Any:
+    """json default hook: objects with a to_json method are written as its result, anything else as a string."""
+    to_json = getattr(value, "to_json", None)
+    return to_json() if callable(to_json) else str(value)
+
+
+class JsonlLogWriter:
+    """
+    Append-only writer of one JSON record per line.
+
+    Records are buffered and flushed to the OS every `flush_every` records. The fsync policy
+    decides when flushed data is forced to disk: never, on every flush, or only on close.
+    """
+
+    def __init__(self, path: str, flush_every: int = LOG_FLUSH_EVERY, fsync: str = LOG_FSYNC):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy: {fsync}. Expected one of {FSYNC_POLICIES}")
+        self.path = path
+        self.flush_every = max(1, flush_every)
+        self.fsync = fsync
+        self._pending = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def append(self, record: Dict[str, Any]):
+        self._file.write(json.dumps(record, separators=(',', ':'), default=encode_json))
+        self._file.write('\n')
+        self._pending += 1
+        if self._pending >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        self._file.flush()
+        if self.fsync == "flush":
+            os.fsync(self._file.fileno())
+        self._pending = 0
+
+    def close(self):
+        if self._file.closed:
+            return
+        self._file.flush()
+        if self.fsync != "never":
+            os.fsync(self._file.fileno())
+        self._file.close()
+
+
+def read_jsonl_log(path: str) -> Dict[str, Any]:
+    """Rebuild the PerformanceLogger log_data view from a JSONL event log."""
+    log_data = {
+        "original_prompt": None,
+        "optimized_prompt": None,
+        "optimization_logs": []
+    }
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                # A crash can leave a partially written last line behind
+                break
+            record_type = record.pop("type")
+            if record_type == "start":
+                log_data["original_prompt"] = record["original_prompt"]
+            elif record_type == "iteration":
+                log_data["optimization_logs"].append(record)
+            elif record_type == "optimized_prompt":
+                log_data["optimized_prompt"] = record["optimized_prompt"]
+                if "usage" in record:
+                    log_data["usage"] = record["usage"]
+    return log_data
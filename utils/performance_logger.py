@@ -1,76 +1,116 @@
 import json
 import os
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from datetime import datetime
-from config import HISTORICAL_PROMPTS_COUNT
-import matplotlib.pyplot as plt
+from config import HISTORICAL_PROMPTS_COUNT, LOG_FORMAT, PLOT_MODE
+from utils.jsonl_log_writer import JsonlLogWriter, encode_json, read_jsonl_log
+from utils.plot_renderer import BackgroundPlotRenderer, render_plot
+from utils.prompt_ranking import PromptRanking
+from utils.tracer import tracer
+
+LOG_FORMATS = ("json", "jsonl")
+PLOT_MODES = ("off", "end", "background")
 
 
 class PerformanceLogger:
-    def __init__(self, log_dir: str, original_prompt: str):
+    def __init__(self, log_dir: str, original_prompt: str, log_format: str = "json", plot_mode: str = "end"):
+        if log_format not in LOG_FORMATS:
+            raise ValueError(f"Unknown log format: {log_format}. Expected one of {LOG_FORMATS}")
+        if plot_mode not in PLOT_MODES:
+            raise ValueError(f"Unknown plot mode: {plot_mode}. Expected one of {PLOT_MODES}")
         self.log_dir = log_dir
+        self.log_format = log_format
+        self.plot_mode = plot_mode
 
         # if log_dir does not exist, create it
         if not os.path.exists(log_dir):
             os.makedirs(log_dir)
 
         self.timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        self.log_file = os.path.join(self.log_dir, f"performance_log_{self.timestamp}.json")
+        self.log_file = os.path.join(self.log_dir, f"performance_log_{self.timestamp}.{log_format}")
         self.plot_file = os.path.join(self.log_dir, f"performance_plot_{self.timestamp}.png")
         self.log_data = {
             "original_prompt": original_prompt,
             "optimized_prompt": None,
             "optimization_logs": []
         }
-        self._save_log()  # Save immediately upon initialization
-
-        # Initialize plot
-        plt.figure(figsize=(12, 6))
-        plt.xlabel('Iteration')
-        plt.ylabel('Score')
-        plt.title('Prompt Optimization Progress')
-        plt.ylim(0, 1)  # Assuming scores are between 0 and 1
-
-    def log_iteration(self, iteration: int, prompts: List[str], evaluations: List[Dict[str, Any]]):
+        # The JSON log is rewritten in full on every update; the JSONL log only appends events
+        self.log_writer = JsonlLogWriter(self.log_file) if log_format == "jsonl" else None
+        if self.log_writer is not None:
+            self.log_writer.append({"type": "start", "original_prompt": original_prompt})
+        else:
+            self._save_log()  # Save immediately upon initialization
+
+        # Plot points are kept incrementally so updates don't rescan the whole log
+        self.plot_iterations: List[int] = []
+        self.plot_scores: List[float] = []
+        self.plot_renderer = BackgroundPlotRenderer(self.plot_file) if plot_mode == "background" else None
+        # Logged evaluations ranked by score, for get_historical_prompts
+        self.ranking = PromptRanking()
+
+    def log_iteration(self, iteration: int, prompts: List[str], evaluations: List[Dict[str, Any]],
+                      usage: Optional[Dict[str, Any]] = None, early_stopping: Optional[Dict[str, Any]] = None):
         iteration_log = {
             "iteration": iteration,
             "prompts": prompts,
             "evaluations": evaluations
         }
+        if usage is not None:
+            iteration_log["usage"] = usage
+        if early_stopping is not None:
+            iteration_log["early_stopping"] = early_stopping
         self.log_data["optimization_logs"].append(iteration_log)
-        self._save_log()
-        self._update_plot()
-
-    def log_optimized_prompt(self, optimized_prompt: str):
+        with tracer.span("logger.write", format=self.log_format):
+            if self.log_writer is not None:
+                self.log_writer.append({"type": "iteration", **iteration_log})
+            else:
+                self._save_log()
+
+        for evaluation in evaluations:
+            self.plot_iterations.append(iteration)
+            self.plot_scores.append(evaluation["score"])
+            self.ranking.add(evaluation)
+        if self.plot_renderer is not None:
+            self.plot_renderer.submit(self.plot_iterations, self.plot_scores)
+
+    def restore_history(self, optimization_logs: List[Dict[str, Any]]):
+        """Log the iterations of an interrupted run again, so a resumed run has its whole history."""
+        for log in optimization_logs:
+            self.log_iteration(log["iteration"], log["prompts"], log["evaluations"], usage=log.get("usage"),
+                               early_stopping=log.get("early_stopping"))
+
+    def log_optimized_prompt(self, optimized_prompt: str, usage: Optional[Dict[str, Any]] = None):
         self.log_data["optimized_prompt"] = optimized_prompt
-        self._save_log()
-        self._update_plot()
+        if usage is not None:
+            self.log_data["usage"] = usage
+        if self.log_writer is not None:
+            record = {"type": "optimized_prompt", "optimized_prompt": optimized_prompt}
+            if usage is not None:
+                record["usage"] = usage
+            self.log_writer.append(record)
+            self.log_writer.flush()
+        else:
+            self._save_log()
+        self.render_plot()
+
+    def render_plot(self):
+        """Draw the plot now, or hand it to the background renderer, depending on the plot mode."""
+        if self.plot_mode == "end":
+            with tracer.span("logger.plot", points=len(self.plot_scores)):
+                render_plot(self.plot_file, self.plot_iterations, self.plot_scores)
+        elif self.plot_mode == "background":
+            self.plot_renderer.submit(self.plot_iterations, self.plot_scores)
+
+    def close(self):
+        if self.log_writer is not None:
+            self.log_writer.close()
+        if self.plot_renderer is not None:
+            self.plot_renderer.close()
 
     def _save_log(self):
         os.makedirs(os.path.dirname(self.log_file), exist_ok=True)
         with open(self.log_file, 'w') as f:
-            json.dump(self.log_data, f, indent=2)
-
-    def _update_plot(self):
-        plt.clf()  # Clear the current figure
-        plt.xlabel('Iteration')
-        plt.ylabel('Score')
-        plt.title('Prompt Optimization Progress')
-        plt.ylim(0, 1)
-
-        iterations = []
-        scores = []
-
-        for log in self.log_data["optimization_logs"]:
-            iteration = log["iteration"]
-            for evaluations in log["evaluations"]:
-                iterations.append(iteration)
-                scores.append(evaluations["score"])
-
-        plt.scatter(iterations, scores, alpha=0.5)
-        plt.xticks(range(1, max(iterations) + 1))
-
-        plt.savefig(self.plot_file)
+            json.dump(self.log_data, f, indent=2, default=encode_json)
 
     def get_log_file_path(self) -> str:
         return self.log_file
@@ -78,31 +118,28 @@ class PerformanceLogger:
     def get_plot_file_path(self) -> str:
         return self.plot_file
 
-    def get_historical_prompts(self) -> List[Dict[str, Any]]:
-        all_prompts = []
-        for log in self.log_data["optimization_logs"]:
-            all_prompts.extend(log["evaluations"])
-
-        # Sort prompts by score in descending order
-        sorted_prompts = sorted(all_prompts, key=lambda x: x['score'], reverse=True)
-
-        # if the number of prompts is less than the historical prompts count, return all prompts
-        if len(sorted_prompts) <= HISTORICAL_PROMPTS_COUNT:
-            return sorted_prompts
-
-        # Calculate how many prompts to take from top and bottom
-        half_count = HISTORICAL_PROMPTS_COUNT // 2
-        remainder = HISTORICAL_PROMPTS_COUNT % 2
+    def get_historical_prompts(self, pending_evaluations: Optional[List[Dict[str, Any]]] = None) -> List[
+            Dict[str, Any]]:
+        """
+        Top and bottom prompts by score, also ranking pending_evaluations that aren't logged yet if given.
 
-        # Get top performing prompts
-        top_prompts = sorted_prompts[:half_count + remainder]
+        A prompt evaluated several times appears once, with its latest evaluation; prompts with
+        equal scores rank in the order they were first logged.
+        """
+        ranking = self.ranking
+        if pending_evaluations:
+            ranking = ranking.with_pending(pending_evaluations, HISTORICAL_PROMPTS_COUNT)
+        return ranking.select(HISTORICAL_PROMPTS_COUNT)
 
-        # Get bottom performing prompts
-        bottom_prompts = sorted_prompts[-half_count:]
 
-        # Combine and return the results
-        return top_prompts + bottom_prompts
+def read_log(path: str) -> Dict[str, Any]:
+    """The log_data of a log written by a PerformanceLogger, in either log format."""
+    if path.endswith(".jsonl"):
+        return read_jsonl_log(path)
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
 
 
-def create_logger(log_dir: str, original_prompt: str) -> PerformanceLogger:
-    return PerformanceLogger(log_dir, original_prompt)
+def create_logger(log_dir: str, original_prompt: str, log_format: str = LOG_FORMAT,
+                  plot_mode: str = PLOT_MODE) -> PerformanceLogger:
+    return PerformanceLogger(log_dir, original_prompt, log_format=log_format, plot_mode=plot_mode)
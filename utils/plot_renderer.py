@@ -0,0 +1,73 @@
+import threading
+from typing import List, Optional, Sequence, Tuple
+from utils.tracer import tracer
+
+PlotPoints = Tuple[Sequence[int], Sequence[float]]
+
+
+def render_plot(plot_file: str, iterations: Sequence[int], scores: Sequence[float]):
+    """Render the score-per-iteration scatter plot to plot_file."""
+    # Imported here so runs with plotting disabled never load matplotlib. The object-oriented
+    # API keeps no global state, so it is safe to use from a background thread.
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    figure = Figure(figsize=(12, 6))
+    FigureCanvasAgg(figure)
+    axes = figure.add_subplot()
+    axes.set_xlabel('Iteration')
+    axes.set_ylabel('Score')
+    axes.set_title('Prompt Optimization Progress')
+    axes.set_ylim(0, 1)  # Assuming scores are between 0 and 1
+
+    axes.scatter(iterations, scores, alpha=0.5)
+    if iterations:
+        axes.set_xticks(range(1, max(iterations) + 1))
+
+    figure.savefig(plot_file)
+
+
+class BackgroundPlotRenderer:
+    """
+    Renders plots on a daemon thread so the optimization loop never waits on matplotlib.
+
+    Updates are coalesced: if several snapshots are submitted while a render is in progress,
+    only the latest one is drawn next.
+    """
+
+    def __init__(self, plot_file: str):
+        self.plot_file = plot_file
+        self.renders = 0
+        self._pending: Optional[PlotPoints] = None
+        self._closed = False
+        self._condition = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="plot-renderer", daemon=True)
+        self._thread.start()
+
+    def submit(self, iterations: List[int], scores: List[float]):
+        with self._condition:
+            self._pending = (list(iterations), list(scores))
+            self._condition.notify()
+
+    def close(self, timeout: Optional[float] = None):
+        """Render any pending snapshot and stop the thread."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+        self._thread.join(timeout)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while self._pending is None and not self._closed:
+                    self._condition.wait()
+                if self._pending is None:
+                    return
+                points, self._pending = self._pending, None
+
+            try:
+                with tracer.span("logger.plot", points=len(points[1])):
+                    render_plot(self.plot_file, *points)
+                self.renders += 1
+            except Exception as e:
+                print(f"Error rendering performance plot: {str(e)}")
@@ -0,0 +1,81 @@
+from bisect import bisect_left
+from typing import Any, Dict, List, Tuple
+
+RankKey = Tuple[float, int]
+
+
+class PromptRanking:
+    """
+    Evaluated prompts kept sorted by score as they are logged, so the best and worst are read off the ends.
+
+    Each prompt appears once, with its latest evaluation. Prompts with the same score rank in
+    the order they were first logged, so the selection doesn't depend on dict or set ordering.
+    Adding an evaluation is a binary search plus a list insertion; top() and bottom() cost O(k).
+    """
+
+    def __init__(self):
+        # Ascending (-score, sequence) keys, with the evaluations in the same order
+        self.keys: List[RankKey] = []
+        self.evaluations: List[Dict[str, Any]] = []
+        self.ranks: Dict[str, RankKey] = {}
+        self.sequences: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def add(self, evaluation: Dict[str, Any]):
+        """Rank an evaluation, replacing any earlier evaluation of the same prompt."""
+        sequence = self.sequences.setdefault(evaluation['prompt'], len(self.sequences))
+        self._insert(evaluation, (-evaluation['score'], sequence))
+
+    def _insert(self, evaluation: Dict[str, Any], key: RankKey):
+        prompt = evaluation['prompt']
+        previous = self.ranks.get(prompt)
+        if previous is not None:
+            index = bisect_left(self.keys, previous)
+            del self.keys[index]
+            del self.evaluations[index]
+        index = bisect_left(self.keys, key)
+        self.keys.insert(index, key)
+        self.evaluations.insert(index, evaluation)
+        self.ranks[prompt] = key
+
+    def top(self, count: int) -> List[Dict[str, Any]]:
+        """The count best evaluations, best first."""
+        return self.evaluations[:max(count, 0)]
+
+    def bottom(self, count: int) -> List[Dict[str, Any]]:
+        """The count worst evaluations, best first."""
+        return self.evaluations[len(self.evaluations) - count:] if count > 0 else []
+
+    def select(self, count: int) -> List[Dict[str, Any]]:
+        """
+        All evaluations if there are at most count, otherwise the best half (rounded up) and the worst half.
+
+        The result is sorted best first either way.
+        """
+        if len(self.evaluations) <= count:
+            return list(self.evaluations)
+        half_count = count // 2
+        return self.top(half_count + count % 2) + self.bottom(half_count)
+
+    def with_pending(self, pending_evaluations: List[Dict[str, Any]], count: int) -> 'PromptRanking':
+        """
+        A small ranking of the evaluations select(count) could return once pending_evaluations are added.
+
+        Only the ends of this ranking are copied, enough to cover the pending evaluations
+        replacing or pushing out ranked ones, so the ranking itself is left untouched.
+        """
+        reach = count + len(pending_evaluations)
+        ranking = PromptRanking()
+        if len(self.evaluations) <= 2 * reach:
+            candidates = self.evaluations
+        else:
+            candidates = self.top(reach) + self.bottom(reach)
+        # Ranked evaluations keep their keys, so ties break the same way as in this ranking
+        for evaluation in candidates:
+            ranking._insert(evaluation, self.ranks[evaluation['prompt']])
+        for offset, evaluation in enumerate(pending_evaluations):
+            sequence = self.sequences.get(evaluation['prompt'], len(self.sequences) + offset)
+            ranking._insert(evaluation, (-evaluation['score'], sequence))
+        return ranking
@@ -0,0 +1,143 @@
+import json
+import os
+import sqlite3
+import time
+from typing import Any, Dict, List, Optional
+from config import CACHE_FILE, CACHE_MAX_ENTRIES, CACHE_MAX_AGE
+from providers.base_provider import make_request_key
+
+# Access times of hits are written in batches of this many, rather than in a transaction per hit
+ACCESS_FLUSH_SIZE = 256
+
+
+class ResponseCache:
+    """
+    Persistent SQLite cache of provider responses.
+
+    Entries are keyed on everything that determines a response (model name, temperature,
+    prompt text and function schema). Entries older than max_age seconds are treated as
+    misses and removed; once more than max_entries are stored, the least recently used
+    ones are evicted. Access times of hits are kept in memory and written with the next
+    write, every ACCESS_FLUSH_SIZE hits or on close, so warm runs don't commit per lookup.
+    """
+
+    def __init__(self, cache_file: str = CACHE_FILE, max_entries: int = CACHE_MAX_ENTRIES,
+                 max_age: Optional[float] = CACHE_MAX_AGE):
+        self.cache_file = cache_file
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        self._accessed: Dict[str, float] = {}
+
+        cache_dir = os.path.dirname(cache_file)
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+        self.connection = sqlite3.connect(cache_file)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, response TEXT NOT NULL, created_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON responses (last_access)")
+        self.connection.commit()
+        self._evict_expired()
+
+    @staticmethod
+    def make_key(model_name: str,
+                 temperature: float,
+                 prompt: str,
+                 functions: Optional[List[Dict[str, Any]]] = None,
+                 function_call: Optional[Dict[str, str]] = None,
+                 n: int = 1) -> str:
+        return make_request_key(model_name, temperature, prompt, functions, function_call, n)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        row = self.connection.execute(
+            "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+
+        now = time.time()
+        if row is None or self._is_expired(row[1], now):
+            self.misses += 1
+            if row is not None:
+                self._accessed.pop(key, None)
+                self.connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.connection.commit()
+            return None
+
+        self._accessed[key] = now
+        if len(self._accessed) >= ACCESS_FLUSH_SIZE:
+            self._flush_accesses()
+            self.connection.commit()
+        self.hits += 1
+        return json.loads(row[0])
+
+    def set(self, key: str, response: Dict[str, Any]) -> None:
+        now = time.time()
+        self.connection.execute(
+            "INSERT OR REPLACE INTO responses (key, response, created_at, last_access) VALUES (?, ?, ?, ?)",
+            (key, json.dumps(response, default=str), now, now)
+        )
+        self._accessed.pop(key, None)
+        # Eviction goes by access time, so pending accesses are written first
+        self._flush_accesses()
+        self._evict_overflow()
+        self.connection.commit()
+
+    def clear(self) -> None:
+        self._accessed.clear()
+        self.connection.execute("DELETE FROM responses")
+        self.connection.commit()
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": self._count()
+        }
+
+    def close(self) -> None:
+        self._flush_accesses()
+        self.connection.commit()
+        self.connection.close()
+
+    def _is_expired(self, created_at: float, now: float) -> bool:
+        return self.max_age is not None and now - created_at > self.max_age
+
+    def _flush_accesses(self) -> None:
+        """Write the pending access times of hits, in the caller's transaction."""
+        if self._accessed:
+            self.connection.executemany("UPDATE responses SET last_access = ? WHERE key = ?",
+                                        [(accessed_at, key) for key, accessed_at in self._accessed.items()])
+            self._accessed.clear()
+
+    def _count(self) -> int:
+        return self.connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+
+    def _evict_expired(self) -> None:
+        if self.max_age is not None:
+            self.connection.execute("DELETE FROM responses WHERE created_at < ?", (time.time() - self.max_age,))
+            self.connection.commit()
+
+    def _evict_overflow(self) -> None:
+        overflow = self._count() - self.max_entries
+        if overflow > 0:
+            self.connection.execute(
+                "DELETE FROM responses WHERE key IN "
+                "(SELECT key FROM responses ORDER BY last_access ASC LIMIT ?)",
+                (overflow,)
+            )
+
+
+_shared_cache: Optional[ResponseCache] = None
+
+
+def get_response_cache() -> ResponseCache:
+    """Return the process-wide cache, opening it on first use."""
+    global _shared_cache
+    if _shared_cache is None:
+        _shared_cache = ResponseCache()
+    return _shared_cache
@@ -0,0 +1,153 @@
+import asyncio
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List
+from config import TRACING_ENABLED
+
+
+class Span:
+    __slots__ = ("name", "category", "start", "end", "attrs", "track")
+
+    def __init__(self, name: str, category: str, track: int, attrs: Dict[str, Any]):
+        self.name = name
+        self.category = category
+        self.track = track
+        self.attrs = attrs
+        self.start = 0.0
+        self.end = 0.0
+
+    def set(self, **attrs: Any):
+        """Attach attributes known only once the work is done, e.g. response sizes."""
+        self.attrs.update(attrs)
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+class _ActiveSpan:
+    __slots__ = ("tracer", "span")
+
+    def __init__(self, tracer: "Tracer", span: Span):
+        self.tracer = tracer
+        self.span = span
+
+    def __enter__(self) -> Span:
+        self.span.start = time.perf_counter()
+        return self.span
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.span.end = time.perf_counter()
+        if exc_type is not None:
+            self.span.attrs["error"] = exc_type.__name__
+        self.tracer._record(self.span)
+        return False
+
+
+class _NullSpan:
+    """Stand-in returned while tracing is off, so instrumented code pays almost nothing."""
+    __slots__ = ()
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        return False
+
+    def set(self, **attrs: Any):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Tracer:
+    """
+    Collects timing spans and exports them as a Chrome/Perfetto trace or a summary table.
+
+    Spans running concurrently in different asyncio tasks or threads are placed on separate
+    tracks, so overlapping LLM calls show up side by side in the trace viewer.
+    """
+
+    def __init__(self, enabled: bool = TRACING_ENABLED):
+        self.enabled = enabled
+        self.spans: List[Span] = []
+        self.origin = time.perf_counter()
+        self._tracks: Dict[Any, int] = {}
+        self._lock = threading.Lock()
+
+    def span(self, name: str, category: str = "stage", **attrs: Any):
+        if not self.enabled:
+            return _NULL_SPAN
+        return _ActiveSpan(self, Span(name, category, self._current_track(), attrs))
+
+    def reset(self):
+        with self._lock:
+            self.spans = []
+            self._tracks = {}
+        self.origin = time.perf_counter()
+
+    def _current_track(self) -> int:
+        try:
+            owner = asyncio.current_task()
+        except RuntimeError:
+            owner = None
+        if owner is None:
+            owner = threading.get_ident()
+        key = id(owner)
+        with self._lock:
+            if key not in self._tracks:
+                self._tracks[key] = len(self._tracks) + 1
+            return self._tracks[key]
+
+    def _record(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+
+    def export_chrome_trace(self, path: str):
+        """Write the spans in the Trace Event format read by chrome://tracing and ui.perfetto.dev."""
+        events = [
+            {
+                "name": span.name,
+                "cat": span.category,
+                "ph": "X",
+                "ts": (span.start - self.origin) * 1e6,
+                "dur": span.duration * 1e6,
+                "pid": os.getpid(),
+                "tid": span.track,
+                "args": span.attrs
+            }
+            for span in self.spans
+        ]
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, default=str)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Count, total, mean and max duration in seconds of the spans with each name."""
+        durations: Dict[str, List[float]] = {}
+        for span in self.spans:
+            durations.setdefault(span.name, []).append(span.duration)
+        return {
+            name: {
+                "count": len(values),
+                "total": sum(values),
+                "mean": sum(values) / len(values),
+                "max": max(values)
+            }
+            for name, values in sorted(durations.items(), key=lambda item: -sum(item[1]))
+        }
+
+    def format_summary(self) -> str:
+        lines = [f"{'Span':<40} {'Count':>7} {'Total (s)':>10} {'Mean (s)':>10} {'Max (s)':>10}"]
+        for name, stats in self.summary().items():
+            lines.append(f"{name:<40} {stats['count']:>7} {stats['total']:>10.3f} "
+                         f"{stats['mean']:>10.4f} {stats['max']:>10.4f}")
+        return "\n".join(lines)
+
+
+tracer = Tracer()